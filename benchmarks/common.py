@@ -0,0 +1,11 @@
+import time
+
+# helpers shared by the benchmark scripts, run them from the repository root
+# with the package installed (poetry install) or on the path (PYTHONPATH=.)
+
+
+def timed(function, *args, **kwargs):
+    # the seconds taken by function and its result
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
@@ -0,0 +1,66 @@
+import geopandas
+import numpy as np
+import shapely
+
+from common import timed
+
+from postman import preprocess
+
+
+def loop_elevation_stats(trails):
+    # the previous row by row implementation
+    for i, row in trails.iterrows():
+        geometry = row["geometry"]
+        if geometry is None:
+            trails.at[i, "distance"] = None
+        else:
+            up = 0
+            down = 0
+            last_z = None
+            for x, y, z in geometry.coords:
+                if last_z is None:
+                    last_z = z
+                else:
+                    delta = z - last_z
+                    if delta > 0:
+                        up += delta
+                    else:
+                        down += delta * -1
+                    last_z = z
+            trails.at[i, "distance"] = geometry.length
+            trails.at[i, "elevation_gain"] = up
+            trails.at[i, "elevation_loss"] = down
+
+
+def random_trails(count, seed=0):
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(2, 60, size=count)
+    coordinates = rng.uniform(0, 1000, size=(counts.sum(), 3))
+    indices = np.repeat(np.arange(count), counts)
+    return geopandas.GeoDataFrame(
+        geometry=shapely.linestrings(coordinates, indices=indices)
+    )
+
+
+def main():
+    print(" lines  vertices      loop  vectorised  speedup")
+    for count in (1000, 10000, 20000):
+        trails = random_trails(count)
+        old = trails.copy()
+        loop_time, _ = timed(loop_elevation_stats, old)
+        new_time, _ = timed(preprocess.add_elevation_stats, trails)
+        for key in ("distance", "elevation_gain", "elevation_loss"):
+            assert np.array_equal(old[key].to_numpy(), trails[key].to_numpy())
+        print(
+            "{:6d} {:9d} {:8.3f}s {:10.4f}s {:7.0f}x".format(
+                count,
+                int(shapely.get_num_coordinates(trails.geometry.array).sum()),
+                loop_time,
+                new_time,
+                loop_time / new_time,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+from itertools import combinations
+
+import networkx as nx
+
+import networks
+from common import timed
+
+from postman import compact, core, paths
+
+
+def multigraph_path_length(G, P, weight="weight"):
+    # the length of a path of nodes using the cheapest of any parallel edges
+    length = 0
+    for i in range(len(P) - 1):
+        minimum = None
+        for _, data in G.get_edge_data(P[i], P[i + 1]).items():
+            if minimum is None:
+                minimum = data[weight]
+            else:
+                minimum = min(minimum, data[weight])
+        assert minimum is not None
+        length += minimum
+    return length
+
+
+def all_pairs_paths(G, nodes, weight="weight"):
+    # the previous approach, one shortest path search per pair of odd nodes
+    out = {}
+    for m, n in combinations(nodes, 2):
+        P = nx.shortest_path(G, source=m, target=n, weight=weight)
+        out[(m, n)] = (multigraph_path_length(G, P, weight), P)
+    return out
+
+
+def main():
+    print("  size   odd  all pairs  per node  speedup  eulerize")
+    for size in (10, 15, 20, 30):
+        graph = networks.grid(size)
+        odd = networks.odd_nodes(graph)
+        old_time, old = timed(all_pairs_paths, graph, odd)
+        new_time, new = timed(
+            lambda: paths.odd_node_paths(compact.from_graph(graph), odd)
+        )
+        assert all(abs(old[key][0] - new.lengths[key]) < 1e-9 for key in old)
+        euler_time, _ = timed(core.weighted_eulerize, graph)
+        print(
+            "{:6d} {:5d} {:9.3f}s {:8.3f}s {:7.1f}x {:8.3f}s".format(
+                size * size,
+                len(odd),
+                old_time,
+                new_time,
+                old_time / new_time,
+                euler_time,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
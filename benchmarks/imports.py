@@ -0,0 +1,48 @@
+import subprocess
+import sys
+
+MODULES = ["postman.core", "postman.cli", "postman.plot"]
+HEAVY = [
+    "bokeh",
+    "cartopy",
+    "geopandas",
+    "geoviews",
+    "holoviews",
+    "matplotlib",
+    "momepy",
+    "rasterio",
+]
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+print(" ".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def import_time(module, repeat=3):
+    # the fastest of several fresh interpreters, and what else was imported
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", SCRIPT.format(module=module, heavy=HEAVY)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.splitlines()
+        elapsed = float(output[0])
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, output[1] if len(output) > 1 else ""
+
+
+def main():
+    print("module            time  heavy imports")
+    for module in MODULES:
+        elapsed, heavy = import_time(module)
+        print(f"{module:<14s} {elapsed:6.3f}s  {heavy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import itertools
+import random
+import time
+
+import networks
+from common import timed
+
+from postman import compact, core, costs, incremental
+
+EDITS = 20
+
+
+def edit(solver, rng, closed):
+    # close a trail (unless that disconnects the network), reopen a closed one
+    # or change the length of one, like a season of washouts and reroutes
+    action = rng.choice(["close", "reopen", "reweight"] if closed else ["close"])
+    if action == "close":
+        e = rng.choice([e for e, a in enumerate(solver.alive) if a])
+        solver.remove_edge(e)
+        if compact.is_connected(solver.graph()[0]):
+            closed.append(e)
+        else:
+            solver.add_edge(
+                solver.nodes[solver.u[e]], solver.nodes[solver.v[e]], solver.data[e]
+            )
+    elif action == "reopen":
+        e = closed.pop(rng.randrange(len(closed)))
+        solver.add_edge(
+            solver.nodes[solver.u[e]], solver.nodes[solver.v[e]], solver.data[e]
+        )
+    else:
+        e = rng.choice([e for e, a in enumerate(solver.alive) if a])
+        solver.update_edge(e, distance=solver.data[e]["distance"] * rng.uniform(0.5, 2))
+
+
+def main():
+    cost = costs.Linear(1)
+    print(
+        "  size   odd  backend    full/edit  incremental/edit  searches  matchings"
+        "  local"
+    )
+    for size, backend in itertools.product((10, 20), ("networkx", "milp")):
+        graph = networks.grid(size)
+        rng = random.Random(0)
+        solver = incremental.IncrementalSolver(graph, matching=backend, cost=cost)
+        solver.solve()
+        searches = solver.searches
+        matchings = solver.matchings
+        local = solver.local_matchings
+        full = 0.0
+        partial = 0.0
+        closed = []
+        for _ in range(EDITS):
+            start = time.perf_counter()
+            edit(solver, rng, closed)
+            result = solver.solve()
+            partial += time.perf_counter() - start
+            current, _ = solver.graph()
+            elapsed, expected = timed(core.solve, current, matching=backend, cost=cost)
+            full += elapsed
+            assert abs(result.cost() - expected.cost()) < 1e-6 * expected.cost()
+        print(
+            "{:6d} {:5d}  {:<8s} {:10.3f}s {:16.3f}s {:9d} {:10d} {:6d}".format(
+                size * size,
+                len(solver.trees),
+                backend,
+                full / EDITS,
+                partial / EDITS,
+                solver.searches - searches,
+                solver.matchings - matchings,
+                solver.local_matchings - local,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+
+import gpxpy
+import numpy as np
+import shapely
+
+from common import timed
+
+from postman import datatypes, load, save
+
+
+def gpxpy_load(filename):
+    # the previous approach, a gpxpy document and a tuple per point
+    with open(filename) as fp:
+        gpx = gpxpy.parse(fp)
+    tracks = {}
+    for id, track in enumerate(gpx.tracks):
+        points = []
+        for segment in track.segments:
+            for point in segment.points:
+                elevation = point.elevation if point.elevation is not None else 0.0
+                points.append((point.longitude, point.latitude, elevation))
+        tracks[id] = datatypes.Track(track.name, id, shapely.LineString(points))
+    return tracks
+
+
+def write(filename, points, count=100):
+    rng = np.random.default_rng(0)
+    coords = np.column_stack(
+        [
+            -123 + np.cumsum(rng.normal(0, 1e-5, points)),
+            49 + np.cumsum(rng.normal(0, 1e-5, points)),
+            1000 + np.cumsum(rng.normal(0, 0.1, points)),
+        ]
+    )
+    tracks = {
+        i: datatypes.Track(name=str(i), id=i, path=shapely.LineString(part))
+        for i, part in enumerate(np.array_split(coords, count))
+    }
+    with open(filename, "w") as fp:
+        save.write_gpx(fp, tracks)
+
+
+def main():
+    print("  points  loader       time")
+    for points in (100_000, 1_000_000):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "tour.gpx")
+            write(filename, points)
+            results = []
+            for name, function in (("gpxpy", gpxpy_load), ("iterparse", load.load_gpx)):
+                elapsed, result = timed(function, filename)
+                results.append(result)
+                print(f"{points:8d}  {name:<10s} {elapsed:6.3f}s")
+            old, (new, _) = results
+            assert all(shapely.equals_exact(old[i].path, new[i].path, 0) for i in old)
+
+
+if __name__ == "__main__":
+    main()
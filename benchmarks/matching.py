@@ -0,0 +1,33 @@
+import networks
+from common import timed
+
+from postman import core
+
+
+def main():
+    print("  size   odd  backend       time     added      gap")
+    for size in (10, 20, 30):
+        graph = networks.grid(size)
+        odd = networks.odd_nodes(graph)
+        exact = None
+        for backend in ("networkx", "milp", "greedy"):
+            if backend == "networkx" and size > 20:
+                continue
+            elapsed, euler = timed(core.weighted_eulerize, graph, matching=backend)
+            added = euler.size("weight") - graph.size("weight")
+            if exact is None:
+                exact = added
+            print(
+                "{:6d} {:5d}  {:<9s} {:8.3f}s {:9.2f} {:7.3f}%".format(
+                    size * size,
+                    len(odd),
+                    backend,
+                    elapsed,
+                    added,
+                    (added - exact) / exact * 100,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import random
+
+import geopandas
+import networkx as nx
+import numpy as np
+import pyproj
+import rasterio
+import rasterio.transform
+import scipy.spatial
+import shapely
+
+from postman import srtm
+
+
+def grid(size: int, removed: float = 0.2, seed: int = 0) -> nx.MultiGraph:
+    # a size x size grid of junctions with random trail weights, a fraction of
+    # trails are removed (keeping the network connected) to create odd nodes
+    rng = random.Random(seed)
+    simple = nx.convert_node_labels_to_integers(nx.grid_2d_graph(size, size))
+    edges = list(simple.edges())
+    rng.shuffle(edges)
+    for u, v in edges[: int(len(edges) * removed)]:
+        simple.remove_edge(u, v)
+        if not nx.is_connected(simple):
+            simple.add_edge(u, v)
+    graph = nx.MultiGraph()
+    graph.add_nodes_from(simple.nodes)
+    for u, v in simple.edges():
+        weight = rng.uniform(1.0, 10.0)
+        graph.add_edge(
+            u, v, weight=weight, distance=weight, elevation_gain=0, elevation_loss=0
+        )
+    return graph
+
+
+def odd_nodes(graph: nx.MultiGraph) -> list:
+    return [n for n, d in graph.degree() if d % 2 == 1]
+
+
+# generators of trail networks as geodataframes in utm zone 10 (near 51N
+# 123W), with a synthetic elevation tile so the whole pipeline runs offline
+CRS = 32610
+ORIGIN = (500000.0, 5650000.0)
+
+
+def grid_network(nodes: int, spacing=200.0, removed=0.2, seed=0) -> nx.Graph:
+    # junctions on a square grid with a fraction of trails removed
+    size = max(2, round(nodes**0.5))
+    graph = nx.Graph()
+    for n, (i, j) in enumerate((i, j) for i in range(size) for j in range(size)):
+        graph.add_node(n, x=i * spacing, y=j * spacing)
+    for u, v in grid(size, removed, seed).edges():
+        graph.add_edge(u, v)
+    return graph
+
+
+def geometric_network(nodes: int, spacing=200.0, seed=0) -> nx.Graph:
+    # random junctions joined to their neighbours (in the delaunay
+    # triangulation, so trails never cross) closer than about twice the mean
+    # spacing, keeping the largest connected part
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, spacing * nodes**0.5, size=(nodes, 2))
+    graph = _points_graph(points)
+    for u, v in _delaunay_edges(points):
+        if np.hypot(*(points[u] - points[v])) < 1.5 * spacing:
+            graph.add_edge(u, v)
+    largest = max(nx.connected_components(graph), key=len)
+    return nx.convert_node_labels_to_integers(graph.subgraph(largest).copy())
+
+
+def tree_network(nodes: int, loops=0.1, spacing=200.0, seed=0) -> nx.Graph:
+    # a spanning tree of random junctions (the shortest, so trails branch
+    # like a real network) with a fraction of loops closed by the shortest
+    # remaining delaunay edges
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, spacing * nodes**0.5, size=(nodes, 2))
+    candidates = _points_graph(points)
+    for u, v in _delaunay_edges(points):
+        candidates.add_edge(u, v, length=np.hypot(*(points[u] - points[v])))
+    tree = nx.minimum_spanning_tree(candidates, weight="length")
+    rest = sorted(
+        (d["length"], u, v)
+        for u, v, d in candidates.edges(data=True)
+        if not tree.has_edge(u, v)
+    )
+    for _, u, v in rest[: int(loops * nodes)]:
+        tree.add_edge(u, v)
+    return tree
+
+
+def with_odd_nodes(graph: nx.Graph, odd: int) -> nx.Graph:
+    # join nearby pairs of junctions until odd of them have odd degree,
+    # joining two odd ones to remove a pair or two even ones to add a pair
+    graph = graph.copy()
+    count = sum(d % 2 for _, d in graph.degree())
+    while count != odd:
+        parity = int(count > odd)
+        nodes = [n for n, d in graph.degree() if d % 2 == parity]
+        points = np.array([(graph.nodes[n]["x"], graph.nodes[n]["y"]) for n in nodes])
+        lengths, neighbours = scipy.spatial.cKDTree(points).query(
+            points, min(len(nodes), 9)
+        )
+        added = False
+        for i in np.argsort(lengths[:, 1:], axis=None):
+            i, k = divmod(int(i), neighbours.shape[1] - 1)
+            u, v = nodes[i], nodes[neighbours[i, k + 1]]
+            if graph.has_edge(u, v) or u == v:
+                continue
+            if graph.degree(u) % 2 == parity == graph.degree(v) % 2:
+                graph.add_edge(u, v)
+                count += 2 if parity == 0 else -2
+                added = True
+                if count == odd:
+                    break
+        if not added:
+            break
+    return graph
+
+
+def to_trails(graph: nx.Graph, seed=0):
+    # a trail for each edge, bending a little through a point near its middle
+    rng = np.random.default_rng(seed)
+    names = []
+    lines = []
+    for i, (u, v) in enumerate(graph.edges()):
+        a = np.array([graph.nodes[u]["x"], graph.nodes[u]["y"]]) + ORIGIN
+        b = np.array([graph.nodes[v]["x"], graph.nodes[v]["y"]]) + ORIGIN
+        middle = (a + b) / 2 + rng.normal(0, np.hypot(*(b - a)) / 20, size=2)
+        names.append(f"trail {i}")
+        lines.append(shapely.LineString([a, middle, b]))
+    return geopandas.GeoDataFrame(
+        {"name": names, "number": range(len(names))}, geometry=lines, crs=CRS
+    )
+
+
+def write_dem(directory, size=600, seed=0):
+    # an elevation tile named as the srtm tile covering the networks, only
+    # covering the half degree around them, with a few random hills
+    longitude, latitude = pyproj.Transformer.from_crs(
+        CRS, 4326, always_xy=True
+    ).transform(*ORIGIN)
+    west, north = longitude - 0.1, latitude + 0.4
+    transform = rasterio.transform.from_origin(west, north, 0.5 / size, 0.5 / size)
+    rng = np.random.default_rng(seed)
+    rows, columns = np.mgrid[0:size, 0:size] / size
+    data = np.full((size, size), 500.0)
+    for _ in range(20):
+        r, c = rng.uniform(0, 1, size=2)
+        height, width = rng.uniform(50, 400), rng.uniform(0.02, 0.1)
+        data += height * np.exp(-((rows - r) ** 2 + (columns - c) ** 2) / width**2)
+    i_lat, i_lon = srtm.tile(latitude, longitude)
+    with rasterio.open(
+        f"{directory}/{srtm._basename(i_lat, i_lon)}.tif",
+        "w",
+        driver="GTiff",
+        width=size,
+        height=size,
+        count=1,
+        dtype="int16",
+        crs="EPSG:4326",
+        transform=transform,
+    ) as dataset:
+        dataset.write(data.astype("int16"), 1)
+
+
+def _points_graph(points) -> nx.Graph:
+    graph = nx.Graph()
+    for n, (x, y) in enumerate(points.tolist()):
+        graph.add_node(n, x=x, y=y)
+    return graph
+
+
+def _delaunay_edges(points) -> list[tuple[int, int]]:
+    triangulation = scipy.spatial.Delaunay(points, qhull_options="QJ")
+    indptr, indices = triangulation.vertex_neighbor_vertices
+    return [
+        (u, int(v))
+        for u in range(len(points))
+        for v in indices[indptr[u] : indptr[u + 1]]
+        if u < v
+    ]
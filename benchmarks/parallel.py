@@ -0,0 +1,45 @@
+import os
+
+import networks
+from common import timed
+
+from postman import compact, paths
+
+
+def main():
+    # the pool is only used above paths.PARALLEL_SOURCES, lower it so every
+    # size is measured both ways, the overhead is the pool's time beyond the
+    # serial time shared evenly over the cpus it can use, the threshold is
+    # about where it drops below the half of the serial time two cpus save
+    paths.PARALLEL_SOURCES = 0
+    print(f"{os.cpu_count()} cpus")
+    print("  size   odd  nearest  workers      time  overhead")
+    for size in (10, 20, 30, 50):
+        graph = compact.from_graph(networks.grid(size))
+        odd = networks.odd_nodes(networks.grid(size))
+        for nearest in (None, 10):
+            serial_time, serial = timed(paths.odd_node_paths, graph, odd, nearest)
+            print(
+                "{:6d} {:5d} {:>8} {:8d} {:8.3f}s".format(
+                    size * size, len(odd), str(nearest), 1, serial_time
+                )
+            )
+            for workers in (2, 4):
+                elapsed, result = timed(
+                    paths.odd_node_paths, graph, odd, nearest, workers=workers
+                )
+                assert result == serial
+                print(
+                    "{:6d} {:5d} {:>8} {:8d} {:8.3f}s {:8.3f}s".format(
+                        size * size,
+                        len(odd),
+                        str(nearest),
+                        workers,
+                        elapsed,
+                        elapsed - serial_time / min(workers, os.cpu_count() or 1),
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import networks
+from common import timed
+
+from postman import compact, core, costs, rural
+
+COST = costs.Linear(1)
+
+
+def window(graph, size, width):
+    # the trails with both ends in the width x width corner of a size x size
+    # grid
+    def inside(n):
+        return n // size < width and n % size < width
+
+    return [
+        inside(graph.nodes[u]) and inside(graph.nodes[v])
+        for u, v in zip(graph.u, graph.v)
+    ]
+
+
+def main():
+    print("  size  required  rural time      full time")
+    for size, width in [(20, 8), (40, 8), (80, 8), (80, 16), (80, 32)]:
+        graph = compact.from_graph(networks.grid(size))
+        required = window(graph, size, width)
+        rural_time, _ = timed(rural.solve, graph, required, matching="milp", cost=COST)
+        if size <= 40:
+            full_time, _ = timed(core.solve, graph, matching="milp", cost=COST)
+            full = f"{full_time:9.3f}s"
+        else:
+            full = "         -"
+        print(
+            "{:6d} {:9d} {:10.3f}s {}".format(
+                size * size, sum(required), rural_time, full
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+import gpxpy
+import numpy as np
+import shapely
+
+from postman import datatypes, save
+
+
+def gpxpy_to_gpx(tracks):
+    # the previous approach, a full gpxpy document serialised to one string
+    gpx = gpxpy.gpx.GPX()
+    track = gpxpy.gpx.GPXTrack()
+    gpx.tracks.append(track)
+    segment = gpxpy.gpx.GPXTrackSegment()
+    track.segments.append(segment)
+    for t in tracks.values():
+        for coord in t.path.coords:
+            segment.points.append(gpxpy.gpx.GPXTrackPoint(coord[1], coord[0], coord[2]))
+    return gpx.to_xml()
+
+
+def tracks(points, count=100):
+    rng = np.random.default_rng(0)
+    coords = np.column_stack(
+        [
+            -123 + np.cumsum(rng.normal(0, 1e-5, points)),
+            49 + np.cumsum(rng.normal(0, 1e-5, points)),
+            1000 + np.cumsum(rng.normal(0, 0.1, points)),
+        ]
+    )
+    return {
+        i: datatypes.Track(name=str(i), id=i, path=shapely.LineString(part))
+        for i, part in enumerate(np.array_split(coords, count))
+    }
+
+
+def measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    print("  points  writer       time   peak memory")
+    for points in (100_000, 1_000_000):
+        data = tracks(points)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tour.gpx")
+
+            def old():
+                with open(path, "w") as fp:
+                    fp.write(gpxpy_to_gpx(data))
+
+            def new():
+                with open(path, "w") as fp:
+                    save.write_gpx(fp, data, as_one=True)
+
+            for name, function in (("gpxpy", old), ("stream", new)):
+                elapsed, peak = measure(function)
+                print(f"{points:8d}  {name:<8s} {elapsed:8.3f}s {peak:10.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import concurrent.futures
+import http.client
+import json
+import random
+import subprocess
+import sys
+import time
+import urllib.parse
+
+# load test for `postman serve`, either against a running service (--url) or
+# one started here, timing the first (cold) request for a network and then
+# many warm requests for random start nodes from several connections at once
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("trail_file")
+    parser.add_argument("--url", help="a running service, otherwise one is started")
+    parser.add_argument("--cache-dir")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--format", choices=["gpx", "json"], default="json")
+    parser.add_argument("--matching", default="networkx")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    process = None
+    url = args.url
+    if url is None:
+        command = [sys.executable, "-m", "postman.cli", "serve", "--port", "0"]
+        if args.cache_dir is not None:
+            command += ["--cache-dir", args.cache_dir]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+        line = process.stdout.readline()
+        if not line.startswith("listening on "):
+            raise RuntimeError(f"service did not start: {line}")
+        url = line.split()[-1]
+    address = urllib.parse.urlsplit(url)
+    try:
+        query = {"trails": args.trail_file, "matching": args.matching}
+        connection = http.client.HTTPConnection(address.hostname, address.port)
+        elapsed, body = request(connection, dict(query, start=0, format="json"))
+        print(f"cold request {elapsed * 1000:10.1f} ms")
+        nodes = sorted(
+            {s["from"] for t in json.loads(body)["tours"] for s in t["steps"]}
+        )
+        rng = random.Random(args.seed)
+        starts = [rng.choice(nodes) for _ in range(args.requests)]
+
+        def worker(chunk):
+            connection = http.client.HTTPConnection(address.hostname, address.port)
+            return [
+                request(connection, dict(query, start=s, format=args.format))[0]
+                for s in chunk
+            ]
+
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(args.concurrency) as pool:
+            chunks = [starts[i :: args.concurrency] for i in range(args.concurrency)]
+            times = sorted(t for result in pool.map(worker, chunks) for t in result)
+        total = time.perf_counter() - start
+        print(
+            f"{len(times)} warm {args.format} requests from {args.concurrency} "
+            f"connections in {total:.2f}s ({len(times) / total:.0f}/s)"
+        )
+        for name, q in [("median", 0.5), ("p95", 0.95), ("p99", 0.99)]:
+            print(f"{name:>6} {times[int(q * (len(times) - 1))] * 1000:10.2f} ms")
+        print(f"{'max':>6} {times[-1] * 1000:10.2f} ms")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+def request(connection, query) -> tuple[float, bytes]:
+    start = time.perf_counter()
+    connection.request("GET", "/tour?" + urllib.parse.urlencode(query))
+    response = connection.getresponse()
+    body = response.read()
+    elapsed = time.perf_counter() - start
+    if response.status != 200:
+        raise RuntimeError(f"{response.status}: {body.decode()}")
+    return elapsed, body
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import networks
+from common import timed
+
+from postman import core
+
+
+def added_weight(graph, euler):
+    return euler.size("weight") - graph.size("weight")
+
+
+def main():
+    print("  size   odd  mode          time     added      gap")
+    for size in (10, 15, 20, 30):
+        graph = networks.grid(size)
+        odd = networks.odd_nodes(graph)
+        exact_time, euler = timed(core.weighted_eulerize, graph)
+        exact = added_weight(graph, euler)
+        print(
+            "{:6d} {:5d}  exact    {:8.3f}s {:9.2f}".format(
+                size * size, len(odd), exact_time, exact
+            )
+        )
+        for nearest in (3, 5, 10):
+            elapsed, euler = timed(core.weighted_eulerize, graph, nearest=nearest)
+            added = added_weight(graph, euler)
+            print(
+                "{:6d} {:5d}  nearest={:<2d} {:7.3f}s {:9.2f} {:7.3f}%".format(
+                    size * size,
+                    len(odd),
+                    nearest,
+                    elapsed,
+                    added,
+                    (added - exact) / exact * 100,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import argparse
+import datetime
+import json
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import networks
+
+from postman import (
+    cli,
+    compact,
+    components,
+    core,
+    costs,
+    preprocess,
+    save,
+    srtm,
+    utils,
+)
+
+# times every stage of a cli run (from trails with no elevations to a gpx
+# document) on generated networks of several sizes, then runs them again
+# tracing allocations for the peak memory of each stage, all offline against
+# a generated elevation tile
+#
+# odd nodes are matched with only their nearest few by default, as matching
+# all pairs takes minutes from a thousand or so nodes
+GENERATORS = {
+    "grid": networks.grid_network,
+    "geometric": networks.geometric_network,
+    "tree": networks.tree_network,
+}
+
+
+def pipeline(trails, matching, nearest, measure):
+    # the stages of a cli run, measure(stage, function, *args) calls each,
+    # solving each separate network (which preprocessing can leave) as the
+    # cli does and stitching their tours together
+    trails = trails.copy()
+    trails["geometry"] = measure(
+        "elevation", utils.add_elevation_to_geometries, trails.geometry, trails.crs
+    )
+    measure("elevation_stats", preprocess.add_elevation_stats, trails)
+    clean = measure("fix_trails", preprocess.fix_trails, trails)
+    graph = measure("to_graph", preprocess.to_graph, clean)
+    graph = measure("compact", compact.from_graph, graph)
+    graph = measure("reweight", compact.reweight, graph, costs.Linear(10))
+    parts = measure("components", components.split, graph)
+    added = measure(
+        "eulerize",
+        lambda: [core.eulerize(part, nearest, None, matching) for part in parts],
+    )
+    solvers = measure(
+        "circuit",
+        lambda: [core.circuit_solver(p, a) for p, a in zip(parts, added)],
+    )
+    tours = measure("tour", cli.tours_for, solvers, solvers[0].starts()[0])
+    collection = measure("tracks", cli.to_tracks, tours, clean.crs)
+    measure("track_elevation", utils.add_elevation_to_tracks, collection)
+    measure("gpx", save.to_gpx, collection)
+
+
+def timed(results):
+    def measure(stage, function, *args):
+        start = time.perf_counter()
+        out = function(*args)
+        results[stage] = {"seconds": time.perf_counter() - start}
+        return out
+
+    return measure
+
+
+def traced(results):
+    def measure(stage, function, *args):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        out = function(*args)
+        peak = tracemalloc.get_traced_memory()[1] - before
+        results[stage]["peak_mb"] = peak / 2**20
+        return out
+
+    return measure
+
+
+def run(args) -> list[dict]:
+    out = []
+    for name in args.networks:
+        for size in args.sizes:
+            graph = GENERATORS[name](size, seed=args.seed)
+            if args.odd is not None:
+                graph = networks.with_odd_nodes(graph, int(args.odd * len(graph)))
+            trails = networks.to_trails(graph, seed=args.seed)
+            stages: dict[str, dict] = {}
+            nearest = args.nearest or None
+            pipeline(trails, args.matching, nearest, timed(stages))
+            if args.memory:
+                tracemalloc.start()
+                pipeline(trails, args.matching, nearest, traced(stages))
+                tracemalloc.stop()
+            odd = sum(d % 2 for _, d in graph.degree())
+            total = sum(s["seconds"] for s in stages.values())
+            print(
+                f"{name:>9} {len(graph):6d} nodes {graph.number_of_edges():6d} "
+                f"trails {odd:5d} odd {total:8.3f}s",
+                flush=True,
+            )
+            for stage, result in stages.items():
+                out.append(
+                    {
+                        "network": name,
+                        "size": size,
+                        "nodes": len(graph),
+                        "trails": graph.number_of_edges(),
+                        "odd": odd,
+                        "stage": stage,
+                        **result,
+                    }
+                )
+    return out
+
+
+def compare(results, previous):
+    # the time of each stage relative to an earlier run of the same network
+    before = {(r["network"], r["size"], r["stage"]): r for r in previous}
+    print(f"{'network':>9} {'size':>6} {'stage':>16} {'before':>9} {'after':>9}")
+    for r in results:
+        old = before.get((r["network"], r["size"], r["stage"]))
+        if old is None:
+            continue
+        print(
+            f"{r['network']:>9} {r['size']:6d} {r['stage']:>16} "
+            f"{old['seconds']:8.3f}s {r['seconds']:8.3f}s "
+            f"x{r['seconds'] / max(old['seconds'], 1e-9):.2f}"
+        )
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--networks", nargs="+", choices=sorted(GENERATORS), default=list(GENERATORS)
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 400, 1600])
+    parser.add_argument("--odd", type=float, help="make this fraction of junctions odd")
+    parser.add_argument("--matching", default="networkx")
+    parser.add_argument(
+        "--nearest", type=int, default=10, help="0 to match all pairs of odd nodes"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-memory",
+        dest="memory",
+        action="store_false",
+        help="skip the second, traced, run for peak memory",
+    )
+    parser.add_argument("-o", "--output", help="save the results as json")
+    parser.add_argument("--compare", help="json results of an earlier run")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        srtm.TMP = directory
+        networks.write_dem(directory, seed=args.seed)
+        results = run(args)
+        for dataset in srtm._datasets.values():
+            dataset.close()
+        srtm._datasets.clear()
+    if args.compare is not None:
+        with open(args.compare) as fp:
+            compare(results, json.load(fp)["results"])
+    if args.output is not None:
+        with open(args.output, "w") as fp:
+            json.dump(
+                {
+                    "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                    "commit": _commit(),
+                    "python": platform.python_version(),
+                    "machine": platform.platform(),
+                    "arguments": vars(args),
+                    # kilobytes on linux
+                    "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                    "results": results,
+                },
+                fp,
+                indent=1,
+            )
+
+
+if __name__ == "__main__":
+    main()
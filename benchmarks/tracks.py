@@ -0,0 +1,61 @@
+import numpy as np
+import pyproj
+import shapely
+
+from common import timed
+
+from postman import datatypes, tracks, utils
+
+
+def previous_tour_to_tracks(tour):
+    # the per step conversion, with a new transformer and a list scan per step
+    out = {}
+    transformer = pyproj.Transformer.from_crs(32610, 4326)
+    seen = []
+    for i, (_, _, data) in enumerate(tour):
+        id = data["index_position"]
+        seen.count(id)
+        x, y = data["geometry"].coords.xy
+        seen.append(id)
+        latitude, longitude = transformer.transform(x, y)
+        if latitude[-1] == latitude[-2] or longitude[-1] == longitude[-2]:
+            latitude = latitude[:-1]
+            longitude = longitude[:-1]
+        out[i] = datatypes.Track(
+            name=utils._name(data),
+            id=i,
+            path=shapely.LineString([[x, y] for x, y in zip(longitude, latitude)]),
+        )
+    return out
+
+
+def tour(steps, points=20):
+    rng = np.random.default_rng(0)
+    return [
+        (
+            i,
+            i + 1,
+            {
+                "name": str(i % 1000),
+                "index_position": i % 1000,
+                "geometry": shapely.LineString(
+                    [500000, 5400000] + rng.uniform(0, 1000, (points, 2))
+                ),
+            },
+        )
+        for i in range(steps)
+    ]
+
+
+def main():
+    print(" steps  previous  vectorised")
+    for steps in (1000, 5000, 20000):
+        data = tour(steps)
+        tracks.tour_to_tracks(data[:1], crs=32610)
+        old, _ = timed(previous_tour_to_tracks, data)
+        new, _ = timed(tracks.tour_to_tracks, data, crs=32610)
+        print(f"{steps:6d} {old:8.3f}s {new:10.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+from postman import cache, cli, save, utils
+
+# the options which decide a solver, jobs sharing them share one solve
+SOLVER_OPTIONS = [
+    "cost",
+    "elevation_scale",
+    "matching",
+    "nearest",
+    "radius",
+    "required",
+]
+SUMMARY = [
+    "id",
+    "status",
+    "trails",
+    "start",
+    "cost",
+    "elevation_scale",
+    "matching",
+    "nearest",
+    "radius",
+    "required",
+    "components",
+    "tour_cost",
+    "distance",
+    "elevation_gain",
+    "elevation_loss",
+    "steps",
+    "gpx",
+    "solve_seconds",
+    "seconds",
+    "error",
+]
+
+
+def read_manifest(filename) -> list[dict]:
+    # a csv with a row per job, naming the trail file (relative to the
+    # manifest) and start node and optionally any other option of a tour, a
+    # job is identified by its id column or else by a hash of its options
+    jobs = []
+    with open(filename, newline="") as fp:
+        for row in csv.DictReader(fp):
+            params = {k: v for k, v in row.items() if k and v not in (None, "")}
+            id = params.pop("id", None)
+            options = cli.parse_options(params)
+            options["trails"] = str(Path(filename).parent / options["trails"])
+            del options["format"], options["segmented"]
+            if id is None:
+                text = json.dumps(options, sort_keys=True).encode()
+                id = hashlib.sha1(text).hexdigest()[:12]
+            jobs.append({"id": id, **options})
+    ids = [job["id"] for job in jobs]
+    if len(set(ids)) != len(ids):
+        raise ValueError("manifest has repeated jobs")
+    return jobs
+
+
+def read_summary(summary) -> dict[str, dict]:
+    # the last row of each job in a summary, skipping a row cut short when an
+    # earlier run was stopped
+    if not os.path.exists(summary):
+        return {}
+    with open(summary, newline="") as fp:
+        text = fp.read()
+    if not text.endswith("\n"):
+        text = text[: text.rfind("\n") + 1]
+    return {row["id"]: row for row in csv.DictReader(io.StringIO(text, newline=""))}
+
+
+def run(
+    jobs: list[dict],
+    summary,
+    gpx_dir=None,
+    cache_dir=cache.DEFAULT_DIR,
+    workers=None,
+    tasks_per_worker=4,
+):
+    # solve the jobs not already in summary, appending a row for each to it
+    # as they finish, so an interrupted run carries on where it stopped
+    #
+    # the summary is first rewritten with one row per job, dropping the rows
+    # of jobs about to run again, so it never holds more than one per job
+    previous = read_summary(summary)
+    done = {id for id, row in previous.items() if row["status"] == "ok"}
+    jobs = [job for job in jobs if job["id"] not in done]
+    rerun = {job["id"] for job in jobs}
+    _rewrite(summary, [row for id, row in previous.items() if id not in rerun])
+    if gpx_dir is not None:
+        os.makedirs(gpx_dir, exist_ok=True)
+    groups: dict[tuple, list[dict]] = {}
+    for job in jobs:
+        key = (job["trails"], *(job[name] for name in SOLVER_OPTIONS))
+        groups.setdefault(key, []).append(job)
+    trail_files = sorted({job["trails"] for job in jobs})
+    print(
+        f"{len(jobs)} jobs to run ({len(done)} already done) on "
+        f"{len(trail_files)} trail files with {len(groups)} solves"
+    )
+    with open(summary, "a", newline="") as fp, _pool(workers, tasks_per_worker) as pool:
+        writer = csv.DictWriter(fp, SUMMARY, extrasaction="ignore")
+        # preprocess each trail file once into the cache first, otherwise
+        # every solve of a new file would preprocess it
+        failed = {}
+        for trail_file, error in pool.imap_unordered(
+            _prepare, [(f, cache_dir) for f in trail_files]
+        ):
+            if error is not None:
+                failed[trail_file] = error
+        count = 0
+        errors = 0
+        tasks = []
+        for group in groups.values():
+            error = failed.get(group[0]["trails"])
+            if error is not None:
+                rows = [dict(job, status="error", error=error) for job in group]
+                _write(fp, writer, rows)
+                count += len(rows)
+                errors += len(rows)
+            else:
+                tasks.append((group, cache_dir, gpx_dir))
+        for rows in pool.imap_unordered(_solve, tasks):
+            _write(fp, writer, rows)
+            count += len(rows)
+            errors += sum(row["status"] != "ok" for row in rows)
+            print(f"{count}/{len(jobs)} jobs done, {errors} failed")
+    return count, errors
+
+
+def _rewrite(summary, rows):
+    # replace the summary in one step so stopping part way loses nothing
+    temporary = f"{summary}.tmp"
+    with open(temporary, "w", newline="") as fp:
+        writer = csv.DictWriter(fp, SUMMARY, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(temporary, summary)
+
+
+def _write(fp, writer, rows):
+    writer.writerows(rows)
+    fp.flush()
+
+
+class _Serial:
+    # the pool interface run in this process
+    def imap_unordered(self, function, tasks):
+        return map(function, tasks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def _pool(workers, tasks_per_worker):
+    # a fresh process replaces each worker after a few tasks so memory held
+    # by one trail network is not carried through the whole run
+    if workers == 1:
+        return _Serial()
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    return context.Pool(workers, maxtasksperchild=tasks_per_worker)
+
+
+def _prepare(task):
+    trail_file, cache_dir = task
+    try:
+        cli.prepare(trail_file, cache_dir)
+    except Exception as e:
+        return trail_file, f"{type(e).__name__}: {e}"
+    return trail_file, None
+
+
+def _solve(task) -> list[dict]:
+    # the summary rows of jobs sharing one solve
+    group, cache_dir, gpx_dir = task
+    start = time.perf_counter()
+    try:
+        trails, graph, _ = cli.prepare(group[0]["trails"], cache_dir)
+        options = group[0]
+        solvers = cli.solve(
+            trails,
+            graph,
+            required=options["required"],
+            nearest=options["nearest"],
+            radius=options["radius"],
+            matching=options["matching"],
+            cost=cli.cost_model(options["cost"], options["elevation_scale"]),
+        )
+    except Exception as e:
+        return [
+            dict(job, status="error", error=f"{type(e).__name__}: {e}") for job in group
+        ]
+    solve_seconds = time.perf_counter() - start
+    rows = []
+    for job in group:
+        start = time.perf_counter()
+        row = dict(job, solve_seconds=round(solve_seconds, 3))
+        try:
+            tours = cli.tours_for(solvers, job["start"], job["components"])
+            steps = [data for tour in tours for _, _, data in tour]
+            row.update(
+                status="ok",
+                tour_cost=sum(solver.cost() for solver in solvers),
+                distance=sum(data["distance"] for data in steps),
+                elevation_gain=sum(data["elevation_gain"] for data in steps),
+                elevation_loss=sum(data["elevation_loss"] for data in steps),
+                steps=len(steps),
+            )
+            if gpx_dir is not None:
+                row["gpx"] = os.path.join(gpx_dir, f"{job['id']}.gpx")
+                collection = cli.to_tracks(tours, trails.crs)
+                utils.add_elevation_to_tracks(collection)
+                with open(row["gpx"], "w") as fp:
+                    save.write_gpx(fp, collection)
+        except Exception as e:
+            row.update(status="error", error=f"{type(e).__name__}: {e}")
+        row["seconds"] = round(time.perf_counter() - start, 3)
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="postman batch",
+        description="solve every job in a manifest, appending a row for each to "
+        "a summary csv, jobs already solved in the summary are skipped so an "
+        "interrupted run can be started again (failed jobs are tried again)",
+    )
+    parser.add_argument(
+        "manifest",
+        help="csv with trails and start columns and optionally id and the "
+        "options of a tour request",
+    )
+    parser.add_argument("-o", "--summary", default="summary.csv")
+    parser.add_argument("--gpx-dir", help="save the tour of each job here")
+    parser.add_argument("--cache-dir", default=cache.DEFAULT_DIR)
+    parser.add_argument("--workers", type=int, help="processes to run (default: cpus)")
+    parser.add_argument(
+        "--tasks-per-worker",
+        type=int,
+        default=4,
+        help="solves before a worker process is replaced, bounding its memory",
+    )
+    args = parser.parse_args(argv)
+    jobs = read_manifest(args.manifest)
+    _, errors = run(
+        jobs,
+        args.summary,
+        args.gpx_dir,
+        args.cache_dir,
+        args.workers,
+        args.tasks_per_worker,
+    )
+    return 1 if errors else 0
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import geopandas
+import numpy as np
+import pyogrio
+import pyproj
+
+from postman import compact, preprocess, srtm
+
+# bump whenever preprocessing changes in a way which invalidates old entries
+VERSION = 2
+DEFAULT_DIR = Path.home() / ".cache" / "postman"
+
+
+def input_files(filename) -> list[Path]:
+    # a shapefile is spread over several files with the same stem
+    path = Path(filename)
+    if path.suffix.lower() == ".shp":
+        return sorted(path.parent.glob(f"{path.stem}.*"))
+    return [path]
+
+
+def dem_tiles(filename) -> list[Path]:
+    # the paths of the elevation tiles covering the input, which may not have
+    # been downloaded yet
+    info = pyogrio.read_info(filename, force_total_bounds=True)
+    west, south, east, north = pyproj.Transformer.from_crs(
+        info["crs"], 4326, always_xy=True
+    ).transform_bounds(*info["total_bounds"])
+    top, left = srtm.tile(north, west)
+    bottom, right = srtm.tile(south, east)
+    return [
+        Path(srtm._path(i_lat, i_lon))
+        for i_lat in range(top, bottom + 1)
+        for i_lon in range(left, right + 1)
+    ]
+
+
+def key(filename, parameters: dict) -> str:
+    # a hash of everything the preprocessed trails depend on
+    digest = hashlib.sha256()
+    digest.update(json.dumps([VERSION, parameters], sort_keys=True).encode())
+    digest.update(pyogrio.read_info(filename)["crs"].encode())
+    for path in input_files(filename):
+        digest.update(path.suffix.lower().encode())
+        with open(path, "rb") as fp:
+            for block in iter(lambda: fp.read(1 << 20), b""):
+                digest.update(block)
+    # only tiles already downloaded are looked at, so a key never downloads
+    for path in dem_tiles(filename):
+        if path.exists():
+            stat = path.stat()
+            digest.update(f"{path.name} {stat.st_size} {stat.st_mtime_ns}".encode())
+        else:
+            digest.update(f"{path.name} missing".encode())
+    return digest.hexdigest()
+
+
+def load(directory, key: str):
+    # the cleaned trails and their compact graph, or None when not cached
+    path = Path(directory) / key
+    if not (path / "graph.npz").exists():
+        return None
+    trails = geopandas.read_file(path / "trails.gpkg").set_index("cache_index")
+    trails.index.name = None
+    with np.load(path / "graph.npz") as arrays:
+        index_positions = arrays["index_positions"].tolist()
+        graph = compact.from_arrays(
+            arrays, preprocess.edge_data(trails, index_positions)
+        )
+    return trails, graph
+
+
+def save(directory, key: str, trails, graph: compact.CompactGraph):
+    path = Path(directory) / key
+    path.mkdir(parents=True, exist_ok=True)
+    trails.rename_axis("cache_index").reset_index().to_file(
+        path / "trails.gpkg", driver="GPKG"
+    )
+    # write the arrays last (and atomically) as they mark a complete entry
+    tmp = path / "graph.tmp.npz"
+    np.savez_compressed(
+        tmp,
+        index_positions=np.array([d["index_position"] for d in graph.data]),
+        **compact.to_arrays(graph),
+    )
+    os.replace(tmp, path / "graph.npz")
@@ -1,58 +1,315 @@
 import argparse
-import bisect
 import dataclasses
-import time
+import sys
+import typing
 
 import geopandas
-import matplotlib.pyplot as plt
-import shapely
 
-from postman import core, plot, preprocess, save, utils
+from postman import (
+    cache,
+    compact,
+    components,
+    core,
+    costs,
+    datatypes,
+    filters,
+    matching,
+    preprocess,
+    rural,
+    save,
+    spans,
+    tracks,
+    utils,
+)
 
 
 def main():
+    if sys.argv[1:2] == ["serve"]:
+        from postman import server
+
+        return server.main(sys.argv[2:])
+    if sys.argv[1:2] == ["batch"]:
+        from postman import batch
+
+        return batch.main(sys.argv[2:])
     parser = argparse.ArgumentParser()
     parser.add_argument("trail_file")
-    parser.add_argument("start_node", type=int)
+    parser.add_argument("start_node", type=int, nargs="?")
     parser.add_argument("--print-graph", action="store_true")
     parser.add_argument("-p", "--plot", action="store_true")
     parser.add_argument("-s", "--save")
     parser.add_argument("--save-segmented", action="store_true")
+    parser.add_argument(
+        "--nearest",
+        type=int,
+        help="only match odd nodes with this many of their nearest odd nodes",
+    )
+    parser.add_argument(
+        "--radius",
+        type=float,
+        help="only match odd nodes within this path weight of each other",
+    )
+    parser.add_argument(
+        "--matching", choices=sorted(matching.BACKENDS), default="networkx"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes to search for shortest paths with, only used "
+        "on networks with many odd nodes",
+    )
+    parser.add_argument("--cost", choices=sorted(costs.MODELS), default="linear")
+    parser.add_argument(
+        "--elevation-scale",
+        type=float,
+        default=10.0,
+        help="cost of each metre climbed relative to a metre of distance "
+        "(linear cost only)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=cache.DEFAULT_DIR,
+        help="where to keep preprocessed trails between runs",
+    )
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument(
+        "--components",
+        choices=["stitch", "separate"],
+        default="stitch",
+        help="when the trails form separate networks, join their tours with "
+        "straight connectors or report a tour of each",
+    )
+    parser.add_argument(
+        "--required",
+        help="only cover trails matching this expression on their attributes, "
+        "e.g. \"name.str.contains('Ridge') and difficulty in [1, 2]\" (comparisons, "
+        "in, and, or, not and str.contains/startswith/endswith), using the "
+        "others to connect them",
+    )
+    parser.add_argument(
+        "--all-starts",
+        action="store_true",
+        help="compare the elevation profile of the tour from every start node",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print the time, cpu time, peak memory and size of each stage",
+    )
+    parser.add_argument("--profile-json", help="save the stages as json")
+    parser.add_argument(
+        "--profile-trace", help="save the stages as a chrome trace (chrome://tracing)"
+    )
+    parser.add_argument(
+        "--cprofile", help="save cProfile stats of the solve (for pstats or snakeviz)"
+    )
     args = parser.parse_args()
-    trails = geopandas.read_file(args.trail_file)
-    for ax in trails.crs.axis_info:
-        if ax.unit_code != "9001":
-            raise RuntimeError("Data must be in meter-based projection")
-    trails["geometry"] = trails.apply(
-        utils.add_elevation_to_row_geometry, 1, args=(trails.crs,)
+    if args.profile or args.profile_json or args.profile_trace:
+        spans.enable()
+    if args.start_node is None and not (args.all_starts or args.print_graph):
+        parser.error("a start node is required")
+    clean_trails, compact_graph, graph = prepare(
+        args.trail_file, args.cache_dir, not args.no_cache
     )
-    preprocess.add_elevation_stats(trails)
-    clean_trails = preprocess.fix_trails(trails)
+    if graph is None:
+        print("using cached preprocessed trails")
     print("preprocessed trails:")
     utils.print_trails(clean_trails)
-    graph = preprocess.to_graph(clean_trails)
     if args.print_graph:
+        if graph is None:
+            graph = preprocess.to_graph(clean_trails)
         print("graph edges:")
         utils.print_graph_by_edges(graph)
         print("graph nodes:")
         utils.print_graph_by_nodes(graph)
+        report(args)
         return
-    tour = core.trail_tour(graph, args.start_node)
-    print("calculated tour:")
-    utils.print_tour(tour)
+    options = dict(
+        required=args.required,
+        start=args.start_node,
+        nearest=args.nearest,
+        radius=args.radius,
+        matching=args.matching,
+        cost=cost_model(args.cost, args.elevation_scale),
+        workers=args.workers,
+    )
+    if args.cprofile is not None:
+        import cProfile
+
+        with cProfile.Profile() as profiler:
+            solvers = solve(clean_trails, compact_graph, **options)
+        profiler.dump_stats(args.cprofile)
+    else:
+        solvers = solve(clean_trails, compact_graph, **options)
+    if len(solvers) > 1:
+        print(f"trails form {len(solvers)} separate networks")
+    if args.all_starts:
+        for solver in solvers:
+            utils.print_start_summaries(solver)
+        report(args)
+        return
+    with spans.span("tour") as span:
+        tours = tours_for(solvers, args.start_node, args.components)
+        span.count(steps=sum(len(tour) for tour in tours))
+    for tour in tours:
+        print("calculated tour:")
+        utils.print_tour(tour)
     if args.save is not None:
-        tracks = plot.tour_to_tracks(tour)
-        tracks = utils.rearrange(tracks, [])
-        for _, track in tracks.items():
-            track.path = utils.add_elevation(track.path)
-        with open(args.save, "w") as fp:
-            fp.write(save.to_gpx(tracks, as_segments=args.save_segmented))
+        with spans.span("tracks"):
+            collection = to_tracks(tours, clean_trails.crs)
+            collection = utils.rearrange(collection, [])
+        with spans.span("track_elevation", tracks=len(collection)):
+            utils.add_elevation_to_tracks(collection)
+        with spans.span("gpx"), open(args.save, "w") as fp:
+            save.write_gpx(fp, collection, as_segments=args.save_segmented)
+    report(args)
     if args.plot:
-        # plot.plot_tracks(plot.tour_to_tracks(tour, 10.0))
+        # the plotting libraries take longer to import than most solves
+        import matplotlib.pyplot as plt
+
+        from postman import plot
+
+        if graph is None:
+            graph = preprocess.to_graph(clean_trails)
         plot.plot_graph(graph)
         plot.plot_graph_with_trails(clean_trails, graph)
         plt.show()
 
 
+def report(args):
+    # the stages recorded with --profile and its variants
+    if not spans.ENABLED:
+        return
+    if args.profile:
+        spans.table()
+    if args.profile_json is not None:
+        spans.write(args.profile_json)
+    if args.profile_trace is not None:
+        spans.write(args.profile_trace, trace=True)
+
+
+def prepare(trail_file, cache_dir=cache.DEFAULT_DIR, use_cache=True):
+    # the cleaned trails and their compact graph, also the networkx graph when
+    # they were preprocessed rather than read from the cache
+    parameters = {
+        "extend_tolerance": preprocess.EXTEND_TOLERANCE,
+        "gap_tolerance": preprocess.GAP_TOLERANCE,
+    }
+    if use_cache:
+        with spans.span("cache_load") as span:
+            key = cache.key(trail_file, parameters)
+            cached = cache.load(cache_dir, key)
+            span.count(hit=cached is not None)
+        if cached is not None:
+            return *cached, None
+    with spans.span("read") as span:
+        trails = geopandas.read_file(trail_file)
+        span.count(trails=len(trails))
+    for ax in trails.crs.axis_info:
+        if ax.unit_code != "9001":
+            raise RuntimeError("Data must be in meter-based projection")
+    with spans.span("elevation", trails=len(trails)):
+        trails["geometry"] = utils.add_elevation_to_geometries(
+            trails.geometry, trails.crs
+        )
+    with spans.span("elevation_stats", trails=len(trails)):
+        preprocess.add_elevation_stats(trails)
+    with spans.span("fix_trails") as span:
+        clean_trails = preprocess.fix_trails(trails, **parameters)
+        span.count(trails=len(clean_trails))
+    with spans.span("to_graph") as span:
+        graph = preprocess.to_graph(clean_trails)
+        span.count(nodes=len(graph), edges=graph.number_of_edges())
+    with spans.span("compact"):
+        compact_graph = compact.from_graph(graph)
+    if use_cache:
+        with spans.span("cache_save"):
+            # keyed again as preprocessing may have downloaded elevation tiles
+            key = cache.key(trail_file, parameters)
+            cache.save(cache_dir, key, clean_trails, compact_graph)
+    return clean_trails, compact_graph, graph
+
+
+def cost_model(name="linear", elevation_scale=10.0):
+    if name == "linear":
+        return costs.Linear(elevation_scale)
+    return costs.MODELS[name]()
+
+
+@spans.timed("solve")
+def solve(
+    clean_trails, compact_graph, required=None, start=None, **options
+) -> list[core.Solver]:
+    # a solver for the trails matching the required expression (passing start,
+    # if given, as those trails may not reach it), the whole network or else
+    # each of its separate networks
+    if required is not None:
+        mask = filters.mask(clean_trails, required)
+        # the row (not the label) of each edge's trail, see preprocess.to_graph
+        positions = [d["index_position"] for d in compact_graph.data]
+        return [rural.solve(compact_graph, mask[positions], start=start, **options)]
+    if compact.is_connected(compact_graph):
+        return [core.solve(compact_graph, **options)]
+    return components.solve(compact_graph, **options)
+
+
+def tours_for(solvers: list[core.Solver], start, how="stitch") -> list[datatypes.Tour]:
+    if len(solvers) == 1:
+        return [solvers[0].tour(start)]
+    if how == "stitch":
+        return [components.stitch(solvers, start)]
+    # networks without the start node are toured from their first node
+    return [
+        solver.tour(start if start in solver.graph.index else solver.starts()[0])
+        for solver in solvers
+    ]
+
+
+def to_tracks(tours: list[datatypes.Tour], crs) -> datatypes.TrackCollection:
+    # the tracks of every tour numbered in order
+    out: datatypes.TrackCollection = {}
+    for steps in tours:
+        for track in tracks.tour_to_tracks(steps, crs=crs).values():
+            out[len(out)] = dataclasses.replace(track, id=len(out))
+    return out
+
+
+def parse_options(params: dict) -> dict:
+    # the options of a tour, from strings (as in a query or csv) or json values
+    for name in ("trails", "start"):
+        if name not in params:
+            raise ValueError(f"{name} is required")
+    options = {
+        "trails": str(params["trails"]),
+        "start": int(params["start"]),
+        "cost": str(params.get("cost", "linear")),
+        "elevation_scale": float(params.get("elevation_scale", 10.0)),
+        "matching": str(params.get("matching", "networkx")),
+        "nearest": _optional(int, params.get("nearest")),
+        "radius": _optional(float, params.get("radius")),
+        "required": _optional(str, params.get("required")),
+        "components": str(params.get("components", "stitch")),
+        "format": str(params.get("format", "gpx")),
+        "segmented": str(params.get("segmented", "")).lower() in ("1", "true"),
+    }
+    checks: list[tuple[str, typing.Collection[str]]] = [
+        ("cost", costs.MODELS),
+        ("matching", matching.BACKENDS),
+        ("components", ("stitch", "separate")),
+        ("format", ("gpx", "json")),
+    ]
+    for name, choices in checks:
+        if options[name] not in choices:
+            raise ValueError(f"{name} must be one of {', '.join(sorted(choices))}")
+    return options
+
+
+def _optional(kind, value):
+    if value is None or value == "":
+        return None
+    return kind(value)
+
+
 if __name__ == "__main__" or __name__.startswith("bokeh_app"):
     main()
@@ -0,0 +1,351 @@
+import dataclasses
+import functools
+import typing
+
+import networkx as nx
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+import shapely
+
+
+@dataclasses.dataclass
+class CompactGraph:
+    # original label and coordinates of each node
+    nodes: list
+    x: np.ndarray
+    y: np.ndarray
+    # csr adjacency, the half edges of node i are offsets[i]:offsets[i + 1]
+    # and each half edge has the node at its other end and its edge id
+    offsets: np.ndarray
+    neighbours: np.ndarray
+    edges: np.ndarray
+    # columns for each edge id, weight is the symmetric cost used to eulerize
+    # and forward and reverse are the costs of traversing from u to v and back
+    u: np.ndarray
+    v: np.ndarray
+    weight: np.ndarray
+    forward: np.ndarray
+    reverse: np.ndarray
+    distance: np.ndarray
+    gain: np.ndarray
+    loss: np.ndarray
+    # the original edge keys and attribute dicts, only used to map a solution
+    # back to the input graph, never during solving
+    keys: list
+    data: list[dict[str, typing.Any]]
+
+    @functools.cached_property
+    def index(self) -> dict:
+        return {n: i for i, n in enumerate(self.nodes)}
+
+    @functools.cached_property
+    def adjacency(self):
+        # plain lists of the csr arrays for the pure python searches, with
+        # parallel edges collapsed to the cheapest of each neighbouring pair
+        # so a search relaxes every neighbour once, weights are replaced
+        # rather than modified in place so this can be cached
+        keep = _cheapest_half_edges(self)
+        owner = np.repeat(np.arange(len(self.nodes)), np.diff(self.offsets))
+        offsets = np.zeros(len(self.nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(owner[keep], minlength=len(self.nodes)), out=offsets[1:])
+        edges = self.edges[keep]
+        return (
+            offsets.tolist(),
+            self.neighbours[keep].tolist(),
+            edges.tolist(),
+            self.weight[edges].tolist(),
+        )
+
+
+def from_graph(graph: nx.MultiGraph, weight="weight") -> CompactGraph:
+    nodes = list(graph.nodes)
+    index = {n: i for i, n in enumerate(nodes)}
+    u = []
+    v = []
+    keys = []
+    data = []
+    for m, n, k, d in graph.edges(keys=True, data=True):
+        u.append(index[m])
+        v.append(index[n])
+        keys.append(k)
+        data.append(d)
+    return from_edges(
+        nodes,
+        [graph.nodes[n].get("x", np.nan) for n in nodes],
+        [graph.nodes[n].get("y", np.nan) for n in nodes],
+        u,
+        v,
+        keys,
+        data,
+        [d.get(weight, np.nan) for d in data],
+    )
+
+
+def from_edges(nodes, x, y, u, v, keys, data, weight=None) -> CompactGraph:
+    # u and v are the positions in nodes of the ends of each edge, swapped
+    # where needed so an edge with a geometry runs from u to v along it
+    x = np.array(x, dtype=float)
+    y = np.array(y, dtype=float)
+    u_array, v_array = _orient(
+        x, y, np.array(u, dtype=np.int64), np.array(v, dtype=np.int64), data
+    )
+    offsets, neighbours, edges = _csr(len(nodes), u_array, v_array)
+    if weight is None:
+        weights = np.full(len(u_array), np.nan)
+    else:
+        weights = np.array(weight, dtype=float)
+    return CompactGraph(
+        nodes=list(nodes),
+        x=x,
+        y=y,
+        offsets=offsets,
+        neighbours=neighbours,
+        edges=edges,
+        u=u_array,
+        v=v_array,
+        weight=weights,
+        forward=weights,
+        reverse=weights,
+        distance=_column(data, "distance"),
+        gain=_column(data, "elevation_gain"),
+        loss=_column(data, "elevation_loss"),
+        keys=list(keys),
+        data=list(data),
+    )
+
+
+class GraphArrays(typing.TypedDict):
+    # the columns of a compact graph as saved, without its edge dicts
+    nodes: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    offsets: np.ndarray
+    neighbours: np.ndarray
+    edges: np.ndarray
+    u: np.ndarray
+    v: np.ndarray
+    weight: np.ndarray
+    forward: np.ndarray
+    reverse: np.ndarray
+    distance: np.ndarray
+    gain: np.ndarray
+    loss: np.ndarray
+    keys: np.ndarray
+
+
+ARRAYS = list(GraphArrays.__annotations__)
+
+
+def to_arrays(graph: CompactGraph) -> GraphArrays:
+    return typing.cast(
+        GraphArrays, {name: np.asarray(getattr(graph, name)) for name in ARRAYS}
+    )
+
+
+def from_arrays(
+    arrays: typing.Mapping[str, np.ndarray], data: list[dict[str, typing.Any]]
+) -> CompactGraph:
+    # the inverse of to_arrays, with the edge dicts supplied separately
+    return CompactGraph(
+        nodes=np.asarray(arrays["nodes"]).tolist(),
+        x=np.asarray(arrays["x"]),
+        y=np.asarray(arrays["y"]),
+        offsets=np.asarray(arrays["offsets"]),
+        neighbours=np.asarray(arrays["neighbours"]),
+        edges=np.asarray(arrays["edges"]),
+        u=np.asarray(arrays["u"]),
+        v=np.asarray(arrays["v"]),
+        weight=np.asarray(arrays["weight"]),
+        forward=np.asarray(arrays["forward"]),
+        reverse=np.asarray(arrays["reverse"]),
+        distance=np.asarray(arrays["distance"]),
+        gain=np.asarray(arrays["gain"]),
+        loss=np.asarray(arrays["loss"]),
+        keys=np.asarray(arrays["keys"]).tolist(),
+        data=data,
+    )
+
+
+def reweight(graph: CompactGraph, cost) -> CompactGraph:
+    # new weights from a cost model in one pass over the edge columns, sharing
+    # everything else with the original graph
+    forward, reverse = cost(graph.distance, graph.gain, graph.loss)
+    forward = np.asarray(forward, dtype=float)
+    reverse = np.asarray(reverse, dtype=float)
+    return dataclasses.replace(
+        graph, weight=(forward + reverse) / 2, forward=forward, reverse=reverse
+    )
+
+
+def circuit_cost(graph: CompactGraph, circuit) -> float:
+    # directed cost of a list of (u, v, edge id) steps
+    if len(circuit) == 0:
+        return 0.0
+    u, _, edge = np.array(circuit, dtype=np.int64).T
+    return float(
+        np.where(u == graph.u[edge], graph.forward[edge], graph.reverse[edge]).sum()
+    )
+
+
+def reverse_circuit(circuit):
+    return [(v, u, e) for u, v, e in reversed(circuit)]
+
+
+def _orient(x, y, u, v, data):
+    # networkx lists the ends of an undirected edge in the order the nodes
+    # were added, not the direction of its geometry, which gain and loss (and
+    # so the forward and reverse costs) are measured along, a geometry which
+    # doesn't start at u must run from v (as in core.fix_segment_direction)
+    has_geometry = np.array([d.get("geometry") is not None for d in data], dtype=bool)
+    if not has_geometry.any():
+        return u, v
+    geometries = np.array([d.get("geometry") for d in data], dtype=object)
+    first = shapely.get_point(geometries[has_geometry], 0)
+    ends = u[has_geometry]
+    backwards = np.zeros(len(u), dtype=bool)
+    backwards[has_geometry] = (
+        np.abs(x[ends] - shapely.get_x(first)) + np.abs(y[ends] - shapely.get_y(first))
+        > 0.1
+    )
+    return np.where(backwards, v, u), np.where(backwards, u, v)
+
+
+def _column(data, key):
+    return np.array([d.get(key, np.nan) for d in data], dtype=float)
+
+
+def _half_edges(u, v):
+    # both directions of every edge, in the order networkx would list them
+    # after adding the edges one by one (a self loop appears twice)
+    owner = np.stack([u, v], axis=1).ravel()
+    neighbour = np.stack([v, u], axis=1).ravel()
+    edge = np.repeat(np.arange(len(u)), 2)
+    # neighbours of a node are ordered by the first edge joining them
+    low = np.minimum(u, v)
+    high = np.maximum(u, v)
+    _, first, inverse = np.unique(
+        np.stack([low, high], axis=1), axis=0, return_index=True, return_inverse=True
+    )
+    group = np.repeat(first[inverse.ravel()], 2)
+    return owner, neighbour, edge, group
+
+
+def _cheapest_half_edges(graph: CompactGraph) -> np.ndarray:
+    # a mask of the half edges to keep, the cheapest (and first of equally
+    # cheap) of those from each node to each neighbour, in their csr order
+    owner = np.repeat(np.arange(len(graph.nodes)), np.diff(graph.offsets))
+    half = np.arange(len(graph.edges))
+    order = np.lexsort((half, graph.weight[graph.edges], graph.neighbours, owner))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (np.diff(owner[order]) != 0) | (np.diff(graph.neighbours[order]) != 0)
+    keep = np.zeros(len(order), dtype=bool)
+    keep[order[first]] = True
+    return keep
+
+
+def _csr(n, u, v):
+    owner, neighbour, edge, group = _half_edges(u, v)
+    order = np.lexsort((edge, group, owner))
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owner, minlength=n), out=offsets[1:])
+    return offsets, neighbour[order], edge[order]
+
+
+def degree(graph: CompactGraph) -> np.ndarray:
+    return np.diff(graph.offsets)
+
+
+def components(graph: CompactGraph) -> tuple[int, np.ndarray]:
+    # the number of connected components and the component of each node
+    matrix = scipy.sparse.csr_array(
+        (np.ones(len(graph.u)), (graph.u, graph.v)),
+        shape=(len(graph.nodes), len(graph.nodes)),
+    )
+    return scipy.sparse.csgraph.connected_components(matrix, directed=False)
+
+
+def is_connected(graph: CompactGraph) -> bool:
+    count, _ = components(graph)
+    return count == 1
+
+
+def subgraph(graph: CompactGraph, edges) -> CompactGraph:
+    # just the given edge ids and the nodes at their ends, in their original
+    # order
+    edges = np.asarray(edges, dtype=np.int64)
+    nodes = np.unique(np.concatenate([graph.u[edges], graph.v[edges]]))
+    position = np.full(len(graph.nodes), -1, dtype=np.int64)
+    position[nodes] = np.arange(len(nodes))
+    sub = from_edges(
+        [graph.nodes[i] for i in nodes.tolist()],
+        graph.x[nodes],
+        graph.y[nodes],
+        position[graph.u[edges]],
+        position[graph.v[edges]],
+        [graph.keys[e] for e in edges.tolist()],
+        [graph.data[e] for e in edges.tolist()],
+    )
+    return dataclasses.replace(
+        sub,
+        weight=graph.weight[edges],
+        forward=graph.forward[edges],
+        reverse=graph.reverse[edges],
+    )
+
+
+def eulerian_circuit(
+    graph: CompactGraph, added, source: int
+) -> list[tuple[int, int, int]]:
+    # hierholzer's algorithm over the graph with every edge id in added
+    # duplicated, following the same order as nx.eulerian_circuit would on the
+    # equivalent networkx multigraph, returns (u, v, edge id) steps
+    owner, neighbour, edge, group = _half_edges(graph.u, graph.v)
+    added = np.asarray(added, dtype=np.int64)
+    extra_owner, extra_neighbour, extra_edge, extra_group = _half_edges(
+        graph.u[added], graph.v[added]
+    )
+    # duplicates follow the existing edges between the same pair of nodes
+    extra_group = np.repeat(group[2 * added], 2)
+    instance = np.concatenate(
+        [np.repeat(np.arange(len(graph.u)), 2), len(graph.u) + extra_edge]
+    )
+    owner = np.concatenate([owner, extra_owner])
+    order = np.lexsort(
+        (
+            np.arange(len(owner)),
+            np.concatenate([np.zeros_like(edge), np.ones_like(extra_edge)]),
+            np.concatenate([group, extra_group]),
+            owner,
+        )
+    )
+    n = len(graph.nodes)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owner, minlength=n), out=offsets[1:])
+    if np.any(np.diff(offsets) % 2 == 1):
+        raise nx.NetworkXError("G is not Eulerian.")
+    end = offsets[1:].tolist()
+    pointer = offsets[:-1].tolist()
+    half_neighbour = np.concatenate([neighbour, extra_neighbour])[order].tolist()
+    half_instance = instance[order].tolist()
+    original = np.concatenate([np.arange(len(graph.u)), added]).tolist()
+    used = [False] * len(original)
+    circuit: list[tuple[int, int, int]] = []
+    vertex_stack = [(source, None)]
+    last_vertex = None
+    last_instance = None
+    while vertex_stack:
+        current_vertex, current_instance = vertex_stack[-1]
+        p = pointer[current_vertex]
+        while p < end[current_vertex] and used[half_instance[p]]:
+            p += 1
+        pointer[current_vertex] = p
+        if p == end[current_vertex]:
+            if last_vertex is not None:
+                circuit.append((last_vertex, current_vertex, original[last_instance]))
+            last_vertex, last_instance = current_vertex, current_instance
+            vertex_stack.pop()
+        else:
+            used[half_instance[p]] = True
+            vertex_stack.append((half_neighbour[p], half_instance[p]))
+    return circuit
@@ -0,0 +1,186 @@
+import multiprocessing
+import types
+
+import networkx as nx
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.spatial
+import shapely
+
+from postman import compact, core, costs, datatypes
+
+
+def split(graph: compact.CompactGraph) -> list[compact.CompactGraph]:
+    # one graph per connected component with any edges, ordered by their
+    # first edge so a connected graph comes back unchanged
+    _, labels = compact.components(graph)
+    edge_labels = labels[graph.u]
+    order = np.argsort(edge_labels, kind="stable")
+    _, first, counts = np.unique(
+        edge_labels[order], return_index=True, return_counts=True
+    )
+    groups = [order[i : i + n] for i, n in zip(first.tolist(), counts.tolist())]
+    groups.sort(key=lambda edges: edges[0])
+    return [compact.subgraph(graph, edges) for edges in groups]
+
+
+def solve(
+    graph: nx.MultiGraph | compact.CompactGraph,
+    nearest=None,
+    radius=None,
+    matching="networkx",
+    cost=costs.Linear(10),
+    workers=None,
+) -> list[core.Solver]:
+    # a solver for each component, with workers > 1 the components are solved
+    # in a process pool instead of their odd node searches
+    if isinstance(graph, nx.MultiGraph):
+        graph = compact.from_graph(graph)
+    parts = split(graph)
+    if workers is None or workers <= 1 or len(parts) < 2:
+        return [core.solve(part, nearest, radius, matching, cost) for part in parts]
+    # largest first so a big component is not left until last
+    order = sorted(range(len(parts)), key=lambda i: -len(parts[i].u))
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    with context.Pool(workers) as pool:
+        solved = pool.starmap(
+            core.solve,
+            [(parts[i], nearest, radius, matching, cost) for i in order],
+        )
+    out: list[core.Solver] = [None] * len(parts)  # type: ignore
+    for i, solver in zip(order, solved):
+        out[i] = solver
+    return out
+
+
+def connectors(solvers: list[core.Solver]) -> list[tuple]:
+    # straight lines joining the components into a tree as (component,
+    # component, node, node) with the nodes as labels, the minimum spanning
+    # tree of the components under the distance between their nearest nodes
+    labels = [n for solver in solvers for n in solver.graph.nodes]
+    points = np.column_stack(
+        [
+            np.concatenate([solver.graph.x for solver in solvers]),
+            np.concatenate([solver.graph.y for solver in solvers]),
+        ]
+    )
+    component = np.repeat(
+        np.arange(len(solvers)), [len(solver.graph.nodes) for solver in solvers]
+    )
+    a, b = _candidate_pairs(points)
+    keep = component[a] != component[b]
+    a, b = a[keep], b[keep]
+    length = np.hypot(*(points[a] - points[b]).T)
+    low = np.minimum(component[a], component[b])
+    high = np.maximum(component[a], component[b])
+    # the nearest pair of nodes between each pair of components
+    order = np.lexsort((length, high, low))
+    a, b, low, high, length = a[order], b[order], low[order], high[order], length[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (low[1:] != low[:-1]) | (high[1:] != high[:-1])
+    nearest = {
+        (i, j): (m, n)
+        for i, j, m, n in zip(
+            low[first].tolist(),
+            high[first].tolist(),
+            a[first].tolist(),
+            b[first].tolist(),
+        )
+    }
+    # shift the lengths as a zero would be taken as no edge, which does not
+    # change the tree as every spanning tree has the same number of edges
+    matrix = scipy.sparse.coo_array(
+        (length[first] + 1, (low[first], high[first])),
+        shape=(len(solvers), len(solvers)),
+    )
+    tree = scipy.sparse.csgraph.minimum_spanning_tree(matrix).tocoo()
+    out = []
+    for i, j in sorted(zip(tree.row.tolist(), tree.col.tolist())):
+        i, j = min(i, j), max(i, j)
+        m, n = nearest[(i, j)]
+        if component[m] != i:
+            m, n = n, m
+        out.append((i, j, labels[m], labels[n]))
+    return out
+
+
+def _candidate_pairs(points):
+    # every pair of points which could join two components in the tree, as
+    # such a pair has no other point in the circle through both of them it is
+    # an edge of the delaunay triangulation, so only those are needed
+    if len(points) >= 4:
+        try:
+            triangulation = scipy.spatial.Delaunay(points, qhull_options="QJ")
+        except scipy.spatial.QhullError:
+            pass
+        else:
+            indptr, indices = triangulation.vertex_neighbor_vertices
+            return np.repeat(np.arange(len(points)), np.diff(indptr)), indices
+    return np.triu_indices(len(points), 1)
+
+
+def stitch(solvers: list[core.Solver], start) -> datatypes.Tour:
+    # one closed tour from start through every component, walking out to each
+    # component along a straight connector, around it and back again
+    component = {n: i for i, solver in enumerate(solvers) for n in solver.graph.nodes}
+    position = {
+        n: (x, y)
+        for solver in solvers
+        for n, x, y in zip(
+            solver.graph.nodes, solver.graph.x.tolist(), solver.graph.y.tolist()
+        )
+    }
+    links: list[list[tuple]] = [[] for _ in solvers]
+    for i, j, m, n in connectors(solvers):
+        links[i].append((m, j, n))
+        links[j].append((n, i, m))
+    # visit the tree of components breadth first from the one with start
+    root = component[start]
+    entry = {root: start}
+    children: list[list[tuple]] = [[] for _ in solvers]
+    order = [root]
+    for i in order:
+        for m, j, n in links[i]:
+            if j not in entry:
+                entry[j] = n
+                children[i].append((m, j, n))
+                order.append(j)
+    # then build the tours from the leaves up, splicing each child's tour in
+    # where its parent's tour first reaches the connector
+    tours: dict[int, datatypes.Tour] = {}
+    for i in reversed(order):
+        steps = solvers[i].tour(entry[i])
+        first: dict = {}
+        for k, (u, _, _) in enumerate(steps):
+            first.setdefault(u, k)
+        # splicing from the end keeps the earlier indices valid
+        splices = [(first[m], m, j, n) for m, j, n in children[i]]
+        splices.sort(key=lambda splice: splice[0], reverse=True)
+        for k, m, j, n in splices:
+            steps[k:k] = (
+                [transfer(m, n, position)] + tours.pop(j) + [transfer(n, m, position)]
+            )
+        tours[i] = steps
+    return tours[root]
+
+
+def transfer(m, n, position) -> tuple:
+    # a step along a straight line between two nodes which are not joined
+    line = shapely.LineString([position[m], position[n]])
+    return (
+        m,
+        n,
+        types.MappingProxyType(
+            {
+                "name": "transfer",
+                "index_position": -1,
+                "transfer": True,
+                "distance": line.length,
+                "elevation_gain": 0.0,
+                "elevation_loss": 0.0,
+                "geometry": line,
+            }
+        ),
+    )
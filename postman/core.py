@@ -1,133 +1,291 @@
-import sys
-from itertools import combinations
+import dataclasses
+import functools
+import types
 
-import geopandas
-import matplotlib
-import matplotlib.pyplot as plt
-import momepy
 import networkx as nx
 import numpy as np
-import shapely.plotting
+import shapely
 
-from postman import datatypes, utils
+from postman import compact, costs, datatypes, paths, spans, utils
+from postman.matching import BACKENDS
 
 
-def trail_tour(graph: nx.MultiGraph, start: int) -> datatypes.Tour:
-    weight_with_elevation(graph, 10)
-    euler = weighted_eulerize(graph, "weight")
-    path = nx.eulerian_circuit(euler, start, keys=True)
-    tour = [(u, v, euler.get_edge_data(u, v)[k]) for u, v, k in path]
-    fix_segment_direction(tour, graph)
-    return tour
+def trail_tour(
+    graph: nx.MultiGraph | compact.CompactGraph,
+    start: int,
+    nearest=None,
+    radius=None,
+    matching="networkx",
+    cost=costs.Linear(10),
+    workers=None,
+) -> datatypes.Tour:
+    return solve(graph, nearest, radius, matching, cost, workers).tour(start)
 
 
-def weight_with_elevation(graph: nx.MultiGraph, scale=1.0):
-    for u, v, data in graph.edges(data=True):
-        data["weight"] = (
-            data["distance"]
-            + (data["elevation_gain"] * scale + data["elevation_loss"] * scale) / 2
-        )
-        # print(utils.label_len(data), data["weight"])
+def solve(
+    graph: nx.MultiGraph | compact.CompactGraph,
+    nearest=None,
+    radius=None,
+    matching="networkx",
+    cost=costs.Linear(10),
+    workers=None,
+) -> "Solver":
+    # solve on the compact form, only mapping back to the edge dicts (and
+    # their geometries) once a tour is requested
+    if isinstance(graph, nx.MultiGraph):
+        graph = compact.from_graph(graph)
+    graph = compact.reweight(graph, cost)
+    added = eulerize(graph, nearest, radius, matching, workers)
+    return circuit_solver(graph, added)
 
 
-def fix_segment_direction(tour, graph):
-    for i, (u, v, data) in enumerate(tour):
-        x, y = data["geometry"].coords.xy
-        dx = abs(graph.nodes[u]["x"] - x[0])
-        dy = abs(graph.nodes[u]["y"] - y[0])
-        if dx + dy > 0.1:
-            # start of path is not alighned with node, it must be backwards
-            tmp = data["elevation_gain"]
-            data["elevation_gain"] = data["elevation_loss"]
-            data["elevation_loss"] = tmp
-            data["geometry"] = data["geometry"].reverse()
+def circuit_solver(graph: compact.CompactGraph, added) -> "Solver":
+    # a circuit of graph with the edge ids in added duplicated
+    with spans.span("circuit", edges=len(graph.u) + len(added)):
+        circuit = []
+        if len(graph.u) > 0:
+            circuit = compact.eulerian_circuit(graph, added, int(graph.u[0]))
+        # the eulerization uses the mean of the forward and reverse costs,
+        # which is exact when every cycle costs the same both ways, then the
+        # circuit is walked in whichever direction is cheaper
+        reverse = compact.reverse_circuit(circuit)
+        if compact.circuit_cost(graph, reverse) < compact.circuit_cost(graph, circuit):
+            circuit = reverse
+    return Solver(graph, circuit)
 
 
-def weighted_eulerize(G, weight="weight"):
+@dataclasses.dataclass
+class Solver:
+    # an eulerized graph with one euler circuit of it, as the circuit is closed
+    # the tour from any start node is just a rotation of it
+    graph: compact.CompactGraph
+    circuit: list[tuple[int, int, int]]
+
+    @functools.cached_property
+    def _first_step(self) -> dict[int, int]:
+        first: dict[int, int] = {}
+        for i, (u, _, _) in enumerate(self.circuit):
+            first.setdefault(u, i)
+        return first
+
+    @functools.cached_property
+    def _steps(self):
+        # per step distance, elevation gain and loss in the direction walked,
+        # the graph's edges run from u to v along their geometries
+        if len(self.circuit) == 0:
+            return np.zeros(0), np.zeros(0), np.zeros(0)
+        u, _, edge = np.array(self.circuit, dtype=np.int64).T
+        forward = u == self.graph.u[edge]
+        gain = np.where(forward, self.graph.gain[edge], self.graph.loss[edge])
+        loss = np.where(forward, self.graph.loss[edge], self.graph.gain[edge])
+        return self.graph.distance[edge], gain, loss
+
+    def _start_step(self, start) -> int:
+        # the first step leaving start, which must be on the circuit (the
+        # circuit of a rural postman tour need not pass every node)
+        i = self.graph.index.get(start)
+        if i not in self._first_step:
+            starts = self.starts()
+            listed = ", ".join(str(n) for n in starts[:10])
+            if len(starts) > 10:
+                listed += f" and {len(starts) - 10} more"
+            raise ValueError(f"tour can not start at {start}, it can start at {listed}")
+        return self._first_step[i]
+
+    def steps(self, start) -> list[tuple[int, int, int]]:
+        # the circuit as compact (u, v, edge id) steps starting at start
+        if len(self.circuit) == 0:
+            return []
+        i = self._start_step(start)
+        return self.circuit[i:] + self.circuit[:i]
+
+    def tour(self, start) -> datatypes.Tour:
+        nodes = self.graph.nodes
+        tour = [
+            (nodes[u], nodes[v], self.graph.data[e]) for u, v, e in self.steps(start)
+        ]
+        return fix_segment_direction(tour, self.graph)
+
+    def cost(self) -> float:
+        # the same from every start node
+        return compact.circuit_cost(self.graph, self.circuit)
+
+    def totals(self) -> tuple[float, float, float]:
+        # distance, elevation gain and elevation loss, also the same everywhere
+        distance, gain, loss = self._steps
+        return float(distance.sum()), float(gain.sum()), float(loss.sum())
+
+    def profile(self, start) -> tuple[np.ndarray, np.ndarray]:
+        # cumulative distance and elevation relative to start at start and
+        # after each step
+        distance, gain, loss = self._steps
+        climb = gain - loss
+        if len(self.circuit) > 0:
+            i = self._start_step(start)
+            distance = np.roll(distance, -i)
+            climb = np.roll(climb, -i)
+        return np.cumsum(np.append(0.0, distance)), np.cumsum(np.append(0.0, climb))
+
+    def starts(self) -> list:
+        # every node a tour can start from
+        return [self.graph.nodes[i] for i in sorted(self._first_step)]
+
+
+def weight_with_elevation(graph: nx.MultiGraph, scale=1.0, cost=None):
+    # store the symmetric weight and directional costs on each edge of graph
+    if cost is None:
+        cost = costs.Linear(scale)
+    weighted = compact.reweight(compact.from_graph(graph), cost)
+    for data, weight, forward, reverse in zip(
+        weighted.data,
+        weighted.weight.tolist(),
+        weighted.forward.tolist(),
+        weighted.reverse.tolist(),
+    ):
+        data["weight"] = weight
+        data["forward_weight"] = forward
+        data["reverse_weight"] = reverse
+
+
+def fix_segment_direction(tour, graph) -> datatypes.Tour:
+    # each step with its geometry (and elevation gain and loss) in the
+    # direction walked, as new read-only records so steps along the same edge
+    # never share anything which could be flipped twice
+    if len(tour) == 0:
+        return []
+    if isinstance(graph, compact.CompactGraph):
+        index = graph.index
+        x, y = graph.x, graph.y
+    else:
+        index = {n: i for i, n in enumerate(graph.nodes)}
+        x = np.array([d["x"] for _, d in graph.nodes(data=True)], dtype=float)
+        y = np.array([d["y"] for _, d in graph.nodes(data=True)], dtype=float)
+    u = np.fromiter((index[u] for u, _, _ in tour), dtype=np.int64, count=len(tour))
+    geometries = np.array([data["geometry"] for _, _, data in tour], dtype=object)
+    first = shapely.get_point(geometries, 0)
+    # a path which doesn't start at its first node must be backwards
+    backwards = (
+        np.abs(x[u] - shapely.get_x(first)) + np.abs(y[u] - shapely.get_y(first)) > 0.1
+    )
+    geometries[backwards] = shapely.reverse(geometries[backwards])
+    out: datatypes.Tour = []
+    for (m, n, data), flip, geometry in zip(
+        tour, backwards.tolist(), geometries.tolist()
+    ):
+        if flip:
+            data = {
+                **data,
+                "elevation_gain": data["elevation_loss"],
+                "elevation_loss": data["elevation_gain"],
+                "geometry": geometry,
+            }
+        out.append((m, n, types.MappingProxyType(data)))
+    return out
+
+
+def weighted_eulerize(
+    G, weight="weight", nearest=None, radius=None, matching="networkx", workers=None
+):
     if G.order() == 0:
         raise nx.NetworkXPointlessConcept("Cannot Eulerize null graph")
-    if not nx.is_connected(G):
+    graph = compact.from_graph(G, weight)
+    added = eulerize(graph, nearest, radius, matching, workers)
+    G = nx.MultiGraph(G)
+    # duplicate each edge along each path of the matching
+    G.add_edges_from(
+        (graph.nodes[graph.u[e]], graph.nodes[graph.v[e]], graph.data[e]) for e in added
+    )
+    return G
+
+
+def eulerize(
+    graph: compact.CompactGraph,
+    nearest=None,
+    radius=None,
+    matching="networkx",
+    workers=None,
+) -> list[int]:
+    # the edge ids which need to be duplicated to make graph eulerian
+    if len(graph.nodes) == 0:
+        raise nx.NetworkXPointlessConcept("Cannot Eulerize null graph")
+    if not compact.is_connected(graph):
         raise nx.NetworkXError("G is not connected")
-    odd_degree_nodes = [n for n, d in G.degree() if d % 2 == 1]
+    odd_degree_nodes = np.flatnonzero(compact.degree(graph) % 2 == 1).tolist()
     # print("odd degree nodes", len(odd_degree_nodes))
-    G = nx.MultiGraph(G)
     if len(odd_degree_nodes) == 0:
-        return G
+        return []
+    return match_odd_nodes(graph, odd_degree_nodes, nearest, radius, matching, workers)
 
-    # get all shortest paths between vertices of odd degree
-    odd_deg_pairs_paths = [
-        (m, {n: nx.shortest_path(G, source=m, target=n, weight=weight)})
-        for m, n in combinations(odd_degree_nodes, 2)
-    ]
-    # print(odd_deg_pairs_paths)
-    # print("odd degree pairs", len(odd_deg_pairs_paths))
 
+def match_odd_nodes(
+    graph: compact.CompactGraph,
+    odd_degree_nodes,
+    nearest=None,
+    radius=None,
+    matching="networkx",
+    workers=None,
+) -> list[int]:
+    # the edge ids along the shortest paths of a minimum weight matching of
+    # the given nodes
     # use the number of vertices in a graph + 1 as an upper bound on
     # the maximum length of a path in G
     # upper_bound_on_max_path_length = len(G) + 1
-    upper_bound_on_max_path_length = (
-        sum(x[weight] for _, _, x in G.edges(data=True)) + 1
-    )
+    upper_bound_on_max_path_length = sum(graph.weight.tolist()) + 1
+
+    # optionally only consider matching each odd node with its nearest odd
+    # nodes (or those within radius), widening the candidates until a perfect
+    # matching exists
+    if nearest is not None and nearest < 1:
+        raise ValueError("nearest must be at least 1")
+    if radius is not None and radius <= 0:
+        raise ValueError("radius must be positive")
+    if matching not in BACKENDS:
+        raise ValueError(f"unknown matching backend {matching}")
+    sparse = nearest is not None or radius is not None
+    while True:
+        with spans.span("paths", odd=len(odd_degree_nodes)) as span:
+            Gp, found = candidate_graph(
+                graph,
+                odd_degree_nodes,
+                upper_bound_on_max_path_length,
+                nearest,
+                radius,
+                workers,
+            )
+            span.count(pairs=Gp.number_of_edges())
+        # find the minimum weight matching of edges in the weighted graph
+        with spans.span("matching", pairs=Gp.number_of_edges()):
+            best_matching = nx.Graph(list(BACKENDS[matching](Gp, sparse)))
+        if 2 * best_matching.number_of_edges() == len(odd_degree_nodes):
+            break
+        assert sparse
+        if nearest is not None:
+            nearest *= 2
+        if radius is not None:
+            radius *= 2
+
+    # duplicate each edge along the shortest path of each matched pair, only
+    # building these paths rather than one for every candidate
+    added = []
+    for m, n in best_matching.edges():
+        added.extend(found.path(m, n))
+    return added
+
+
+def candidate_graph(
+    graph, odd_degree_nodes, upper_bound, nearest, radius, workers=None
+):
+    # get shortest path lengths between vertices of odd degree, running one
+    # search per odd node rather than one per pair, along with the search
+    # trees to build the paths of the matched pairs from
+    found = paths.odd_node_paths(graph, odd_degree_nodes, nearest, radius, workers)
+    # print("odd degree pairs", len(found.lengths))
 
     # use "len(G) + 1 - len(P)",
     # where P is a shortest path between vertices n and m,
     # as edge-weights in a new graph
-    # store the paths in the graph for easy indexing later
     Gp = nx.Graph()
-    for n, Ps in odd_deg_pairs_paths:
-        for m, P in Ps.items():
-            if n != m:
-                # TODO should just remove longer paths between nodes (as they
-                # will never be part of a shortest path) before finding shorter
-                # paths above as noted in
-                # https://groups.google.com/g/networkx-discuss/c/87uC9F0ug8Y/m/CrNNYEHLZfIJ
-                # instead assume that is what the shortest path algorithm did
-                length = multigraph_path_length(G, P, weight)
-                # print(n, m, P, length)
-                Gp.add_edge(
-                    m, n, weight=upper_bound_on_max_path_length - length, path=P
-                )
-
-    # find the minimum weight matching of edges in the weighted graph
-    best_matching = nx.Graph(list(nx.max_weight_matching(Gp)))
-
-    # duplicate each edge along each path in the set of paths in Gp
-    for m, n in best_matching.edges():
-        path = multigraph_shortest_path(G, Gp[m][n]["path"], weight)
-        # print(m, n, end="")
-        # for u, v, p in path:
-        #     print(" ", u, v, label_len(p), end="")
-        # print()
-        # G.add_edges_from(nx.utils.pairwise(path))
-        G.add_edges_from(path)
-    return G
-
-
-def multigraph_path_length(G, P, weight="weight"):
-    length = 0
-    for i in range(len(P) - 1):
-        minimum = None
-        for _, data in G.get_edge_data(P[i], P[i + 1]).items():
-            if minimum is None:
-                minimum = data[weight]
-            else:
-                minimum = min(minimum, data[weight])
-        assert minimum is not None
-        length += minimum
-    return length
-
-
-def multigraph_shortest_path(G, P, weight="weight"):
-    out_path = []
-    for i in range(len(P) - 1):
-        m = P[i]
-        n = P[i + 1]
-        minimum = None
-        for _, data in G.get_edge_data(m, n).items():
-            if minimum is None:
-                minimum = data
-            elif data[weight] < minimum[weight]:
-                minimum = data
-        assert minimum is not None
-        out_path.append((m, n, minimum))
-    return out_path
+    for (m, n), length in found.lengths.items():
+        # print(n, m, length)
+        Gp.add_edge(n, m, weight=upper_bound - length, length=length)
+    return Gp, found
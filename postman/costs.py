@@ -0,0 +1,70 @@
+import dataclasses
+
+import numpy as np
+
+# cost models take per edge distance, elevation gain and elevation loss arrays
+# (gain and loss measured from the start to the end of each edge's geometry)
+# and return the cost of traversing each edge forwards and in reverse
+
+
+@dataclasses.dataclass(frozen=True)
+class Linear:
+    # distance plus scaled climbing, and optionally scaled descending
+    scale: float = 1.0
+    descent: float = 0.0
+
+    def __call__(self, distance, gain, loss):
+        forward = distance + gain * self.scale + loss * self.descent
+        reverse = distance + loss * self.scale + gain * self.descent
+        return forward, reverse
+
+
+@dataclasses.dataclass(frozen=True)
+class Naismith:
+    # walking time in seconds, a flat speed plus extra time for climbing (and
+    # optionally descending), all in metres per second: 5 km and 600 m of
+    # climb each take an hour, descending adds nothing unless given a rate
+    # (langmuir's 10 minutes per 300 m of steep descent is 1800 / 3600)
+    speed: float = 5000 / 3600
+    climb: float = 600 / 3600
+    descent: float = np.inf
+
+    def __call__(self, distance, gain, loss):
+        forward = distance / self.speed + gain / self.climb + loss / self.descent
+        reverse = distance / self.speed + loss / self.climb + gain / self.descent
+        return forward, reverse
+
+
+@dataclasses.dataclass(frozen=True)
+class Tobler:
+    # walking time in seconds from tobler's hiking function, assuming the gain
+    # and loss of an edge are each spread evenly over their share of its length
+    speed: float = 6000 / 3600
+
+    def _time(self, distance, slope):
+        return distance / (self.speed * np.exp(-3.5 * np.abs(slope + 0.05)))
+
+    def __call__(self, distance, gain, loss):
+        distance = np.asarray(distance, dtype=float)
+        gain = np.asarray(gain, dtype=float)
+        loss = np.asarray(loss, dtype=float)
+        climb = gain + loss
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(distance > 0, climb / distance, 0.0)
+            up = np.where(climb > 0, distance * gain / climb, 0.0)
+        down = np.where(climb > 0, distance - up, 0.0)
+        flat = np.where(climb > 0, 0.0, distance)
+        forward = (
+            self._time(up, slope) + self._time(down, -slope) + self._time(flat, 0.0)
+        )
+        reverse = (
+            self._time(down, slope) + self._time(up, -slope) + self._time(flat, 0.0)
+        )
+        return forward, reverse
+
+
+MODELS = {
+    "linear": Linear,
+    "naismith": Naismith,
+    "tobler": Tobler,
+}
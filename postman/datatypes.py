@@ -3,7 +3,9 @@ import typing
 
 import shapely
 
-Tour = list[tuple[float, float, dict[str, typing.Any]]]
+# steps of a tour between two nodes, with read-only edge data oriented in the
+# direction walked
+Tour = list[tuple[typing.Any, typing.Any, typing.Mapping[str, typing.Any]]]
 
 
 @dataclasses.dataclass
@@ -14,3 +16,13 @@ class Track:
 
 
 TrackCollection = dict[int, Track]
+
+
+@dataclasses.dataclass
+class Node:
+    name: str
+    point: shapely.Point
+    edges: list[int]
+
+
+NodeCollection = dict[int, Node]
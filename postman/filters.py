@@ -0,0 +1,148 @@
+import ast
+import operator
+
+import numpy as np
+import pandas as pd
+
+# a small expression language picking trails by their attributes, e.g.
+#
+#   name == 'Ridge' or (difficulty in [1, 2] and not name.str.contains('Road'))
+#
+# expressions are parsed and walked here rather than handed to pandas eval,
+# which resolves any attribute and call and so runs arbitrary code, only
+# columns, literals, comparisons, boolean operators and a few string methods
+# are understood
+COMPARE = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+STRING_METHODS = {"contains", "startswith", "endswith"}
+
+
+def mask(trails: pd.DataFrame, expression: str) -> np.ndarray:
+    # a boolean per row of trails, true where the expression holds
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"can not parse expression: {e.msg}") from None
+    try:
+        out = _evaluate(tree.body, trails)
+    except TypeError as e:
+        raise ValueError(f"can not evaluate expression: {e}") from None
+    if not isinstance(out, pd.Series) or out.dtype != bool or len(out) != len(trails):
+        raise ValueError("expression must give true or false for every trail")
+    return out.to_numpy()
+
+
+def _evaluate(node, trails):
+    if isinstance(node, ast.BoolOp):
+        join = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        values = [_condition(value, trails) for value in node.values]
+        out = values[0]
+        for value in values[1:]:
+            out = join(out, value)
+        return out
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.BitAnd, ast.BitOr)):
+        join = np.logical_and if isinstance(node.op, ast.BitAnd) else np.logical_or
+        return join(_condition(node.left, trails), _condition(node.right, trails))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.Invert)):
+        return ~_condition(node.operand, trails)
+    if isinstance(node, ast.Compare):
+        return _compare(node, trails)
+    if isinstance(node, ast.Call):
+        return _string_method(node, trails)
+    if isinstance(node, ast.Name):
+        return _column(node, trails)
+    raise ValueError(f"unsupported expression: {ast.unparse(node)}")
+
+
+def _condition(node, trails) -> pd.Series:
+    out = _evaluate(node, trails)
+    if out.dtype != bool:
+        raise ValueError(f"not a condition: {ast.unparse(node)}")
+    return out
+
+
+def _compare(node: ast.Compare, trails) -> pd.Series:
+    # chains (a < b < c) hold where every comparison does
+    out = None
+    left = _operand(node.left, trails)
+    for op, right_node in zip(node.ops, node.comparators):
+        if isinstance(op, (ast.In, ast.NotIn)):
+            if not isinstance(left, pd.Series):
+                raise ValueError("in needs a column on the left")
+            values = _literal(right_node)
+            if not isinstance(values, list):
+                raise ValueError("in needs a list of values on the right")
+            result = left.isin(values)
+            if isinstance(op, ast.NotIn):
+                result = ~result
+            right = values
+        elif type(op) in COMPARE:
+            right = _operand(right_node, trails)
+            result = COMPARE[type(op)](left, right)
+        else:
+            raise ValueError(f"unsupported comparison: {ast.unparse(node)}")
+        if not isinstance(result, pd.Series):
+            raise ValueError(f"comparison of two literals: {ast.unparse(node)}")
+        out = result if out is None else out & result
+        left = right
+    return out
+
+
+def _operand(node, trails):
+    if isinstance(node, ast.Name):
+        return _column(node, trails)
+    return _literal(node)
+
+
+def _column(node: ast.Name, trails) -> pd.Series:
+    if node.id not in trails.columns or node.id == "geometry":
+        raise ValueError(f"no such column: {node.id}")
+    return trails[node.id]
+
+
+def _literal(node):
+    # numbers, strings, booleans and lists of them
+    if isinstance(node, ast.Constant) and isinstance(
+        node.value, (str, int, float, bool)
+    ):
+        return node.value
+    if (
+        isinstance(node, ast.UnaryOp)
+        and isinstance(node.op, ast.USub)
+        and isinstance(node.operand, ast.Constant)
+        and isinstance(node.operand.value, (int, float))
+    ):
+        return -node.operand.value
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_literal(element) for element in node.elts]
+    raise ValueError(f"unsupported value: {ast.unparse(node)}")
+
+
+def _string_method(node: ast.Call, trails) -> pd.Series:
+    # column.str.contains('text') and the like, matching literally
+    function = node.func
+    if not (
+        isinstance(function, ast.Attribute)
+        and function.attr in STRING_METHODS
+        and isinstance(function.value, ast.Attribute)
+        and function.value.attr == "str"
+        and isinstance(function.value.value, ast.Name)
+        and len(node.args) == 1
+        and not node.keywords
+    ):
+        raise ValueError(f"unsupported call: {ast.unparse(node)}")
+    text = _literal(node.args[0])
+    if not isinstance(text, str):
+        raise ValueError(f"{function.attr} needs a string")
+    strings = _column(function.value.value, trails).astype("string").str
+    if function.attr == "contains":
+        out = strings.contains(text, regex=False)
+    else:
+        out = getattr(strings, function.attr)(text)
+    return out.fillna(False).astype(bool)
@@ -0,0 +1,365 @@
+import heapq
+import math
+from itertools import combinations, count
+
+import networkx as nx
+import numpy as np
+
+from postman import compact, core, costs, paths
+from postman.matching import BACKENDS
+
+
+class IncrementalSolver:
+    # a solve which is kept up to date as edges are added, removed or
+    # re-weighted, keeping a full shortest path tree from every odd node and
+    # the previous matching so an edit only repeats the work it affects
+    #
+    # the matching is kept when it is still provably minimal, otherwise only
+    # the odd nodes whose pairs the edits touched are re-matched, which is
+    # kept when it reaches a lower bound on the new minimum, e.g. after
+    # closing or shortening a trail the route duplicates, and everything else
+    # (such as closing a trail the route doesn't duplicate) re-matches every
+    # pair of odd nodes as a full solve does
+    #
+    # edges are referred to by their id in the original compact graph, added
+    # edges get new ids after those and removed edges keep theirs unused
+
+    def __init__(
+        self,
+        graph: nx.MultiGraph | compact.CompactGraph,
+        matching="networkx",
+        cost=costs.Linear(10),
+    ):
+        if isinstance(graph, nx.MultiGraph):
+            graph = compact.from_graph(graph)
+        if matching not in BACKENDS:
+            raise ValueError(f"unknown matching backend {matching}")
+        self.matching = matching
+        self.cost = cost
+        self.nodes = list(graph.nodes)
+        self.index = dict(graph.index)
+        self.x = graph.x
+        self.y = graph.y
+        self.u = graph.u.tolist()
+        self.v = graph.v.tolist()
+        self.keys = list(graph.keys)
+        self.data = list(graph.data)
+        self.weight = compact.reweight(graph, cost).weight.tolist()
+        self.alive = [True] * len(self.u)
+        # edge id to the node at the other end, for every edge at each node
+        self.adjacency: list[dict[int, int]] = [{} for _ in self.nodes]
+        for e, (m, n) in enumerate(zip(self.u, self.v)):
+            self.adjacency[m][e] = n
+            self.adjacency[n][e] = m
+        # how much work the edits have needed
+        self.searches = 0
+        self.repairs = 0
+        self.matchings = 0
+        self.local_matchings = 0
+        # a tree for each odd node, so its keys are also the odd node set
+        odd = np.flatnonzero(compact.degree(graph) % 2 == 1).tolist()
+        self.trees = {s: self._search(s) for s in odd}
+        self._lengths: dict[tuple[int, int], float] | None = None
+        self._matched: set[tuple[int, int]] = set()
+        # since the last matching, how far below its length the new minimum
+        # could be, and the nodes and edges the edits touched
+        self._slack = 0.0
+        self._toggled: set[int] = set()
+        self._edited: set[int] = set()
+
+    def add_edge(self, m, n, data) -> int:
+        # join the nodes labelled m and n, returning the new edge id
+        e = len(self.u)
+        # joining two nodes can shorten the minimum by at most the distance
+        # which was between them
+        self._slack += self._distance(self.index[m], self.index[n])
+        self.u.append(self.index[m])
+        self.v.append(self.index[n])
+        self.keys.append(None)
+        self.data.append(dict(data))
+        self.weight.append(self._weight(self.data[e]))
+        self.alive.append(True)
+        self.adjacency[self.u[e]][e] = self.v[e]
+        self.adjacency[self.v[e]][e] = self.u[e]
+        self._update(e, math.inf, self.weight[e], parity=True)
+        return e
+
+    def remove_edge(self, e):
+        if not self.alive[e]:
+            raise ValueError(f"edge {e} has already been removed")
+        self.alive[e] = False
+        del self.adjacency[self.u[e]][e]
+        self.adjacency[self.v[e]].pop(e, None)
+        self._update(e, self.weight[e], math.inf, parity=True)
+
+    def update_edge(self, e, **changes):
+        # change some of the attributes of an edge, e.g. its distance
+        if not self.alive[e]:
+            raise ValueError(f"edge {e} has been removed")
+        before = self.weight[e]
+        self.data[e] = {**self.data[e], **changes}
+        self.weight[e] = self._weight(self.data[e])
+        self._update(e, before, self.weight[e], parity=False)
+
+    def graph(self) -> tuple[compact.CompactGraph, list[int]]:
+        # the current compact graph and the edge id of each of its edges
+        alive = [e for e, a in enumerate(self.alive) if a]
+        graph = compact.from_edges(
+            self.nodes,
+            self.x,
+            self.y,
+            [self.u[e] for e in alive],
+            [self.v[e] for e in alive],
+            [self.keys[e] for e in alive],
+            [self.data[e] for e in alive],
+        )
+        return compact.reweight(graph, self.cost), alive
+
+    def eulerize(self) -> list[int]:
+        # the edge ids which need to be duplicated, as core.eulerize would
+        # return on the current graph
+        odd = sorted(self.trees)
+        lengths = {}
+        for s, t in combinations(odd, 2):
+            dist = self.trees[s][0]
+            if t not in dist:
+                raise nx.NetworkXError("G is not connected")
+            lengths[(s, t)] = dist[t]
+        if not self._still_optimal(lengths):
+            matched = self._repair(lengths)
+            if matched is None:
+                matched = self._match(lengths)
+            self._matched = matched
+        self._lengths = lengths
+        self._slack = 0.0
+        self._toggled = set()
+        self._edited = set()
+        added = []
+        for s, t in sorted(self._matched):
+            added.extend(paths.path_from_predecessors(self.trees[s][1], t))
+        return added
+
+    def solve(self) -> core.Solver:
+        graph, alive = self.graph()
+        if len(graph.nodes) == 0:
+            raise nx.NetworkXPointlessConcept("Cannot Eulerize null graph")
+        if not compact.is_connected(graph):
+            raise nx.NetworkXError("G is not connected")
+        position = {e: i for i, e in enumerate(alive)}
+        return core.circuit_solver(graph, [position[e] for e in self.eulerize()])
+
+    def _weight(self, data) -> float:
+        forward, reverse = self.cost(
+            *(
+                np.array([data.get(key, np.nan)], dtype=float)
+                for key in ("distance", "elevation_gain", "elevation_loss")
+            )
+        )
+        return float((np.asarray(forward) + np.asarray(reverse))[0] / 2)
+
+    def _update(self, e, before, after, parity):
+        # bring the trees up to date after the weight of e changed from before
+        # to after (infinite when the edge is absent)
+        m, n = self.u[e], self.v[e]
+        if m == n:
+            # a loop neither changes parity nor lies on a shortest path
+            return
+        self._edited.add(e)
+        # the minimum pairing uses an edge at most once (dropping two copies
+        # keeps every parity), so it shrinks by at most the weight an edge
+        # lost, for a removed edge its whole weight
+        if after < before and not parity:
+            self._slack += before - after
+        elif after > before and parity:
+            self._slack += before
+        new = []
+        if parity:
+            self._toggled ^= {m, n}
+            for i in (m, n):
+                if i in self.trees:
+                    del self.trees[i]
+                else:
+                    new.append(i)
+        if after < before:
+            for dist, pred in self.trees.values():
+                self._decrease(dist, pred, e)
+        elif after > before:
+            for dist, pred in self.trees.values():
+                self._increase(dist, pred, e)
+        for i in new:
+            self.trees[i] = self._search(i)
+
+    def _distance(self, i, j) -> float:
+        # the shortest path length between nodes i and j
+        for s, t in ((i, j), (j, i)):
+            if s in self.trees:
+                return self.trees[s][0].get(t, math.inf)
+        return self._search(i, j)[0].get(j, math.inf)
+
+    def _search(self, source, target=None):
+        # a single source dijkstra, see paths.multi_target_dijkstra, over the
+        # whole graph or until target is settled
+        self.searches += 1
+        dist = {}
+        pred = {source: None}
+        seen = {source: 0.0}
+        tie = count()
+        heap = [(0.0, next(tie), source)]
+        while heap:
+            d, _, i = heapq.heappop(heap)
+            if i in dist:
+                continue
+            dist[i] = d
+            if i == target:
+                break
+            for e, j in self.adjacency[i].items():
+                if j in dist:
+                    continue
+                length = d + self.weight[e]
+                if j not in seen or length < seen[j]:
+                    seen[j] = length
+                    pred[j] = (i, e)
+                    heapq.heappush(heap, (length, next(tie), j))
+        return dist, pred
+
+    def _decrease(self, dist, pred, e):
+        # push the improvements from a cheaper (or new) edge e out through a
+        # tree, only visiting the nodes which get closer
+        tie = count()
+        heap = []
+        m, n = self.u[e], self.v[e]
+        for i, j in ((m, n), (n, m)):
+            if i in dist and dist[i] + self.weight[e] < dist.get(j, math.inf):
+                dist[j] = dist[i] + self.weight[e]
+                pred[j] = (i, e)
+                heapq.heappush(heap, (dist[j], next(tie), j))
+        while heap:
+            d, _, i = heapq.heappop(heap)
+            if d > dist[i]:
+                continue
+            for f, j in self.adjacency[i].items():
+                length = d + self.weight[f]
+                if length < dist.get(j, math.inf):
+                    dist[j] = length
+                    pred[j] = (i, f)
+                    heapq.heappush(heap, (length, next(tie), j))
+
+    def _increase(self, dist, pred, e):
+        # re-search only the subtree below e when a tree uses it, the rest of
+        # the tree is unaffected by an edge getting longer (or going)
+        m, n = self.u[e], self.v[e]
+        if pred.get(n) == (m, e):
+            root = n
+        elif pred.get(m) == (n, e):
+            root = m
+        else:
+            return
+        self.repairs += 1
+        subtree = {root}
+        stack = [root]
+        while stack:
+            i = stack.pop()
+            for f, j in self.adjacency[i].items():
+                if j not in subtree and pred.get(j) == (i, f):
+                    subtree.add(j)
+                    stack.append(j)
+        # then a dijkstra within the subtree starting from its best links to
+        # the rest of the tree
+        for i in subtree:
+            del dist[i]
+            del pred[i]
+        tie = count()
+        heap = []
+        for i in subtree:
+            for f, j in self.adjacency[i].items():
+                if j in dist:
+                    length = dist[j] + self.weight[f]
+                    if length < dist.get(i, math.inf):
+                        dist[i] = length
+                        pred[i] = (j, f)
+            if i in dist:
+                heapq.heappush(heap, (dist[i], next(tie), i))
+        settled = set()
+        while heap:
+            d, _, i = heapq.heappop(heap)
+            if i in settled or d > dist[i]:
+                continue
+            settled.add(i)
+            for f, j in self.adjacency[i].items():
+                if j not in subtree or j in settled:
+                    continue
+                length = d + self.weight[f]
+                if length < dist.get(j, math.inf):
+                    dist[j] = length
+                    pred[j] = (i, f)
+                    heapq.heappush(heap, (length, next(tie), j))
+
+    def _still_optimal(self, lengths) -> bool:
+        # the previous matching is still a minimum one over the same odd nodes
+        # if no matched pair got longer and no unmatched pair got shorter, as
+        # any other matching then gained at least as much as it did
+        if self._lengths is None or self._lengths.keys() != lengths.keys():
+            return False
+        for pair, length in lengths.items():
+            before = self._lengths[pair]
+            if pair in self._matched and length > before:
+                return False
+            if pair not in self._matched and length < before:
+                return False
+        return True
+
+    def _repair(self, lengths) -> set[tuple[int, int]] | None:
+        # keep the matched pairs the edits didn't touch and re-match the rest,
+        # which is a minimum matching if it is no longer than the previous
+        # one less the slack, None when it isn't
+        if self._lengths is None or math.isinf(self._slack):
+            return None
+        odd = set(self.trees)
+        # the nodes to re-match, the new odd nodes and those in pairs which
+        # lost an end, changed length or pass through an edited node or edge
+        free = odd & self._toggled
+        for s, t in self._matched:
+            if s not in odd or t not in odd:
+                free |= odd & {s, t}
+            elif lengths[(s, t)] != self._lengths[(s, t)] or self._touches(s, t):
+                free |= {s, t}
+        kept = {(s, t) for s, t in self._matched if s not in free and t not in free}
+        free |= odd - {n for pair in kept for n in pair}
+        local = {(s, t): lengths[(s, t)] for s, t in combinations(sorted(free), 2)}
+        self.local_matchings += 1
+        matched = kept | self._pairs(local)
+        if 2 * len(matched) != len(odd):
+            return None
+        before = sum(self._lengths[pair] for pair in self._matched)
+        after = sum(lengths[pair] for pair in matched)
+        if after > before - self._slack + 1e-9 * max(1.0, before):
+            return None
+        return matched
+
+    def _touches(self, s, t) -> bool:
+        # whether the current path between s and t passes through an edited
+        # edge or a node whose parity changed
+        for e in paths.path_from_predecessors(self.trees[s][1], t):
+            if e in self._edited:
+                return True
+            if self.u[e] in self._toggled or self.v[e] in self._toggled:
+                return True
+        return False
+
+    def _match(self, lengths) -> set[tuple[int, int]]:
+        # a fresh matching over every pair, as in core.candidate_graph
+        self.matchings += 1
+        matched = self._pairs(lengths)
+        if 2 * len(matched) != len(self.trees):
+            raise nx.NetworkXError("no perfect matching of the odd nodes")
+        return matched
+
+    def _pairs(self, lengths) -> set[tuple[int, int]]:
+        # a minimum matching of the pairs with the given lengths
+        if len(lengths) == 0:
+            return set()
+        upper_bound = sum(w for w, a in zip(self.weight, self.alive) if a) + 1
+        Gp = nx.Graph()
+        for (m, n), length in lengths.items():
+            Gp.add_edge(n, m, weight=upper_bound - length, length=length)
+        return {tuple(sorted(pair)) for pair in BACKENDS[self.matching](Gp, False)}
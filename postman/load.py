@@ -1,4 +1,7 @@
-import gpxpy
+import array
+from xml.etree import ElementTree
+
+import numpy as np
 import shapely
 
 from postman import datatypes
@@ -7,30 +10,64 @@ from postman import datatypes
 def load_gpx(
     filename: str,
 ) -> tuple[datatypes.TrackCollection, datatypes.NodeCollection]:
-    with open(filename) as fp:
-        gpx = gpxpy.parse(fp)
-    id = 0
-    tracks = {}
-    for track in gpx.tracks:
-        name = track.name.strip("\n")
-        print("track", name)
-        print(len(track.segments))
-        print(track.segments[0].points)
-        points = []
-        for segment in track.segments:
-            for point in segment.points:
-                elevation = point.elevation if point.elevation is not None else 0.0
-                points.append((point.longitude, point.latitude, elevation))
-        print(points)
-        tracks[id] = datatypes.Track(name, shapely.LineString(points))
-        id += 1
-    waypoints = {}
-    id = 0
-    for waypoint in gpx.waypoints:
-        waypoints[id] = datatypes.Node(
-            f"{str(id)} {waypoint.name}",
-            shapely.Point((waypoint.longitude, waypoint.latitude)),
-            [],
-        )
-        id += 1
-    return tracks, waypoints
+    # tracks (with every segment joined) and waypoints from a gpx file, parsed
+    # incrementally into flat coordinate arrays and discarding each point's
+    # element once read so memory stays close to the size of the coordinates
+    coords = array.array("d")
+    track_index = array.array("q")
+    names = []
+    waypoints: datatypes.NodeCollection = {}
+    # the local names and elements of the currently open elements
+    tags: list[str] = []
+    elements: list[ElementTree.Element] = []
+    elevation = 0.0
+    name = ""
+    for event, element in ElementTree.iterparse(filename, events=("start", "end")):
+        tag = element.tag.rpartition("}")[2]
+        if event == "start":
+            tags.append(tag)
+            elements.append(element)
+            if tag == "trk":
+                names.append("")
+            elif tag in ("trkpt", "wpt"):
+                elevation = 0.0
+                name = ""
+            continue
+        tags.pop()
+        elements.pop()
+        parent = tags[-1] if tags else None
+        if tag == "ele" and parent == "trkpt" and element.text:
+            elevation = float(element.text)
+        elif tag == "name" and parent == "trk":
+            names[-1] = (element.text or "").strip("\n")
+        elif tag == "name" and parent == "wpt":
+            name = element.text or ""
+        elif tag == "trkpt":
+            coords.extend(
+                (float(element.get("lon")), float(element.get("lat")), elevation)
+            )
+            track_index.append(len(names) - 1)
+        elif tag == "wpt":
+            id = len(waypoints)
+            waypoints[id] = datatypes.Node(
+                f"{id} {name}",
+                shapely.Point(float(element.get("lon")), float(element.get("lat"))),
+                [],
+            )
+        if tag in ("trkpt", "wpt", "trkseg", "trk") and elements:
+            # the element just ended is always the last child of its parent
+            del elements[-1][-1]
+    # then the tracks in bulk, with an empty line for any without points
+    present, index = np.unique(
+        np.frombuffer(track_index, dtype=np.int64), return_inverse=True
+    )
+    paths = [shapely.LineString()] * len(names)
+    for i, path in zip(
+        present.tolist(),
+        shapely.linestrings(np.frombuffer(coords).reshape(-1, 3), indices=index),
+    ):
+        paths[i] = path
+    return {
+        id: datatypes.Track(name, id, path)
+        for id, (name, path) in enumerate(zip(names, paths))
+    }, waypoints
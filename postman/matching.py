@@ -0,0 +1,80 @@
+import networkx as nx
+import numpy as np
+import scipy.optimize
+import scipy.sparse
+
+# each backend takes the candidate graph of odd nodes, where every edge has the
+# shortest path "length" between its nodes and the transformed "weight" used
+# for maximum weight matching, and returns a set of matched node pairs which is
+# allowed to be less than perfect when the candidates are sparse
+
+
+def networkx_matching(Gp: nx.Graph, sparse=False) -> set:
+    return nx.max_weight_matching(Gp, sparse)
+
+
+def milp_matching(Gp: nx.Graph, sparse=False) -> set:
+    # exact minimum weight perfect matching as a binary program solved by HiGHS
+    nodes = {n: i for i, n in enumerate(Gp)}
+    edges = list(Gp.edges(data="length"))
+    if len(edges) == 0:
+        return set()
+    rows = np.array([nodes[m] for m, _, _ in edges] + [nodes[n] for _, n, _ in edges])
+    columns = np.tile(np.arange(len(edges)), 2)
+    incidence = scipy.sparse.csr_array(
+        (np.ones(len(rows)), (rows, columns)), shape=(len(nodes), len(edges))
+    )
+    result = scipy.optimize.milp(
+        np.array([length for _, _, length in edges], dtype=float),
+        constraints=scipy.optimize.LinearConstraint(incidence, 1, 1),
+        integrality=np.ones(len(edges)),
+        bounds=scipy.optimize.Bounds(0, 1),
+    )
+    if result.x is None:
+        # no perfect matching within the candidates
+        return set()
+    return {(edges[i][0], edges[i][1]) for i in np.flatnonzero(result.x > 0.5)}
+
+
+def greedy_matching(Gp: nx.Graph, sparse=False) -> set:
+    # heuristic for very many odd nodes, match the closest pairs first then
+    # improve with 2-opt swaps between matched pairs joined by a candidate edge
+    mate = {}
+    for m, n, _ in sorted(Gp.edges(data="length"), key=lambda x: x[2]):
+        if m not in mate and n not in mate:
+            mate[m] = n
+            mate[n] = m
+
+    def length(m, n):
+        data = Gp.get_edge_data(m, n)
+        return None if data is None else data["length"]
+
+    improved = True
+    while improved:
+        improved = False
+        for a in list(mate):
+            b = mate[a]
+            for c in Gp[a]:
+                if c == b or c not in mate:
+                    continue
+                d = mate[c]
+                bd = length(b, d)
+                if bd is None:
+                    continue
+                if length(a, c) + bd < length(a, b) + length(c, d) - 1e-9:
+                    mate[a], mate[c] = c, a
+                    mate[b], mate[d] = d, b
+                    improved = True
+                    break
+    pairs: set = set()
+    for m, n in mate.items():
+        if (n, m) not in pairs:
+            pairs.add((m, n))
+    return pairs
+
+
+BACKENDS = {
+    "networkx": networkx_matching,
+    "milp": milp_matching,
+    "greedy": greedy_matching,
+}
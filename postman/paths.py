@@ -0,0 +1,246 @@
+import dataclasses
+import heapq
+import math
+import multiprocessing
+from itertools import chain, count
+
+import numpy as np
+
+from postman import compact
+
+
+def path_length(graph: compact.CompactGraph, edges):
+    length = 0
+    for e in edges:
+        length += graph.weight[e]
+    return length
+
+
+def multi_target_dijkstra(
+    graph: compact.CompactGraph, source, targets, limit=None, cutoff=None
+):
+    # single source dijkstra that stops as soon as every target (or the
+    # nearest limit targets) is settled, or the search passes cutoff, the
+    # predecessor of each node is stored along with the edge used to reach it
+    # so the cheapest of any parallel edges is remembered
+    #
+    # targets (a set or dict) is only tested for membership, never copied, so
+    # it can be shared between searches
+    offsets, neighbours, edges, weights = graph.adjacency
+    wanted = len(targets) - (source in targets)
+    if limit is not None:
+        wanted = min(limit, wanted)
+    found = 0
+    dist: dict[int, float] = {}
+    pred: dict[int, tuple[int, int] | None] = {source: None}
+    seen = {source: 0}
+    tie = count()
+    heap = [(0, next(tie), source)]
+    while heap and found < wanted:
+        d, _, u = heapq.heappop(heap)
+        if u in dist:
+            continue
+        dist[u] = d
+        if u in targets and u != source:
+            found += 1
+        for h in range(offsets[u], offsets[u + 1]):
+            v = neighbours[h]
+            if v in dist:
+                continue
+            length = d + weights[h]
+            if cutoff is not None and length > cutoff:
+                continue
+            if v not in seen or length < seen[v]:
+                seen[v] = length
+                pred[v] = (u, edges[h])
+                heapq.heappush(heap, (length, next(tie), v))
+    return dist, pred
+
+
+def path_from_predecessors(pred, target):
+    # the edge ids from the source of the search to target
+    path = []
+    while pred[target] is not None:
+        target, edge = pred[target]
+        path.append(edge)
+    path.reverse()
+    return path
+
+
+# the fewest sources searched in a pool, below this starting and feeding the
+# pool costs more than sharing the searches saves, even over two cores (see
+# benchmarks/parallel.py)
+PARALLEL_SOURCES = 400
+
+
+@dataclasses.dataclass
+class PairPaths:
+    # shortest path lengths between pairs of nodes, keyed (m, n) with m before
+    # n in the searched nodes, and the part of the shortest path tree of each
+    # search reaching the nodes it found, so a path is only built for the
+    # pairs which are used
+    lengths: dict[tuple[int, int], float]
+    trees: dict[int, dict]
+
+    def path(self, m, n) -> list[int]:
+        # the edge ids between the pair of m and n (in either order), from the
+        # first of the pair to the second
+        if (m, n) not in self.lengths:
+            m, n = n, m
+        # the length came from the search from m if that search found n
+        tree = self.trees.get(m)
+        if tree is not None and n in tree:
+            return path_from_predecessors(tree, n)
+        path = path_from_predecessors(self.trees[n], m)
+        path.reverse()
+        return path
+
+
+def odd_node_paths(
+    graph: compact.CompactGraph, nodes, nearest=None, radius=None, workers=None
+) -> PairPaths:
+    # shortest path lengths between pairs of nodes using a single bounded
+    # search per node instead of one search per pair, by default every pair in
+    # combinations(nodes, 2) is returned, otherwise only pairs where one is
+    # among the nearest of the other or within radius of it
+    #
+    # with workers > 1 and at least PARALLEL_SOURCES searches they are split
+    # over a process pool, the results are merged in the same order as
+    # serially so they are identical
+    if nearest is None and radius is None:
+        # the last node has no later nodes to pair with
+        sources = range(len(nodes) - 1)
+    else:
+        sources = range(len(nodes))
+    # the position of each node, also the targets of the sparse searches
+    order = {n: j for j, n in enumerate(nodes)}
+    if workers is None or workers <= 1 or len(sources) < PARALLEL_SOURCES:
+        results = list(_source_searches(graph, nodes, order, sources, nearest, radius))
+    else:
+        results = _parallel_source_search(
+            graph, nodes, order, sources, nearest, radius, workers
+        )
+    lengths: dict[tuple[int, int], float] = {}
+    trees = {}
+    for i, (targets, dists, tree) in zip(sources, results):
+        source = nodes[i]
+        trees[source] = tree
+        for target, length in zip(targets, dists):
+            if order[target] < i:
+                lengths.setdefault((target, source), length)
+            else:
+                lengths.setdefault((source, target), length)
+    return PairPaths(lengths, trees)
+
+
+def _source_searches(graph, nodes, order, sources, nearest, radius):
+    # for each i in the range sources the nodes found by the search from
+    # nodes[i], their lengths and the predecessors on the paths to them, the
+    # searches share one lookup of their targets rather than each building one
+    if nearest is None and radius is None:
+        # the nodes after the source, shrinking as the sources advance
+        later = set(nodes[sources.start :])
+        for i in sources:
+            source = nodes[i]
+            later.discard(source)
+            dist, pred = multi_target_dijkstra(graph, source, later)
+            targets = nodes[i + 1 :]
+            yield targets, [dist[n] for n in targets], _tree(pred, targets)
+    else:
+        for i in sources:
+            source = nodes[i]
+            dist, pred = multi_target_dijkstra(
+                graph, source, order, limit=nearest, cutoff=radius
+            )
+            targets = [n for n in dist if n != source and n in order]
+            yield targets, [dist[n] for n in targets], _tree(pred, targets)
+
+
+def _tree(pred, targets):
+    # the predecessors of the nodes on the paths to targets
+    tree = {}
+    for node in targets:
+        while node not in tree:
+            tree[node] = pred[node]
+            if pred[node] is None:
+                break
+            node = pred[node][0]
+    return tree
+
+
+# the graph, nodes and their positions shared with each worker process,
+# inherited without copying when processes are forked and otherwise sent once
+# per worker
+_shared = None
+
+
+def _share(graph, nodes, order):
+    global _shared
+    _shared = (graph, nodes, order)
+
+
+def _chunk_search(chunk):
+    # the searches from a range of sources, packed into arrays as they pickle
+    # far faster than lists and dicts
+    start, stop, nearest, radius = chunk
+    graph, nodes, order = _shared
+    results = list(
+        _source_searches(graph, nodes, order, range(start, stop), nearest, radius)
+    )
+    trees = [tree for _, _, tree in results]
+    return (
+        np.array([len(targets) for targets, _, _ in results], dtype=np.int64),
+        np.fromiter(
+            chain.from_iterable(targets for targets, _, _ in results), dtype=np.int64
+        ),
+        np.fromiter(chain.from_iterable(dists for _, dists, _ in results), dtype=float),
+        np.array([len(tree) for tree in trees], dtype=np.int64),
+        np.fromiter(chain.from_iterable(trees), dtype=np.int64),
+        np.fromiter(
+            (-1 if p is None else p[0] for tree in trees for p in tree.values()),
+            dtype=np.int64,
+        ),
+        np.fromiter(
+            (-1 if p is None else p[1] for tree in trees for p in tree.values()),
+            dtype=np.int64,
+        ),
+    )
+
+
+def _unpack(sizes, targets, dists, tree_sizes, tree_nodes, parents, edges):
+    targets = targets.tolist()
+    dists = dists.tolist()
+    steps = [
+        None if p < 0 else (p, e) for p, e in zip(parents.tolist(), edges.tolist())
+    ]
+    tree_nodes = tree_nodes.tolist()
+    ends = np.cumsum(sizes).tolist()
+    tree_ends = np.cumsum(tree_sizes).tolist()
+    out = []
+    for start, end, tree_start, tree_end in zip(
+        [0] + ends[:-1], ends, [0] + tree_ends[:-1], tree_ends
+    ):
+        tree = dict(zip(tree_nodes[tree_start:tree_end], steps[tree_start:tree_end]))
+        out.append((targets[start:end], dists[start:end], tree))
+    return out
+
+
+def _parallel_source_search(graph, nodes, order, sources, nearest, radius, workers):
+    # build the cached adjacency lists once, before they are shared
+    graph.adjacency
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    # several contiguous chunks per worker to even out their search times
+    size = max(1, math.ceil(len(sources) / (4 * workers)))
+    chunks = [
+        (start, min(start + size, len(sources)), nearest, radius)
+        for start in range(0, len(sources), size)
+    ]
+    with context.Pool(
+        workers, initializer=_share, initargs=(graph, nodes, order)
+    ) as pool:
+        return [
+            result
+            for packed in pool.map(_chunk_search, chunks)
+            for result in _unpack(*packed)
+        ]
@@ -1,29 +1,41 @@
-import sys
-from itertools import combinations
-
 import geopandas
-import momepy
 import networkx as nx
 import numpy as np
+import pandas as pd
 import shapely
-import shapely.plotting
 
 from postman import utils
 
+# tolerances (in metres) used to clean up trail connections
+EXTEND_TOLERANCE = 1.0
+GAP_TOLERANCE = 0.1
+
+
+def fix_trails(
+    trails: geopandas.GeoDataFrame,
+    extend_tolerance=EXTEND_TOLERANCE,
+    gap_tolerance=GAP_TOLERANCE,
+):
+    # momepy pulls in a lot and is only needed before anything is cached
+    import momepy
 
-def fix_trails(trails: geopandas.GeoDataFrame):
     # remove any empty geometries
     new = trails.drop(trails[trails.geometry == None].index)
     # fix bad connections, the order seems to matter here
-    new = momepy.extend_lines(new, 1.0)
-    new.geometry = momepy.close_gaps(new, 0.1)
+    new = momepy.extend_lines(new, extend_tolerance)
+    new.geometry = momepy.close_gaps(new, gap_tolerance)
     new = momepy.remove_false_nodes(new)
     new = fix_nans(trails, new)
-    new.geometry = momepy.close_gaps(new, 0.1)
+    new.geometry = momepy.close_gaps(new, gap_tolerance)
     return new
 
 
 def fix_nans(old, new):
+    # recover the attributes of lines which lost them while being merged by
+    # finding an original line with the same length, a line merged from
+    # several originals matches none of them so its distance and elevation
+    # stats are measured from its own geometry instead (rather than left nan,
+    # which made its network unsolvable) and its name and number stay empty
     keys = [
         "name",
         "number",
@@ -31,48 +43,86 @@ def fix_nans(old, new):
         "elevation_gain",
         "elevation_loss",
     ]
-    for i, row in new.iterrows():
-        if np.isnan(row["distance"]):
-            distance = row["geometry"].length
-            # print(i, distance)
-            for j, other in old.iterrows():
-                if abs(other["distance"] - distance) < 0.1:
-                    # print("    ", j, other["distance"])
-                    for key in keys:
-                        new.at[i, key] = other[key]
+    missing = np.flatnonzero(np.isnan(new["distance"].to_numpy(dtype=float)))
+    matches = match_lengths(
+        old["distance"].to_numpy(dtype=float),
+        shapely.length(np.asarray(new.geometry.array)[missing]),
+    )
+    found = matches >= 0
+    rows = new.index[missing[found]]
+    for key in keys:
+        new.loc[rows, key] = old[key].to_numpy()[matches[found]]
+    merged = new.loc[new.index[missing[~found]]].copy()
+    if len(merged) > 0:
+        add_elevation_stats(merged)
+        stats = ["distance", "elevation_gain", "elevation_loss"]
+        new.loc[merged.index, stats] = merged[stats]
     return new
 
 
+def match_lengths(lengths, queries, tolerance=0.1):
+    # for each query the position of the last of lengths within tolerance of
+    # it, or -1 if there is none, using a sorted index rather than comparing
+    # every pair
+    lengths = np.asarray(lengths, dtype=float)
+    queries = np.asarray(queries, dtype=float)
+    order = np.argsort(lengths, kind="stable")
+    ordered = lengths[order]
+    # widen the search window slightly then check candidates exactly so the
+    # result matches abs(length - query) < tolerance
+    slack = tolerance * 1e-6
+    low = np.searchsorted(ordered, queries - tolerance - slack, side="left")
+    high = np.searchsorted(ordered, queries + tolerance + slack, side="right")
+    out = np.full(len(queries), -1, dtype=np.int64)
+    for i in np.flatnonzero(high > low):
+        candidates = order[low[i] : high[i]]
+        candidates = candidates[np.abs(lengths[candidates] - queries[i]) < tolerance]
+        if len(candidates) > 0:
+            out[i] = candidates.max()
+    return out
+
+
 def to_graph(trails):
+    import momepy
+
     return momepy.gdf_to_nx(
         trails, approach="primal", integer_labels=True, preserve_index=True
     )
 
 
+def edge_data(trails, index_positions):
+    # the edge attribute dicts to_graph creates for the given rows of trails,
+    # like momepy index_position is the position of a row, not its label,
+    # which is kept as index unless trails has the default index
+    custom_index = not trails.index.equals(pd.RangeIndex(len(trails)))
+    out = []
+    for position in index_positions:
+        data = trails.iloc[position].to_dict()
+        data["mm_len"] = data["geometry"].length
+        data["index_position"] = position
+        if custom_index:
+            data["index"] = trails.index[position]
+        out.append(data)
+    return out
+
+
 def add_elevation_stats(trails):
-    for i, row in trails.iterrows():
-        geometry = row["geometry"]
-        if geometry is None:
-            trails.at[i, "distance"] = None
-        else:
-            up = 0
-            down = 0
-            last_z = None
-            for x, y, z in geometry.coords:
-                if last_z is None:
-                    last_z = z
-                else:
-                    delta = z - last_z
-                    if delta > 0:
-                        up += delta
-                    else:
-                        down += delta * -1
-                    last_z = z
-            # print(
-            #     "{:3d} {:10.3f} {:8.3f} {:8.3f} {}".format(
-            #         i, geometry.length, up, down, utils._name(row)
-            #     )
-            # )
-            trails.at[i, "distance"] = geometry.length
-            trails.at[i, "elevation_gain"] = up
-            trails.at[i, "elevation_loss"] = down
+    # distance, elevation gain and elevation loss of every line at once from
+    # the flattened coordinates of all geometries
+    geometry = np.asarray(trails.geometry.array)
+    counts = shapely.get_num_coordinates(geometry)
+    coordinates = shapely.get_coordinates(geometry, include_z=True)
+    ids = np.repeat(np.arange(len(geometry)), counts)
+    delta = np.diff(coordinates[:, 2])
+    # ignore the differences between the end of one line and the next
+    within = ids[1:] == ids[:-1]
+    up = np.where(within & (delta > 0), delta, 0)
+    down = np.where(within & (delta <= 0), delta * -1, 0)
+    missing = shapely.is_missing(geometry)
+    trails["distance"] = shapely.length(geometry)
+    trails["elevation_gain"] = np.where(
+        missing, np.nan, np.bincount(ids[:-1], up, minlength=len(geometry))
+    )
+    trails["elevation_loss"] = np.where(
+        missing, np.nan, np.bincount(ids[:-1], down, minlength=len(geometry))
+    )
@@ -0,0 +1,145 @@
+import collections
+import heapq
+from itertools import count
+
+import networkx as nx
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+
+from postman import compact, core, costs, paths, spans
+
+
+def solve(
+    graph: nx.MultiGraph | compact.CompactGraph,
+    required=None,
+    nearest=None,
+    radius=None,
+    matching="networkx",
+    cost=costs.Linear(10),
+    workers=None,
+    start=None,
+) -> core.Solver:
+    # a tour covering only the required edges (by default those with a true
+    # "required" attribute) using any others to get between them, and passing
+    # start if given even when it is off the required edges
+    #
+    # the components of the required edges are joined by shortest paths along
+    # a spanning tree of them, then the odd nodes of that are matched by
+    # shortest paths through the whole network, as in frederickson's
+    # heuristic for the rural postman problem
+    if isinstance(graph, nx.MultiGraph):
+        graph = compact.from_graph(graph)
+    graph = compact.reweight(graph, cost)
+    if required is None:
+        required = [bool(d.get("required", False)) for d in graph.data]
+    required = np.flatnonzero(np.asarray(required, dtype=bool))
+    if len(required) == 0:
+        raise nx.NetworkXPointlessConcept("No required edges")
+    terminals = []
+    if start is not None:
+        if start not in graph.index:
+            raise ValueError(f"start node {start} is not in the network")
+        terminals.append(graph.index[start])
+    with spans.span("connectors", required=len(required)):
+        walked = required.tolist() + connectors(graph, required, terminals)
+    degree = np.bincount(
+        np.concatenate([graph.u[walked], graph.v[walked]]), minlength=len(graph.nodes)
+    )
+    odd_degree_nodes = np.flatnonzero(degree % 2 == 1).tolist()
+    if len(odd_degree_nodes) > 0:
+        walked += core.match_odd_nodes(
+            graph, odd_degree_nodes, nearest, radius, matching, workers
+        )
+    # the edges walked at least once form the graph with any others added
+    counts = collections.Counter(walked)
+    edges = sorted(counts)
+    position = {e: i for i, e in enumerate(edges)}
+    added = [position[e] for e in edges for _ in range(counts[e] - 1)]
+    return core.circuit_solver(compact.subgraph(graph, edges), added)
+
+
+def connectors(graph: compact.CompactGraph, required, terminals=()) -> list[int]:
+    # the edge ids of shortest paths joining every component of the required
+    # edges and any terminal nodes, with a multi source search growing a
+    # region around each component and joining neighbouring regions in a
+    # spanning tree (mehlhorn's steiner tree approximation), the search stops
+    # once the tree is complete so it only explores the network around them
+    n = len(graph.nodes)
+    matrix = scipy.sparse.csr_array(
+        (np.ones(len(required)), (graph.u[required], graph.v[required])),
+        shape=(n, n),
+    )
+    _, labels = scipy.sparse.csgraph.connected_components(matrix, directed=False)
+    # a terminal off the required edges is a component of its own
+    sources = np.unique(
+        np.concatenate(
+            [graph.u[required], graph.v[required], np.asarray(terminals, dtype=int)]
+        )
+    )
+    _, group = np.unique(labels[sources], return_inverse=True)
+    groups = int(group.max()) + 1
+    parent = list(range(groups))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    offsets, neighbours, edges, weights = graph.adjacency
+    dist: dict[int, float] = {}
+    region: dict[int, int] = {}
+    pred: dict[int, tuple[int, int] | None] = {}
+    seen: dict[int, float] = {}
+    tie = count()
+    heap = []
+    for source, g in zip(sources.tolist(), group.ravel().tolist()):
+        pred[source] = None
+        seen[source] = 0.0
+        heap.append((0.0, next(tie), source, g))
+    heapq.heapify(heap)
+    # edges between two regions, with the length of the path through them
+    candidates: list = []
+    out: list[int] = []
+    joined = 0
+
+    def join(limit):
+        nonlocal joined
+        while candidates and candidates[0][0] <= limit and joined < groups - 1:
+            _, _, a, b, e = heapq.heappop(candidates)
+            ra, rb = find(region[a]), find(region[b])
+            if ra == rb:
+                continue
+            parent[ra] = rb
+            joined += 1
+            out.extend(paths.path_from_predecessors(pred, a))
+            out.append(e)
+            out.extend(paths.path_from_predecessors(pred, b))
+
+    while heap and joined < groups - 1:
+        d, _, i, g = heapq.heappop(heap)
+        if i in dist:
+            continue
+        dist[i] = d
+        region[i] = g
+        # any candidate found later is at least as long as d
+        join(d)
+        for h in range(offsets[i], offsets[i + 1]):
+            j = neighbours[h]
+            if j in dist:
+                if region[j] != g:
+                    heapq.heappush(
+                        candidates,
+                        (d + weights[h] + dist[j], next(tie), i, j, edges[h]),
+                    )
+                continue
+            length = d + weights[h]
+            if j not in seen or length < seen[j]:
+                seen[j] = length
+                pred[j] = (i, edges[h])
+                heapq.heappush(heap, (length, next(tie), j, g))
+    join(np.inf)
+    if joined < groups - 1:
+        raise nx.NetworkXError("required edges are not connected")
+    return out
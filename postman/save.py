@@ -1,31 +1,92 @@
-import gpxpy
+import io
+from xml.sax.saxutils import escape
 
-from postman import datatypes, utils
+import shapely
+
+from postman import datatypes
+
+# the document gpxpy would write, down to its indentation and number format
+HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<gpx xmlns="http://www.topografix.com/GPX/1/1" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 '
+    'http://www.topografix.com/GPX/1/1/gpx.xsd" version="1.1" '
+    'creator="gpx.py -- https://github.com/tkrajina/gpxpy">'
+)
+CHUNK = 10000
 
 
 def to_gpx(
     tracks: datatypes.TrackCollection, name: str = "", as_segments=False, as_one=False
 ) -> str:
-    gpx = gpxpy.gpx.GPX()
-    gpx.name = name
+    out = io.StringIO()
+    write_gpx(out, tracks, name, as_segments, as_one)
+    return out.getvalue()
+
+
+def write_gpx(
+    fp,
+    tracks: datatypes.TrackCollection,
+    name: str = "",
+    as_segments=False,
+    as_one=False,
+):
+    # write the gpx document to a text file object a chunk of points at a time
+    # rather than building it all in memory first
+    fp.write(HEADER)
+    if name:
+        fp.write(f"\n  <metadata>\n    <name>{escape(name)}</name>\n  </metadata>")
     if as_segments or as_one:
-        out_track = gpxpy.gpx.GPXTrack()
-        gpx.tracks.append(out_track)
+        fp.write("\n  <trk>")
     if as_one:
-        segment = gpxpy.gpx.GPXTrackSegment()
-        out_track.segments.append(segment)
-    for id, track in tracks.items():
+        fp.write("\n    <trkseg>")
+    for track in tracks.values():
         if not as_segments and not as_one:
-            out_track = gpxpy.gpx.GPXTrack(name=track.name, number=track.id)
-            gpx.tracks.append(out_track)
+            fp.write(f"\n  <trk>\n    <name>{escape(track.name)}</name>")
+            fp.write(f"\n    <number>{track.id}</number>")
         if not as_one:
-            segment = gpxpy.gpx.GPXTrackSegment()
-            out_track.segments.append(segment)
-        for coord in track.path.coords:
-            if len(coord) == 3:
-                segment.points.append(
-                    gpxpy.gpx.GPXTrackPoint(coord[1], coord[0], coord[2])
+            fp.write("\n    <trkseg>")
+        _write_points(fp, track.path)
+        if not as_one:
+            fp.write("\n    </trkseg>")
+        if not as_segments and not as_one:
+            fp.write("\n  </trk>")
+    if as_one:
+        fp.write("\n    </trkseg>")
+    if as_segments or as_one:
+        fp.write("\n  </trk>")
+    fp.write("\n</gpx>")
+
+
+def _write_points(fp, path: shapely.LineString):
+    coords = shapely.get_coordinates(path, include_z=shapely.has_z(path))
+    for start in range(0, len(coords), CHUNK):
+        chunk = coords[start : start + CHUNK]
+        longitude = map(_number, chunk[:, 0].tolist())
+        latitude = map(_number, chunk[:, 1].tolist())
+        if chunk.shape[1] == 3:
+            fp.write(
+                "".join(
+                    f'\n      <trkpt lat="{y}" lon="{x}">'
+                    f"\n        <ele>{z}</ele>\n      </trkpt>"
+                    for x, y, z in zip(
+                        longitude, latitude, map(_number, chunk[:, 2].tolist())
+                    )
                 )
-            else:
-                segment.points.append(gpxpy.gpx.GPXTrackPoint(coord[1], coord[0]))
-    return gpx.to_xml()
+            )
+        else:
+            fp.write(
+                "".join(
+                    f'\n      <trkpt lat="{y}" lon="{x}">\n      </trkpt>'
+                    for x, y in zip(longitude, latitude)
+                )
+            )
+
+
+def _number(value: float) -> str:
+    # as gpxpy formats numbers, avoiding scientific notation
+    text = str(value)
+    if "e" not in text:
+        return text
+    return format(value, ".10f").rstrip("0").rstrip(".")
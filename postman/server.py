@@ -0,0 +1,291 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import time
+import traceback
+import urllib.parse
+
+import networkx as nx
+import pyogrio.errors
+
+from postman import cache, cli, datatypes, save, utils
+
+# problems with a request rather than the service, answered with a 400: bad
+# options or expressions, a missing trail file, an unknown start node or
+# trails which can't be toured, anything else (including failing to write the
+# cache or download elevations) is the service's problem and a 500
+REQUEST_ERRORS = (
+    ValueError,
+    FileNotFoundError,
+    KeyError,
+    nx.NetworkXException,
+    pyogrio.errors.DataSourceError,
+)
+STATUS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+class Service:
+    # answers tour requests keeping the most recently used trails and solvers
+    # in memory, so a warm request only has to rotate and write out a tour
+    #
+    # solvers are keyed by everything the eulerized network depends on (the
+    # trail files, cost and matching options and required expression) so any
+    # start node is answered from the same one
+    def __init__(
+        self,
+        cache_dir=cache.DEFAULT_DIR,
+        use_cache=True,
+        graphs=4,
+        solvers=16,
+        threads=None,
+        load=None,
+    ):
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self.load = load or self._prepare
+        self.graphs: collections.OrderedDict = collections.OrderedDict()
+        self.solvers: collections.OrderedDict = collections.OrderedDict()
+        self.sizes = {"graphs": graphs, "solvers": solvers}
+        self.counts: collections.Counter = collections.Counter()
+        self.executor = concurrent.futures.ThreadPoolExecutor(threads)
+
+    def _prepare(self, trail_file):
+        trails, graph, _ = cli.prepare(trail_file, self.cache_dir, self.use_cache)
+        return trails, graph
+
+    async def _cached(self, name: str, key, function, *args):
+        # the result of function from an lru of futures, concurrent requests
+        # for the same key wait on the same call and failures are not kept
+        entries = getattr(self, name)
+        if key in entries:
+            self.counts[f"{name} hits"] += 1
+            entries.move_to_end(key)
+        else:
+            self.counts[f"{name} misses"] += 1
+            loop = asyncio.get_running_loop()
+            entries[key] = loop.run_in_executor(self.executor, function, *args)
+            while len(entries) > self.sizes[name]:
+                entries.popitem(last=False)
+        future = entries[key]
+        try:
+            # shielded so a client going away does not cancel it for others
+            return await asyncio.shield(future)
+        except Exception:
+            if entries.get(key) is future:
+                del entries[key]
+            raise
+
+    async def trails(self, trail_file):
+        key = _stamp(trail_file)
+        return key, await self._cached("graphs", key, self.load, trail_file)
+
+    async def tour(self, params: dict) -> tuple[str, bytes]:
+        options = cli.parse_options(params)
+        key, (trails, graph) = await self.trails(options["trails"])
+        solvers = await self._cached(
+            "solvers",
+            (
+                key,
+                options["cost"],
+                options["elevation_scale"],
+                options["matching"],
+                options["nearest"],
+                options["radius"],
+                options["required"],
+            ),
+            lambda: cli.solve(
+                trails,
+                graph,
+                required=options["required"],
+                nearest=options["nearest"],
+                radius=options["radius"],
+                matching=options["matching"],
+                cost=cli.cost_model(options["cost"], options["elevation_scale"]),
+            ),
+        )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self._render, trails, solvers, options
+        )
+
+    def _render(self, trails, solvers, options) -> tuple[str, bytes]:
+        tours = cli.tours_for(solvers, options["start"], options["components"])
+        if options["format"] == "json":
+            return "application/json", json.dumps(to_json(tours)).encode()
+        collection = cli.to_tracks(tours, trails.crs)
+        utils.add_elevation_to_tracks(collection)
+        gpx = save.to_gpx(collection, as_segments=options["segmented"])
+        return "application/gpx+xml", gpx.encode()
+
+    def stats(self) -> dict:
+        return {
+            "graphs": len(self.graphs),
+            "solvers": len(self.solvers),
+            **self.counts,
+        }
+
+    async def respond(self, method: str, target: str, body: bytes = b""):
+        # the status, content type and body answering a request
+        url = urllib.parse.urlsplit(target)
+        if url.path == "/stats":
+            return 200, "application/json", json.dumps(self.stats()).encode()
+        if url.path != "/tour":
+            return 404, "text/plain", b"unknown path\n"
+        if method not in ("GET", "POST"):
+            return 405, "text/plain", b"use GET or POST\n"
+        try:
+            params = dict(urllib.parse.parse_qsl(url.query))
+            if body:
+                params.update(json.loads(body))
+            return 200, *await self.tour(params)
+        except REQUEST_ERRORS as e:
+            return 400, "text/plain", f"{type(e).__name__}: {e}\n".encode()
+        except Exception:
+            traceback.print_exc()
+            return 500, "text/plain", b"internal error\n"
+
+    async def handle(self, reader, writer):
+        # one connection, kept open between requests unless asked not to
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except ValueError:
+                    _write_response(writer, 400, "text/plain", b"bad request\n", False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, content_type, payload = await self.respond(method, target, body)
+                keep = headers.get("connection", "").lower() != "close"
+                _write_response(writer, status, content_type, payload, keep)
+                await writer.drain()
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _stamp(trail_file) -> tuple:
+    # identifies the trail files as they are now, so changing them reloads
+    if not os.path.exists(trail_file):
+        raise FileNotFoundError(f"no such file {trail_file}")
+    return (os.path.abspath(trail_file),) + tuple(
+        (path.name, stat.st_size, stat.st_mtime_ns)
+        for path in cache.input_files(trail_file)
+        for stat in [path.stat()]
+    )
+
+
+def to_json(tours: list[datatypes.Tour]) -> dict:
+    out = []
+    for steps in tours:
+        out.append(
+            {
+                "distance": sum(data["distance"] for _, _, data in steps),
+                "elevation_gain": sum(data["elevation_gain"] for _, _, data in steps),
+                "elevation_loss": sum(data["elevation_loss"] for _, _, data in steps),
+                "steps": [
+                    {
+                        "from": int(u),
+                        "to": int(v),
+                        "name": utils._name(data),
+                        "index_position": int(data["index_position"]),
+                        "distance": float(data["distance"]),
+                        "elevation_gain": float(data["elevation_gain"]),
+                        "elevation_loss": float(data["elevation_loss"]),
+                    }
+                    for u, v, data in steps
+                ],
+            }
+        )
+    return {"tours": out}
+
+
+async def _read_request(reader):
+    # the method, target, lower cased headers and body of the next request,
+    # or None once the client has closed the connection
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    method, target, _ = line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return method, target, headers, body
+
+
+def _write_response(writer, status, content_type, payload, keep):
+    writer.write(
+        (
+            f"HTTP/1.1 {status} {STATUS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep else 'close'}\r\n\r\n"
+        ).encode()
+        + payload
+    )
+
+
+async def serve(service: Service, host="127.0.0.1", port=8000, path=None, preload=()):
+    if path is not None:
+        server = await asyncio.start_unix_server(service.handle, path)
+        address = path
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+        address = "http://{}:{}".format(*server.sockets[0].getsockname()[:2])
+    for trail_file in preload:
+        start = time.perf_counter()
+        await service.trails(trail_file)
+        print(f"loaded {trail_file} in {time.perf_counter() - start:.2f}s")
+    print(f"listening on {address}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="postman serve",
+        description="answer tour requests over http, keeping recently used "
+        "networks and their solutions in memory",
+    )
+    parser.add_argument("preload", nargs="*", help="trail files to load at start")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--socket", help="listen on this unix socket instead")
+    parser.add_argument("--cache-dir", default=cache.DEFAULT_DIR)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument(
+        "--graphs", type=int, default=4, help="trail networks to keep in memory"
+    )
+    parser.add_argument(
+        "--solvers",
+        type=int,
+        default=16,
+        help="solved networks (for each set of cost options) to keep in memory",
+    )
+    parser.add_argument("--threads", type=int, help="most requests to work on at once")
+    args = parser.parse_args(argv)
+    service = Service(
+        args.cache_dir, not args.no_cache, args.graphs, args.solvers, args.threads
+    )
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.socket, args.preload))
+    except KeyboardInterrupt:
+        pass
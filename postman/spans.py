@@ -0,0 +1,189 @@
+import functools
+import json
+import os
+import re
+import resource
+import sys
+import time
+
+# a registry of timed stages (spans), recording the wall and cpu time, peak
+# resident memory and any counts of each, spans opened inside another are
+# nested in it
+#
+# nothing is recorded until enable is called, before that span returns a
+# shared do nothing context so instrumented code costs a function call
+ENABLED = False
+records: list[dict] = []
+_stack: list["Span"] = []
+_origin = 0.0
+
+
+class _Null:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def count(self, **counts):
+        pass
+
+
+_NULL = _Null()
+
+
+class Span:
+    def __init__(self, name: str, counts: dict):
+        self.name = name
+        self.counts = counts
+
+    def __enter__(self):
+        # fold the peak so far into the open spans before starting afresh
+        peak = _take_peak()
+        for span in _stack:
+            span.peak = max(span.peak, peak)
+        self.path = "/".join([s.name for s in _stack] + [self.name])
+        self.depth = len(_stack)
+        self.peak = _rss()
+        _stack.append(self)
+        self.cpu = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        wall = time.perf_counter() - self.start
+        cpu = time.process_time() - self.cpu
+        _stack.pop()
+        self.peak = max(self.peak, _take_peak())
+        for span in _stack:
+            span.peak = max(span.peak, self.peak)
+        records.append(
+            {
+                "name": self.name,
+                "path": self.path,
+                "depth": self.depth,
+                "start": self.start - _origin,
+                "wall": wall,
+                "cpu": cpu,
+                "peak_rss": self.peak,
+                "counts": self.counts,
+            }
+        )
+        return False
+
+    def count(self, **counts):
+        self.counts.update(counts)
+
+
+def span(name: str, **counts):
+    # with span("stage", items=n) as s: ... s.count(more=m)
+    if not ENABLED:
+        return _NULL
+    return Span(name, counts)
+
+
+def timed(name: str):
+    # a decorator running the whole function in a span
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            with Span(name, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def enable():
+    global ENABLED, _origin
+    ENABLED = True
+    _origin = time.perf_counter()
+    records.clear()
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+# peak resident memory in bytes, linux can reset the peak (VmHWM) so each
+# span sees its own, elsewhere it is the peak of the whole process so far
+_STATUS = "/proc/self/status"
+_CLEAR = "/proc/self/clear_refs"
+
+
+def _status(field) -> int | None:
+    # a memory field of the process status in bytes, None if there is none
+    try:
+        with open(_STATUS) as fp:
+            match = re.search(rf"{field}:\s+(\d+)", fp.read())
+    except OSError:
+        return None
+    return None if match is None else int(match.group(1)) * 1024
+
+
+def _rss() -> int:
+    return _status("VmRSS") or 0
+
+
+def _take_peak() -> int:
+    # the peak since the last call, as far as the platform allows
+    peak = _status("VmHWM")
+    if peak is not None:
+        try:
+            with open(_CLEAR, "w") as fp:
+                fp.write("5")
+            return peak
+        except OSError:
+            pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def table(out=sys.stdout):
+    # the spans in the order they started, nested under their parents
+    print(f"{'stage':<32} {'wall':>9} {'cpu':>9} {'peak rss':>10}  counts", file=out)
+    for record in sorted(records, key=lambda r: r["start"]):
+        name = "  " * record["depth"] + record["name"]
+        counts = " ".join(f"{k}={v}" for k, v in record["counts"].items())
+        print(
+            f"{name:<32} {record['wall']:8.3f}s {record['cpu']:8.3f}s "
+            f"{record['peak_rss'] / 2**20:7.1f} MB  {counts}",
+            file=out,
+        )
+
+
+def to_json() -> list[dict]:
+    return sorted(records, key=lambda r: r["start"])
+
+
+def to_trace() -> dict:
+    # chrome's trace event format, for chrome://tracing or perfetto
+    pid = os.getpid()
+    return {
+        "traceEvents": [
+            {
+                "name": record["name"],
+                "ph": "X",
+                "ts": record["start"] * 1e6,
+                "dur": record["wall"] * 1e6,
+                "pid": pid,
+                "tid": 0,
+                "args": {
+                    "cpu": record["cpu"],
+                    "peak_rss": record["peak_rss"],
+                    **record["counts"],
+                },
+            }
+            for record in to_json()
+        ],
+        "displayTimeUnit": "ms",
+    }
+
+
+def write(filename, trace=False):
+    with open(filename, "w") as fp:
+        json.dump(to_trace() if trace else to_json(), fp, indent=1)
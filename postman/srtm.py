@@ -1,14 +1,24 @@
-import array
+import collections
 import io
 import os
+import threading
+import typing
 import zipfile
 
-import rasterio
-import rioxarray
+import numpy as np
+import numpy.typing as npt
 import urllib3
-import xarray as xr
+
+if typing.TYPE_CHECKING:
+    import rasterio
 
 TMP = "/tmp/srtm"
+MAX_OPEN_TILES = 4
+
+_datasets: collections.OrderedDict = collections.OrderedDict()
+# rasterio datasets can not be read from several threads at once, and the open
+# datasets and downloads are shared, so sampling takes turns
+_lock = threading.RLock()
 
 
 def _basename(i_lat: int, i_lon: int) -> str:
@@ -38,30 +48,114 @@ def download(i_lat, i_lon):
                     out_file.write(memory_file.read())
 
 
-def sample(latitude: float, longitude: float) -> float:
-    i_lat, i_lon = tile(latitude, longitude)
-    filename = f"{TMP}/{_basename(i_lat, i_lon)}.tif"
-    # print("sample", filename, "at", latitude, longitude)
-    if not os.path.exists(filename):
-        download(i_lat, i_lon)
-    dataset = rioxarray.open_rasterio(filename)
-    assert isinstance(dataset, xr.DataArray)
-    out = dataset.interp(x=longitude, y=latitude, method="linear").item()
+def _path(i_lat: int, i_lon: int) -> str:
+    return f"{TMP}/{_basename(i_lat, i_lon)}.tif"
+
+
+def _filename(i_lat: int, i_lon: int) -> str:
+    # the path of a tile, downloading it first if needed
+    filename = _path(i_lat, i_lon)
+    with _lock:
+        if not os.path.exists(filename):
+            download(i_lat, i_lon)
+    return filename
+
+
+def _open(i_lat: int, i_lon: int) -> "rasterio.DatasetReader":
+    # keep a few tiles open, closing the least recently used, only the windows
+    # needed are ever read so memory is bounded by the number of open tiles
+    key = (i_lat, i_lon)
+    if key in _datasets:
+        _datasets.move_to_end(key)
+        return _datasets[key]
+    # rasterio is only imported once elevations are needed
+    import rasterio
+
+    dataset = rasterio.open(_filename(i_lat, i_lon))
+    _datasets[key] = dataset
+    while len(_datasets) > MAX_OPEN_TILES:
+        _, old = _datasets.popitem(last=False)
+        old.close()
+    return dataset
+
+
+def _tiles(latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    # vectorised version of tile
+    i_lat = ((60 - latitude) / 5 + 1).astype(np.int64)
+    i_lon = ((180 + longitude) / 5 + 1).astype(np.int64)
+    return np.stack([i_lat, i_lon], axis=1)
+
+
+def _by_tile(latitude: np.ndarray, longitude: np.ndarray):
+    tiles, inverse = np.unique(_tiles(latitude, longitude), axis=0, return_inverse=True)
+    for i, (i_lat, i_lon) in enumerate(tiles):
+        yield _open(int(i_lat), int(i_lon)), np.flatnonzero(inverse.ravel() == i)
+
+
+def _pixels(latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    # the values of the pixels centred on each point, reading one window from
+    # each tile involved
+    import rasterio.windows
+
+    out = np.empty(len(latitude))
+    for dataset, points in _by_tile(latitude, longitude):
+        transform = dataset.transform
+        rows = np.floor((latitude[points] - transform.f) / transform.e)
+        rows = rows.astype(np.int64)
+        columns = np.floor((longitude[points] - transform.c) / transform.a)
+        columns = columns.astype(np.int64)
+        window = rasterio.windows.Window(
+            columns.min(),
+            rows.min(),
+            columns.max() - columns.min() + 1,
+            rows.max() - rows.min() + 1,
+        )
+        data = dataset.read(1, window=window)
+        out[points] = data[rows - rows.min(), columns - columns.min()]
     return out
 
 
-def array_sample(
-    latitude: array.array[float], longitude: array.array[float]
-) -> xr.DataArray:
-    # TODO calculate tiles based on all values
-    i_lat, i_lon = tile(latitude[0], longitude[0])
-    filename = f"{TMP}/{_basename(i_lat, i_lon)}.tif"
-    if not os.path.exists(filename):
-        download(i_lat, i_lon)
-    dataset = rioxarray.open_rasterio(filename)
-    assert isinstance(dataset, xr.DataArray)
-    return dataset.interp(
-        x=xr.DataArray(longitude, dims="z"),
-        y=xr.DataArray(latitude, dims="z"),
-        method="linear",
-    )[0]
+def sample(latitude: float, longitude: float) -> float:
+    return float(array_sample([latitude], [longitude])[0])
+
+
+def array_sample(latitude: npt.ArrayLike, longitude: npt.ArrayLike) -> np.ndarray:
+    with _lock:
+        return _array_sample(latitude, longitude)
+
+
+def _array_sample(latitude: npt.ArrayLike, longitude: npt.ArrayLike) -> np.ndarray:
+    # bilinear interpolation between pixel centres, the four pixels around a
+    # point can come from neighbouring tiles near the edge of its own tile
+    latitude = np.asarray(latitude, dtype=float)
+    longitude = np.asarray(longitude, dtype=float)
+    row = np.empty(len(latitude))
+    column = np.empty(len(latitude))
+    left = np.empty(len(latitude))
+    top = np.empty(len(latitude))
+    width = np.empty(len(latitude))
+    height = np.empty(len(latitude))
+    for dataset, points in _by_tile(latitude, longitude):
+        transform = dataset.transform
+        column[points] = (longitude[points] - transform.c) / transform.a - 0.5
+        row[points] = (latitude[points] - transform.f) / transform.e - 0.5
+        left[points] = transform.c
+        top[points] = transform.f
+        width[points] = transform.a
+        height[points] = transform.e
+    row0 = np.floor(row)
+    column0 = np.floor(column)
+    corners = [(0, 0), (0, 1), (1, 0), (1, 1)]
+    # the centres of the surrounding pixels, in the grid of each point's tile
+    values = _pixels(
+        np.concatenate([top + (row0 + dr + 0.5) * height for dr, _ in corners]),
+        np.concatenate([left + (column0 + dc + 0.5) * width for _, dc in corners]),
+    ).reshape(4, -1)
+    fr = row - row0
+    fc = column - column0
+    return (
+        values[0] * (1 - fr) * (1 - fc)
+        + values[1] * (1 - fr) * fc
+        + values[2] * fr * (1 - fc)
+        + values[3] * fr * fc
+    )
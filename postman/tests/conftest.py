@@ -0,0 +1,70 @@
+import random
+
+import geopandas
+import networkx as nx
+import pytest
+import shapely
+
+from postman import compact
+
+POSITIONS = {0: (0, 0), 1: (0, 100), 2: (100, 100), 3: (100, 0)}
+EDGES = [(0, 1), (1, 2), (2, 3), (3, 0), (0, 2)]
+
+
+def _square_trails(trail_file=None):
+    # a square of trails with a diagonal and a hump on one side, whatever the
+    # file, as prepared trails and their compact graph
+    graph = nx.MultiGraph()
+    for n, (x, y) in POSITIONS.items():
+        graph.add_node(n, x=x, y=y)
+    geometry = []
+    for i, (m, n) in enumerate(EDGES):
+        line = shapely.LineString([POSITIONS[m], POSITIONS[n]])
+        geometry.append(line)
+        graph.add_edge(
+            m,
+            n,
+            name=f"{m}-{n}",
+            index_position=i,
+            distance=line.length,
+            elevation_gain=10.0 if (m, n) == (0, 1) else 0.0,
+            elevation_loss=10.0 if (m, n) == (0, 1) else 0.0,
+            geometry=line,
+        )
+    trails = geopandas.GeoDataFrame(
+        {"name": [f"{m}-{n}" for m, n in EDGES]}, geometry=geometry, crs=32610
+    )
+    return trails, compact.from_graph(graph)
+
+
+def _trail_grid(size, removed=0.0, seed=0):
+    # a size x size grid of trails named by their ends with random distances
+    # and climbs, a fraction of them removed (keeping the network connected)
+    rng = random.Random(seed)
+    simple = nx.convert_node_labels_to_integers(nx.grid_2d_graph(size, size))
+    for u, v in rng.sample(list(simple.edges()), int(len(simple.edges()) * removed)):
+        simple.remove_edge(u, v)
+        if not nx.is_connected(simple):
+            simple.add_edge(u, v)
+    graph = nx.MultiGraph()
+    graph.add_nodes_from(simple.nodes)
+    for u, v in simple.edges():
+        graph.add_edge(
+            u,
+            v,
+            name=f"{u}-{v}",
+            distance=rng.uniform(1.0, 10.0),
+            elevation_gain=rng.uniform(0.0, 1.0),
+            elevation_loss=rng.uniform(0.0, 1.0),
+        )
+    return graph
+
+
+@pytest.fixture()
+def square_trails():
+    return _square_trails
+
+
+@pytest.fixture()
+def trail_grid():
+    return _trail_grid
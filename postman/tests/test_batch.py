@@ -0,0 +1,73 @@
+import csv
+
+import pytest
+
+from postman import batch, cli
+
+
+@pytest.fixture()
+def prepared(monkeypatch, square_trails):
+    # every trail file is the same square of trails, counting how often each
+    # is prepared
+    calls = []
+
+    def prepare(trail_file, cache_dir=None, use_cache=True):
+        calls.append(trail_file)
+        return *square_trails(trail_file), None
+
+    monkeypatch.setattr(cli, "prepare", prepare)
+    return calls
+
+
+def write_manifest(path, rows):
+    with open(path, "w", newline="") as fp:
+        writer = csv.DictWriter(fp, ["id", "trails", "start", "elevation_scale"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def read_summary(path):
+    with open(path, newline="") as fp:
+        rows = list(csv.DictReader(fp))
+    # one row per job
+    assert len({row["id"] for row in rows}) == len(rows)
+    return {row["id"]: row for row in rows}
+
+
+def test_batch_shares_solves_and_resumes(tmp_path, prepared):
+    manifest = tmp_path / "manifest.csv"
+    summary = tmp_path / "summary.csv"
+    rows = [
+        {"id": "a", "trails": "a.shp", "start": 0, "elevation_scale": 10},
+        {"id": "b", "trails": "a.shp", "start": 3, "elevation_scale": 10},
+        {"id": "c", "trails": "a.shp", "start": 0, "elevation_scale": 0},
+        {"id": "d", "trails": "b.shp", "start": 9, "elevation_scale": 10},
+    ]
+    write_manifest(manifest, rows)
+    jobs = batch.read_manifest(manifest)
+    assert batch.run(jobs, summary, workers=1) == (4, 1)
+    # each file is prepared once up front then read back for each solve
+    assert sorted(prepared) == sorted(
+        [str(tmp_path / "a.shp")] * 3 + [str(tmp_path / "b.shp")] * 2
+    )
+    out = read_summary(summary)
+    assert [out[id]["status"] for id in "abcd"] == ["ok", "ok", "ok", "error"]
+    assert out["d"]["error"].startswith("ValueError: tour can not start at 9")
+    assert out["a"]["tour_cost"] == out["b"]["tour_cost"]
+    assert float(out["a"]["tour_cost"]) == pytest.approx(
+        float(out["c"]["tour_cost"]) + 100
+    )
+    assert out["a"]["distance"] == out["c"]["distance"]
+
+    # a second run only tries the failed job again, after a cut short row
+    with open(summary, "a") as fp:
+        fp.write("e,ok")
+    rows[3]["start"] = 1
+    rows.append({"id": "e", "trails": "a.shp", "start": 1, "elevation_scale": 10})
+    write_manifest(manifest, rows)
+    prepared.clear()
+    assert batch.run(batch.read_manifest(manifest), summary, workers=1) == (2, 0)
+    out = read_summary(summary)
+    assert out["d"]["status"] == "ok"
+    assert out["e"]["status"] == "ok"
+    assert len(prepared) == 4
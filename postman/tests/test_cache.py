@@ -0,0 +1,108 @@
+import geopandas
+import numpy as np
+import pytest
+import shapely
+
+from postman import cache, compact, core, preprocess, srtm
+
+FILE_COLUMNS = ["name", "number", "geometry"]
+
+
+@pytest.fixture()
+def trails():
+    # a square of trails with a diagonal, in utm zone 10 near 51N 121W
+    x, y = 500000, 5650000
+    corners = [[x, y, 1], [x, y + 100, 2], [x + 100, y + 100, 3], [x + 100, y, 4]]
+    lines = [
+        [corners[0], corners[1]],
+        [corners[1], corners[2]],
+        [corners[2], corners[3]],
+        [corners[3], corners[0]],
+        [corners[1], corners[3]],
+    ]
+    trails = geopandas.GeoDataFrame(
+        {"name": list("abcde"), "number": range(5)},
+        geometry=[shapely.LineString(x) for x in lines],
+        crs=32610,
+    )
+    preprocess.add_elevation_stats(trails)
+    return trails
+
+
+@pytest.fixture()
+def trail_file(tmp_path, monkeypatch, trails):
+    monkeypatch.setattr(srtm, "TMP", str(tmp_path / "srtm"))
+    (tmp_path / "srtm").mkdir()
+    i_lat, i_lon = srtm.tile(51, -121)
+    (tmp_path / "srtm" / f"{srtm._basename(i_lat, i_lon)}.tif").write_bytes(b"dem")
+    filename = tmp_path / "trails.shp"
+    trails[FILE_COLUMNS].to_file(filename)
+    return filename
+
+
+def test_key_invalidation(trail_file, trails, tmp_path, monkeypatch):
+    parameters = {"gap_tolerance": 0.1}
+    original = cache.key(trail_file, parameters)
+    assert cache.key(trail_file, parameters) == original
+    assert cache.key(trail_file, {"gap_tolerance": 0.2}) != original
+    # changing the attribute table (a shapefile side car) changes the key
+    trails.loc[0, "name"] = "z"
+    trails[FILE_COLUMNS].to_file(trail_file)
+    changed = cache.key(trail_file, parameters)
+    assert changed != original
+    # so does a different crs with the same coordinates, which moves the
+    # trails into another elevation tile
+    i_lat, i_lon = srtm.tile(51, -117)
+    (tmp_path / "srtm" / f"{srtm._basename(i_lat, i_lon)}.tif").write_bytes(b"dem")
+    before = {path.suffix: path.read_bytes() for path in cache.input_files(trail_file)}
+    trails[FILE_COLUMNS].set_crs(32611, allow_override=True).to_file(trail_file)
+    after = {path.suffix: path.read_bytes() for path in cache.input_files(trail_file)}
+    assert [suffix for suffix in before if before[suffix] != after[suffix]] == [".prj"]
+    assert cache.key(trail_file, parameters) not in (original, changed)
+    # and a replaced elevation tile
+    trails[FILE_COLUMNS].to_file(trail_file)
+    assert cache.key(trail_file, parameters) == changed
+    i_lat, i_lon = srtm.tile(51, -121)
+    tile = tmp_path / "srtm" / f"{srtm._basename(i_lat, i_lon)}.tif"
+    tile.write_bytes(b"new dem")
+    assert cache.key(trail_file, parameters) != changed
+
+    # a tile not downloaded yet is not downloaded for the key, and once it is
+    # the key changes
+    def download(i_lat, i_lon):
+        raise AssertionError("downloaded a tile")
+
+    monkeypatch.setattr(srtm, "download", download)
+    tile.unlink()
+    missing = cache.key(trail_file, parameters)
+    assert not tile.exists()
+    tile.write_bytes(b"dem")
+    assert cache.key(trail_file, parameters) != missing
+
+
+@pytest.mark.parametrize("dropped", [False, True])
+def test_round_trip(trails, tmp_path, dropped):
+    if dropped:
+        # as when preprocessing drops empty geometries
+        trails = trails.drop(index=1)
+    graph = preprocess.to_graph(trails)
+    compact_graph = compact.from_graph(graph)
+    assert cache.load(tmp_path, "abc") is None
+    cache.save(tmp_path, "abc", trails, compact_graph)
+    loaded_trails, loaded = cache.load(tmp_path, "abc")
+    assert list(loaded_trails["name"]) == list(trails["name"])
+    for name in compact.ARRAYS:
+        np.testing.assert_array_equal(
+            getattr(loaded, name), getattr(compact_graph, name)
+        )
+    for expected, data in zip(compact_graph.data, loaded.data):
+        assert data.keys() == expected.keys()
+        assert data["geometry"].equals(expected["geometry"])
+        assert data["index_position"] == expected["index_position"]
+        assert data["name"] == expected["name"]
+        assert data.get("index") == expected.get("index")
+    expected_tour = core.trail_tour(graph, 0)
+    tour = core.trail_tour(loaded, 0)
+    assert [(u, v, x["name"]) for u, v, x in tour] == [
+        (u, v, x["name"]) for u, v, x in expected_tour
+    ]
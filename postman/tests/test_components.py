@@ -0,0 +1,80 @@
+import networkx as nx
+import pytest
+import shapely
+
+from postman import compact, components, core
+
+
+def square(graph, corner, first):
+    # a square of trails with a diagonal, so two of its corners are odd
+    x0, y0 = corner
+    nodes = [first + i for i in range(4)]
+    positions = [(x0, y0), (x0, y0 + 1), (x0 + 1, y0), (x0 + 1, y0 + 1)]
+    for n, (x, y) in zip(nodes, positions):
+        graph.add_node(n, x=x, y=y)
+    for i, j in [(0, 1), (0, 2), (1, 2), (1, 3), (2, 3)]:
+        (ax, ay), (bx, by) = positions[i], positions[j]
+        graph.add_edge(
+            nodes[i],
+            nodes[j],
+            name=f"{first + i}-{first + j}",
+            index_position=graph.number_of_edges(),
+            distance=abs(ax - bx) + abs(ay - by),
+            elevation_gain=0,
+            elevation_loss=0,
+            geometry=shapely.LineString([positions[i], positions[j]]),
+        )
+
+
+@pytest.fixture()
+def graph():
+    # three separate squares in a row, the middle one closest to both others
+    graph = nx.MultiGraph()
+    square(graph, (0, 0), 0)
+    square(graph, (10, 0), 4)
+    square(graph, (3, 0), 8)
+    return graph
+
+
+def test_split_keeps_connected_graph(graph):
+    connected = compact.from_graph(nx.MultiGraph(graph.subgraph(range(4))))
+    (part,) = components.split(connected)
+    assert part.nodes == connected.nodes
+    assert part.u.tolist() == connected.u.tolist()
+    assert part.v.tolist() == connected.v.tolist()
+
+
+def test_solve_components(graph):
+    with pytest.raises(nx.NetworkXError):
+        core.solve(graph)
+    solvers = components.solve(graph)
+    assert [sorted(solver.graph.nodes) for solver in solvers] == [
+        [0, 1, 2, 3],
+        [4, 5, 6, 7],
+        [8, 9, 10, 11],
+    ]
+    expected = core.solve(nx.MultiGraph(graph.subgraph(range(4)))).cost()
+    assert [solver.cost() for solver in solvers] == pytest.approx([expected] * 3)
+    parallel = components.solve(graph, workers=2)
+    assert [solver.circuit for solver in parallel] == [
+        solver.circuit for solver in solvers
+    ]
+
+
+def test_stitched_tour(graph):
+    solvers = components.solve(graph)
+    # the middle square is joined to both others at their nearest corners
+    assert sorted((m, n) for _, _, m, n in components.connectors(solvers)) == [
+        (2, 8),
+        (4, 10),
+    ]
+    tour = components.stitch(solvers, 0)
+    assert tour[0][0] == 0
+    assert tour[-1][1] == 0
+    for (_, v, _), (u, _, _) in zip(tour[:-1], tour[1:]):
+        assert v == u
+    transfers = [data for _, _, data in tour if data.get("transfer")]
+    assert len(transfers) == 4
+    assert sum(data["distance"] for data in transfers) == pytest.approx(2 * (2 + 6))
+    walked = {data["name"] for _, _, data in tour if not data.get("transfer")}
+    assert walked == {data["name"] for _, _, data in graph.edges(data=True)}
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from postman import filters
+
+TRAILS = pd.DataFrame(
+    {
+        "name": ["Ridge", "Ridge Road", "Valley", None],
+        "difficulty": [1, 2, 3, 2],
+        "open": [True, False, True, True],
+    }
+)
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("name == 'Ridge'", [1, 0, 0, 0]),
+        ("difficulty in [1, 3]", [1, 0, 1, 0]),
+        ("difficulty not in (1, 3)", [0, 1, 0, 1]),
+        ("1 < difficulty <= 2", [0, 1, 0, 1]),
+        ("difficulty > -1 and not name.str.contains('Road')", [1, 0, 1, 1]),
+        ("name.str.startswith('R') & ~open", [0, 1, 0, 0]),
+        ("open or name.str.endswith('Road')", [1, 1, 1, 1]),
+        ("name.str.contains('.')", [0, 0, 0, 0]),
+    ],
+)
+def test_mask(expression, expected):
+    assert filters.mask(TRAILS, expression).tolist() == [bool(e) for e in expected]
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "name.__class__.__init__.__globals__['warnings'].sys.modules['os']"
+        ".system('true') == 0",
+        "__import__('os').system('true')",
+        "name.str.contains('a', regex=True)",
+        "name.str.len() > 2",
+        "missing == 1",
+        "geometry == 1",
+        "1 == 1",
+        "difficulty",
+        "difficulty + 1",
+        "name ==",
+    ],
+)
+def test_unsupported_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        filters.mask(TRAILS, expression)
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+# the plotting and preprocessing libraries a solve from a cached graph should
+# never need to import
+HEAVY = ["bokeh", "cartopy", "geoviews", "holoviews", "matplotlib", "momepy"]
+
+SCRIPT = """
+import sys
+
+import networkx as nx
+import shapely
+
+import postman.cli
+from postman import core
+
+graph = nx.MultiGraph()
+for i, (x, y) in enumerate([(0, 0), (0, 1), (1, 1), (1, 0)]):
+    graph.add_node(i, x=x, y=y)
+for i, (m, n) in enumerate([(0, 1), (1, 2), (2, 3), (3, 0), (0, 2)]):
+    graph.add_edge(
+        m,
+        n,
+        name=str(i),
+        index_position=i,
+        distance=1.0,
+        elevation_gain=0.0,
+        elevation_loss=0.0,
+        geometry=shapely.LineString([(m, m), (n, n)]),
+    )
+core.solve(graph).tour(0)
+print(" ".join(sorted(m for m in sys.modules if "." not in m)))
+"""
+
+
+def test_solve_does_not_import_plotting():
+    loaded = subprocess.run(
+        [sys.executable, "-c", SCRIPT], capture_output=True, text=True, check=True
+    ).stdout.split()
+    assert [m for m in HEAVY if m in loaded] == []
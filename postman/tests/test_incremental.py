@@ -0,0 +1,93 @@
+import random
+
+import networkx as nx
+import pytest
+
+from postman import compact, core, costs, incremental
+
+
+def random_data(rng):
+    return {
+        "distance": rng.uniform(1.0, 10.0),
+        "elevation_gain": rng.uniform(0.0, 1.0),
+        "elevation_loss": rng.uniform(0.0, 1.0),
+    }
+
+
+def added_weight(graph, added):
+    return sum(graph.weight[added].tolist())
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_edits_match_full_solve(trail_grid, seed):
+    rng = random.Random(seed)
+    cost = costs.Linear(10)
+    solver = incremental.IncrementalSolver(trail_grid(8, 0.2, seed), cost=cost)
+    for _ in range(30):
+        alive = [e for e, a in enumerate(solver.alive) if a]
+        action = rng.choice(["remove", "add", "update"])
+        if action == "remove":
+            e = rng.choice(alive)
+            solver.remove_edge(e)
+            graph, _ = solver.graph()
+            if not compact.is_connected(graph):
+                m, n = solver.nodes[solver.u[e]], solver.nodes[solver.v[e]]
+                solver.add_edge(m, n, solver.data[e])
+        elif action == "add":
+            m, n = rng.sample(solver.nodes, 2)
+            solver.add_edge(m, n, random_data(rng))
+        else:
+            solver.update_edge(rng.choice(alive), distance=rng.uniform(1.0, 10.0))
+        graph, alive = solver.graph()
+        position = {e: i for i, e in enumerate(alive)}
+        expected = core.eulerize(graph)
+        added = [position[e] for e in solver.eulerize()]
+        assert added_weight(graph, added) == pytest.approx(
+            added_weight(graph, expected)
+        )
+        assert solver.solve().cost() == pytest.approx(
+            core.solve(graph, cost=cost).cost()
+        )
+
+
+def test_edits_only_repeat_affected_work(trail_grid):
+    graph = trail_grid(8, 0.2)
+    # a long detour parallel to an existing trail is never on a shortest path
+    graph.add_edge(0, 1, distance=100.0, elevation_gain=0.0, elevation_loss=0.0)
+    graph.add_edge(0, 1, distance=100.0, elevation_gain=0.0, elevation_loss=0.0)
+    solver = incremental.IncrementalSolver(graph)
+    solver.eulerize()
+    searches = solver.searches
+    assert solver.matchings == 1
+    first, detour = [e for e, d in enumerate(solver.data) if d["distance"] == 100.0]
+    solver.update_edge(detour, distance=200.0)
+    solver.eulerize()
+    assert solver.searches == searches
+    assert solver.matchings == 1
+    # removing both detours briefly changes the parity of their ends but
+    # leaves the odd nodes and their distances as they were
+    solver.remove_edge(detour)
+    solver.remove_edge(first)
+    solver.eulerize()
+    assert solver.matchings == 1
+
+
+def test_closing_a_duplicated_trail_is_repaired_locally(trail_grid):
+    trails = trail_grid(8, 0.2, 1)
+    bridges = {frozenset(pair) for pair in nx.bridges(nx.Graph(trails))}
+    solver = incremental.IncrementalSolver(trails)
+    closed = next(
+        e
+        for e in solver.eulerize()
+        if frozenset((solver.u[e], solver.v[e])) not in bridges
+    )
+    matchings = solver.matchings
+    solver.remove_edge(closed)
+    graph, alive = solver.graph()
+    position = {e: i for i, e in enumerate(alive)}
+    added = [position[e] for e in solver.eulerize()]
+    assert solver.matchings == matchings
+    assert solver.local_matchings == 1
+    assert added_weight(graph, added) == pytest.approx(
+        added_weight(graph, core.eulerize(graph))
+    )
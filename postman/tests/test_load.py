@@ -0,0 +1,41 @@
+import gpxpy
+import shapely
+
+from postman import datatypes, load, save
+
+
+def coordinates(track):
+    return [tuple(c) for c in shapely.get_coordinates(track.path, include_z=True)]
+
+
+def test_load_gpx(tmp_path):
+    tracks = {
+        0: datatypes.Track(
+            name="first",
+            id=0,
+            path=shapely.LineString(
+                [(-123.1 + i * 1e-5, 49.2 + i / 3, 100.5 + i) for i in range(5)]
+            ),
+        ),
+        1: datatypes.Track(
+            name="second",
+            id=1,
+            path=shapely.LineString([(-123.3, 49.4, 1.0), (-123.4, 49.5, 2.0)]),
+        ),
+    }
+    gpx = gpxpy.parse(save.to_gpx(tracks, as_segments=False))
+    gpx.tracks[0].segments.append(gpxpy.gpx.GPXTrackSegment())
+    gpx.tracks[0].segments[1].points.append(gpxpy.gpx.GPXTrackPoint(49.0, -123.0))
+    gpx.tracks.append(gpxpy.gpx.GPXTrack(name="empty"))
+    gpx.waypoints.append(gpxpy.gpx.GPXWaypoint(49.1, -123.2, name="camp"))
+    (tmp_path / "tour.gpx").write_text(gpx.to_xml())
+
+    loaded, waypoints = load.load_gpx(tmp_path / "tour.gpx")
+    assert [track.name for track in loaded.values()] == ["first", "second", "empty"]
+    assert [track.id for track in loaded.values()] == [0, 1, 2]
+    # segments are joined and missing elevations are zero
+    assert coordinates(loaded[0]) == list(tracks[0].path.coords) + [(-123.0, 49.0, 0.0)]
+    assert coordinates(loaded[1]) == list(tracks[1].path.coords)
+    assert loaded[2].path.is_empty
+    assert waypoints[0].name == "0 camp"
+    assert waypoints[0].point.equals(shapely.Point(-123.2, 49.1))
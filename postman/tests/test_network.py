@@ -1,7 +1,30 @@
+from itertools import combinations
+
 import networkx as nx
+import numpy as np
 import pytest
 
-from postman import core
+from postman import compact, core, matching, paths
+
+
+def previous_weighted_eulerize(G, weight="weight"):
+    # the one shortest path search per pair of odd nodes this replaced
+    odd_degree_nodes = [n for n, d in G.degree() if d % 2 == 1]
+    G = nx.MultiGraph(G)
+    upper_bound = sum(x[weight] for _, _, x in G.edges(data=True)) + 1
+    Gp = nx.Graph()
+    for m, n in combinations(odd_degree_nodes, 2):
+        P = nx.shortest_path(G, source=m, target=n, weight=weight)
+        length = sum(
+            min(x[weight] for x in G.get_edge_data(a, b).values())
+            for a, b in nx.utils.pairwise(P)
+        )
+        Gp.add_edge(n, m, weight=upper_bound - length, path=P)
+    for m, n in nx.Graph(list(nx.max_weight_matching(Gp))).edges():
+        for a, b in nx.utils.pairwise(Gp[m][n]["path"]):
+            data = G.get_edge_data(a, b).values()
+            G.add_edge(a, b, **min(data, key=lambda x: x[weight]))
+    return G
 
 
 @pytest.fixture()
@@ -52,3 +75,164 @@ def test_weighted_algorithm_with_uneven_weights(graph):
     assert len(result.edges) == 7
     assert len(result[0][1]) == 2
     assert len(result[0][2]) == 2
+
+
+def test_odd_node_paths_match_networkx():
+    graph = nx.MultiGraph(nx.random_geometric_graph(60, 0.3, seed=1))
+    for i, (u, v, data) in enumerate(graph.edges(data=True)):
+        data["testweight"] = 1 + (i * 7) % 5
+    # add some cheaper parallel edges
+    for u, v in list(graph.edges())[::3]:
+        graph.add_edge(u, v, testweight=0.5)
+    compact_graph = compact.from_graph(graph, "testweight")
+    nodes = list(range(0, 60, 4))
+    result = paths.odd_node_paths(compact_graph, nodes)
+    assert list(result.lengths) == list(combinations(nodes, 2))
+    for (m, n), length in result.lengths.items():
+        path = result.path(m, n)
+        assert length == pytest.approx(
+            nx.shortest_path_length(graph, m, n, weight="testweight")
+        )
+        assert length == pytest.approx(paths.path_length(compact_graph, path))
+        # the path is connected from m to n using the cheapest parallel edges
+        node = m
+        for e in path:
+            assert node in (compact_graph.u[e], compact_graph.v[e])
+            node = compact_graph.u[e] + compact_graph.v[e] - node
+            assert compact_graph.weight[e] == min(
+                x["testweight"]
+                for x in graph.get_edge_data(
+                    compact_graph.u[e], compact_graph.v[e]
+                ).values()
+            )
+        assert node == n
+
+
+def test_matching_and_tour_match_pairwise_search():
+    # without ties in the path lengths the per node searches find the same
+    # paths as one bidirectional search per pair
+    graph = nx.MultiGraph(nx.random_geometric_graph(60, 0.25, seed=4))
+    rng = np.random.default_rng(4)
+    for u, v, data in graph.edges(data=True):
+        data["testweight"] = rng.uniform(1, 2)
+    for u, v in list(graph.edges())[::5]:
+        graph.add_edge(u, v, testweight=rng.uniform(0.5, 1))
+    graph = graph.subgraph(max(nx.connected_components(graph), key=len)).copy()
+    expected = previous_weighted_eulerize(graph, "testweight")
+    result = core.weighted_eulerize(graph, "testweight")
+    assert sorted(result.edges(data="testweight")) == sorted(
+        expected.edges(data="testweight")
+    )
+    compact_graph = compact.from_graph(graph, "testweight")
+    start = compact_graph.index[next(iter(graph))]
+    circuit = compact.eulerian_circuit(
+        compact_graph, core.eulerize(compact_graph), start
+    )
+    assert [
+        (compact_graph.nodes[u], compact_graph.nodes[v]) for u, v, _ in circuit
+    ] == [(u, v) for u, v in nx.eulerian_circuit(expected, next(iter(graph)))]
+
+
+def test_adjacency_keeps_cheapest_parallel_edge():
+    graph = nx.MultiGraph()
+    graph.add_edges_from(
+        [
+            (0, 1, {"testweight": 3}),
+            (0, 1, {"testweight": 1}),
+            (0, 1, {"testweight": 1}),
+            (1, 2, {"testweight": 2}),
+        ]
+    )
+    compact_graph = compact.from_graph(graph, "testweight")
+    offsets, neighbours, edges, weights = compact_graph.adjacency
+    assert offsets == [0, 1, 3, 4]
+    assert neighbours == [1, 0, 2, 1]
+    assert edges == [1, 1, 3, 3]
+    assert weights == [1, 1, 2, 2]
+
+
+@pytest.mark.parametrize("nearest", [None, 3])
+def test_parallel_odd_node_paths_match_serial(nearest, monkeypatch):
+    monkeypatch.setattr(paths, "PARALLEL_SOURCES", 0)
+    graph = nx.MultiGraph(nx.random_geometric_graph(80, 0.3, seed=3))
+    for i, (u, v, data) in enumerate(graph.edges(data=True)):
+        data["testweight"] = 1 + (i * 7) % 5
+    compact_graph = compact.from_graph(graph, "testweight")
+    nodes = list(range(0, 80, 3))
+    serial = paths.odd_node_paths(compact_graph, nodes, nearest)
+    # check the searches really are shared with the pool
+    pooled = []
+    search = paths._parallel_source_search
+
+    def spy(*args):
+        pooled.append(args)
+        return search(*args)
+
+    monkeypatch.setattr(paths, "_parallel_source_search", spy)
+    parallel = paths.odd_node_paths(compact_graph, nodes, nearest, workers=3)
+    assert len(pooled) == 1
+    assert list(parallel.lengths.items()) == list(serial.lengths.items())
+    assert parallel.trees == serial.trees
+
+
+def test_compact_circuit_matches_networkx():
+    graph = nx.MultiGraph(nx.random_geometric_graph(50, 0.3, seed=2))
+    for u, v in list(graph.edges())[::4]:
+        graph.add_edge(u, v)
+    graph.add_edge(7, 7)
+    for i, (u, v, data) in enumerate(graph.edges(data=True)):
+        data["testweight"] = 1 + (i * 3) % 4
+    euler = core.weighted_eulerize(graph, "testweight")
+    expected = list(nx.eulerian_circuit(euler, 3, keys=True))
+    compact_graph = compact.from_graph(graph, "testweight")
+    added = core.eulerize(compact_graph)
+    circuit = compact.eulerian_circuit(compact_graph, added, 3)
+    assert [(u, v) for u, v, _ in circuit] == [(u, v) for u, v, _ in expected]
+
+
+def test_sparse_candidates_match_exact(graph):
+    exact = core.weighted_eulerize(graph, "testweight")
+    sparse = core.weighted_eulerize(graph, "testweight", nearest=1)
+    assert sorted(exact.edges()) == sorted(sparse.edges())
+
+
+def test_sparse_candidates_widen_until_perfect():
+    # a star with odd leaves a-d, a and b are each others nearest and are also
+    # the nearest of c and d so the first candidates have no perfect matching
+    graph = nx.MultiGraph()
+    graph.add_edges_from(
+        [
+            ("x", "a", {"testweight": 1}),
+            ("x", "b", {"testweight": 1.5}),
+            ("x", "c", {"testweight": 10}),
+            ("x", "d", {"testweight": 11}),
+        ]
+    )
+    exact = core.weighted_eulerize(graph, "testweight")
+    sparse = core.weighted_eulerize(graph, "testweight", nearest=1)
+    assert nx.is_eulerian(sparse)
+    assert sparse.size("testweight") == exact.size("testweight")
+
+
+@pytest.mark.parametrize("backend", sorted(matching.BACKENDS))
+def test_matching_backends(graph, backend):
+    graph[0][1][0]["testweight"] = 0.1
+    graph[0][2][0]["testweight"] = 0.1
+    result = core.weighted_eulerize(graph, "testweight", matching=backend)
+    assert len(result.edges) == 7
+    assert len(result[0][1]) == 2
+    assert len(result[0][2]) == 2
+
+
+@pytest.mark.parametrize("backend", ["milp", "greedy"])
+def test_matching_backends_on_random_graph(backend):
+    graph = nx.MultiGraph(nx.random_geometric_graph(80, 0.25, seed=3))
+    for u, v, data in graph.edges(data=True):
+        data["testweight"] = 1 + (u * v) % 7
+    exact = core.weighted_eulerize(graph, "testweight")
+    result = core.weighted_eulerize(graph, "testweight", matching=backend)
+    assert nx.is_eulerian(result)
+    if backend == "milp":
+        assert result.size("testweight") == exact.size("testweight")
+    else:
+        assert result.size("testweight") >= exact.size("testweight")
@@ -1,8 +1,9 @@
 import networkx as nx
+import numpy as np
 import pytest
 import shapely
 
-from postman import core, utils
+from postman import compact, core, costs, utils
 
 
 @pytest.fixture()
@@ -125,3 +126,130 @@ def test_solve_with_uneven_distances_and_elevations(graph):
     assert len(tour) == 7
     assert len([x for x in tour if x[2]["name"] == "d"]) == 2
     assert len([x for x in tour if x[2]["name"] == "e"]) == 2
+
+
+def test_linear_cost_matches_averaged_elevation():
+    distance = np.array([1.0, 2.0, 3.0])
+    gain = np.array([0.5, 0.0, 2.0])
+    loss = np.array([0.0, 1.0, 1.5])
+    forward, reverse = costs.Linear(10)(distance, gain, loss)
+    np.testing.assert_allclose(
+        (forward + reverse) / 2, distance + (gain * 10 + loss * 10) / 2
+    )
+
+
+def test_naismith_times():
+    # 5 km with 600 m of climb is two hours up, and one hour back down unless
+    # descending is given a rate, here langmuir's 10 minutes per 300 m
+    forward, reverse = costs.Naismith()(
+        np.array([5000.0]), np.array([600.0]), np.array([0.0])
+    )
+    assert forward[0] == pytest.approx(2 * 3600)
+    assert reverse[0] == pytest.approx(3600)
+    forward, reverse = costs.Naismith(descent=1800 / 3600)(
+        np.array([5000.0]), np.array([600.0]), np.array([0.0])
+    )
+    assert forward[0] == pytest.approx(2 * 3600)
+    assert reverse[0] == pytest.approx(3600 + 20 * 60)
+
+
+@pytest.mark.parametrize("name", sorted(costs.MODELS))
+def test_tour_walks_cheaper_direction(graph, name):
+    # steep climbs on a and c with a long gentle descent on e, which is a
+    # different cost each way round for the non-linear models
+    graph[0][1][0]["elevation_gain"] = 0.5
+    graph[1][2][0]["elevation_gain"] = 0.01
+    graph[2][3][0]["elevation_loss"] = 1.0
+    graph[2][3][0]["distance"] = 3.0
+    cost = costs.MODELS[name]()
+    tour = core.trail_tour(graph, 0, cost=cost)
+    distance, gain, loss = np.array(
+        [(x["distance"], x["elevation_gain"], x["elevation_loss"]) for _, _, x in tour]
+    ).T
+    forward, reverse = cost(distance, gain, loss)
+    assert forward.sum() <= reverse.sum()
+
+
+def backwards(graph):
+    # the same graph with its nodes added in reverse, so networkx lists every
+    # edge against the direction of its geometry
+    backwards = nx.MultiGraph()
+    backwards.add_nodes_from(list(graph.nodes(data=True))[::-1])
+    backwards.add_edges_from(graph.edges(data=True))
+    return backwards
+
+
+@pytest.mark.parametrize("name", sorted(costs.MODELS))
+def test_costs_follow_geometry_direction(graph, name):
+    graph[0][1][0]["elevation_gain"] = 0.5
+    graph[2][3][0]["elevation_loss"] = 1.0
+    graph[2][3][0]["distance"] = 3.0
+    compact_graph = compact.from_graph(backwards(graph))
+    for u, data in zip(compact_graph.u.tolist(), compact_graph.data):
+        start = (compact_graph.x[u], compact_graph.y[u])
+        assert data["geometry"].coords[0] == start
+    cost = costs.MODELS[name](descent=0.5) if name == "linear" else costs.MODELS[name]()
+    solver = core.solve(backwards(graph), cost=cost)
+    assert solver.cost() == pytest.approx(core.solve(graph, cost=cost).cost())
+    # the cost is that of the steps walked, each along its oriented geometry
+    distance, gain, loss = np.array(
+        [
+            (x["distance"], x["elevation_gain"], x["elevation_loss"])
+            for _, _, x in solver.tour(0)
+        ]
+    ).T
+    forward, reverse = cost(distance, gain, loss)
+    assert solver.cost() == pytest.approx(forward.sum())
+    assert forward.sum() <= reverse.sum()
+
+
+def test_solver_tours_from_every_start(graph):
+    graph[0][1][0]["elevation_gain"] = 1.0
+    graph[1][3][0]["elevation_loss"] = 0.5
+    solver = core.solve(graph)
+    assert sorted(solver.starts()) == [0, 1, 2, 3]
+    for start in solver.starts():
+        tour = solver.tour(start)
+        assert tour[0][0] == start and tour[-1][1] == start
+        assert sorted(x["name"] for _, _, x in tour) == list("abccde")
+        # each step starts where the last one finished
+        assert all(a[1] == b[0] for a, b in zip(tour, tour[1:]))
+        distance, climb = solver.profile(start)
+        assert distance[0] == 0 and climb[0] == 0
+        assert distance[-1] == pytest.approx(sum(x["distance"] for _, _, x in tour))
+        assert climb[1:] == pytest.approx(
+            np.cumsum([x["elevation_gain"] - x["elevation_loss"] for _, _, x in tour])
+        )
+
+
+def test_solver_profile_follows_geometry_direction(graph):
+    graph[0][1][0]["elevation_gain"] = 1.0
+    graph[1][3][0]["elevation_loss"] = 0.5
+    graph[2][3][0]["elevation_gain"] = 0.25
+    solver = core.solve(backwards(graph))
+    for start in solver.starts():
+        tour = solver.tour(start)
+        gain = [x["elevation_gain"] for _, _, x in tour]
+        loss = [x["elevation_loss"] for _, _, x in tour]
+        assert solver.totals()[1:] == pytest.approx((sum(gain), sum(loss)))
+        _, climb = solver.profile(start)
+        assert climb[1:] == pytest.approx(np.cumsum(np.subtract(gain, loss)))
+
+
+def test_tour_steps_are_oriented_copies(graph):
+    graph[1][2][0]["elevation_gain"] = 0.01
+    original = {d["name"]: dict(d) for _, _, d in graph.edges(data=True)}
+    tour = core.trail_tour(graph, 0)
+    # c is walked twice, once each way
+    c = [(u, v, x) for u, v, x in tour if x["name"] == "c"]
+    assert sorted((u, v) for u, v, _ in c) == [(1, 2), (2, 1)]
+    for u, _, x in tour:
+        assert x["geometry"].coords[0] == (graph.nodes[u]["x"], graph.nodes[u]["y"])
+        with pytest.raises(TypeError):
+            x["geometry"] = None
+    assert sorted((x["elevation_gain"], x["elevation_loss"]) for _, _, x in c) == [
+        (0, 0.01),
+        (0.01, 0),
+    ]
+    for _, _, data in graph.edges(data=True):
+        assert data == original[data["name"]]
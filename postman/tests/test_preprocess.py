@@ -0,0 +1,98 @@
+import geopandas
+import numpy as np
+import pytest
+import shapely
+
+from postman import preprocess
+
+
+@pytest.fixture()
+def trails():
+    rng = np.random.default_rng(0)
+    geometry = []
+    for i in range(50):
+        points = rng.uniform(0, 100, size=(rng.integers(2, 20), 3))
+        geometry.append(shapely.LineString(points))
+    geometry[10] = None
+    return geopandas.GeoDataFrame(
+        {"name": [f"trail {i}" for i in range(50)]}, geometry=geometry
+    )
+
+
+def test_elevation_stats(trails):
+    preprocess.add_elevation_stats(trails)
+    for (_, row), geometry in zip(trails.iterrows(), trails.geometry):
+        if geometry is None:
+            assert np.isnan(row["distance"])
+            continue
+        z = np.array(geometry.coords)[:, 2]
+        delta = np.diff(z)
+        assert row["distance"] == geometry.length
+        assert row["elevation_gain"] == pytest.approx(delta[delta > 0].sum())
+        assert row["elevation_loss"] == pytest.approx(-delta[delta <= 0].sum())
+
+
+def test_match_lengths_matches_brute_force():
+    rng = np.random.default_rng(1)
+    lengths = np.round(rng.uniform(0, 20, size=300), 1)
+    lengths[::17] = np.nan
+    queries = np.concatenate([rng.uniform(-1, 21, size=200), lengths[:50] + 0.1])
+    result = preprocess.match_lengths(lengths, queries)
+    for query, match in zip(queries, result):
+        expected = -1
+        for j, length in enumerate(lengths):
+            if abs(length - query) < 0.1:
+                expected = j
+        assert match == expected
+
+
+def test_fix_nans():
+    old = geopandas.GeoDataFrame(
+        {
+            "name": ["a", "b", "c"],
+            "number": [1, 2, 3],
+            "distance": [1.0, 2.0, 2.05],
+            "elevation_gain": [1.0, 2.0, 3.0],
+            "elevation_loss": [0.0, 0.5, 1.0],
+        },
+        geometry=[
+            shapely.LineString([[0, 0], [1, 0]]),
+            shapely.LineString([[0, 0], [2, 0]]),
+            shapely.LineString([[0, 0], [0, 2.05]]),
+        ],
+    )
+    new = old.copy()
+    new.loc[[0, 1], ["name", "number", "distance"]] = np.nan
+    new = preprocess.fix_nans(old, new)
+    assert list(new["name"]) == ["a", "c", "c"]
+    assert list(new["distance"]) == [1.0, 2.05, 2.05]
+
+
+def test_fix_nans_measures_merged_lines():
+    old = geopandas.GeoDataFrame(
+        {
+            "name": ["a", "b"],
+            "number": [1, 2],
+            "distance": [1.0, 1.0],
+            "elevation_gain": [1.0, 0.0],
+            "elevation_loss": [0.0, 1.0],
+        },
+        geometry=[
+            shapely.LineString([[0, 0, 0], [1, 0, 1]]),
+            shapely.LineString([[1, 0, 1], [2, 0, 0]]),
+        ],
+    )
+    new = geopandas.GeoDataFrame(
+        {
+            "name": [np.nan],
+            "number": [np.nan],
+            "distance": [np.nan],
+            "elevation_gain": [np.nan],
+            "elevation_loss": [np.nan],
+        },
+        geometry=[shapely.LineString([[0, 0, 0], [1, 0, 1], [2, 0, 0]])],
+    )
+    new = preprocess.fix_nans(old, new)
+    assert new.loc[0, "distance"] == 2.0
+    assert new.loc[0, "elevation_gain"] == 1.0
+    assert new.loc[0, "elevation_loss"] == 1.0
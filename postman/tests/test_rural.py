@@ -0,0 +1,80 @@
+import collections
+
+import networkx as nx
+import pytest
+
+from postman import compact, core, rural
+
+
+def walked(solver):
+    return collections.Counter(
+        solver.graph.data[e]["name"] for _, _, e in solver.circuit
+    )
+
+
+def is_closed_walk(solver):
+    steps = solver.circuit
+    return all(v == u for (_, v, _), (u, _, _) in zip(steps, steps[1:] + steps[:1]))
+
+
+def test_every_edge_required_matches_full_solve(trail_grid):
+    graph = trail_grid(6)
+    expected = core.solve(graph)
+    solver = rural.solve(graph, required=[True] * graph.number_of_edges())
+    assert solver.cost() == pytest.approx(expected.cost())
+
+
+def test_required_edges_are_covered(trail_grid):
+    graph = trail_grid(8)
+    names = {d["name"]: i for i, (_, _, d) in enumerate(graph.edges(data=True))}
+    for _, _, data in graph.edges(data=True):
+        data["required"] = data["name"] in ("0-1", "1-2", "62-63", "30-38")
+    solver = rural.solve(graph)
+    counts = walked(solver)
+    assert is_closed_walk(solver)
+    assert {"0-1", "1-2", "62-63", "30-38"} <= set(counts)
+    assert len(counts) < len(names)
+
+
+def line(length):
+    graph = nx.MultiGraph()
+    for i in range(length):
+        graph.add_edge(
+            i, i + 1, name=str(i), distance=1, elevation_gain=0, elevation_loss=0
+        )
+    return graph
+
+
+def test_two_required_edges_on_a_line():
+    # the tour has to walk out along the line to the far edge and back
+    graph = line(5)
+    required = [True, False, False, False, True]
+    solver = rural.solve(graph, required=required, cost=lambda d, g, l: (d, d))
+    assert walked(solver) == {str(i): 2 for i in range(5)}
+
+
+def test_connectors_span_required_components(trail_grid):
+    graph = compact.reweight(compact.from_graph(trail_grid(8)), lambda d, g, l: (d, d))
+    required = [0, 40, 100]
+    edges = rural.connectors(graph, required)
+    joined = nx.Graph()
+    joined.add_edges_from((int(graph.u[e]), int(graph.v[e])) for e in required + edges)
+    assert nx.is_connected(joined)
+
+
+def test_start_off_the_required_edges():
+    # the tour walks from start out to the only required edge and back
+    required = [False, False, False, True]
+    solver = rural.solve(line(4), required=required, start=0)
+    steps = solver.steps(0)
+    assert solver.graph.nodes[steps[0][0]] == 0
+    assert solver.graph.nodes[steps[-1][1]] == 0
+    assert walked(solver) == {str(i): 2 for i in range(4)}
+
+
+def test_start_off_the_tour_names_the_starts():
+    solver = rural.solve(line(4), required=[False, False, False, True])
+    with pytest.raises(ValueError, match="it can start at 3, 4"):
+        solver.steps(0)
+    with pytest.raises(ValueError, match="not in the network"):
+        rural.solve(line(4), required=[False, False, False, True], start=9)
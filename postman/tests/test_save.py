@@ -0,0 +1,72 @@
+import gpxpy
+import pytest
+import shapely
+
+from postman import datatypes, save
+
+
+def gpxpy_document(tracks, name="", as_segments=False, as_one=False):
+    # how the document used to be built
+    gpx = gpxpy.gpx.GPX()
+    gpx.name = name
+    if as_segments or as_one:
+        out_track = gpxpy.gpx.GPXTrack()
+        gpx.tracks.append(out_track)
+    if as_one:
+        segment = gpxpy.gpx.GPXTrackSegment()
+        out_track.segments.append(segment)
+    for track in tracks.values():
+        if not as_segments and not as_one:
+            out_track = gpxpy.gpx.GPXTrack(name=track.name, number=track.id)
+            gpx.tracks.append(out_track)
+        if not as_one:
+            segment = gpxpy.gpx.GPXTrackSegment()
+            out_track.segments.append(segment)
+        for coord in track.path.coords:
+            if len(coord) == 3:
+                segment.points.append(
+                    gpxpy.gpx.GPXTrackPoint(coord[1], coord[0], coord[2])
+                )
+            else:
+                segment.points.append(gpxpy.gpx.GPXTrackPoint(coord[1], coord[0]))
+    return gpx.to_xml()
+
+
+@pytest.fixture()
+def tracks():
+    return {
+        0: datatypes.Track(
+            name="a & <b>",
+            id=0,
+            path=shapely.LineString(
+                [(-123.1 + i * 1e-5, 49.2 + i / 3, 100.5 + i) for i in range(25)]
+            ),
+        ),
+        1: datatypes.Track(
+            name="",
+            id=1,
+            path=shapely.LineString([(-0.00001, 1e-7), (-123.3, 49.4)]),
+        ),
+        2: datatypes.Track(
+            name="high",
+            id=2,
+            path=shapely.LineString([(-123.3, 49.4, 1e20), (-123.4, 49.5, 0.0)]),
+        ),
+    }
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{}, {"name": "tour"}, {"as_segments": True}, {"as_one": True}],
+)
+def test_matches_gpxpy(tracks, options, monkeypatch):
+    # small chunks so points are written over several of them
+    monkeypatch.setattr(save, "CHUNK", 7)
+    assert save.to_gpx(tracks, **options) == gpxpy_document(tracks, **options)
+
+
+def test_write_gpx_to_file(tracks, tmp_path):
+    with open(tmp_path / "tour.gpx", "w") as fp:
+        save.write_gpx(fp, tracks, as_one=True)
+    parsed = gpxpy.parse((tmp_path / "tour.gpx").read_text())
+    assert len(parsed.tracks[0].segments[0].points) == 29
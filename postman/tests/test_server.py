@@ -0,0 +1,126 @@
+import asyncio
+import json
+import urllib.parse
+
+import pytest
+
+from postman import core, server
+
+
+@pytest.fixture()
+def trail_file(tmp_path):
+    path = tmp_path / "trails.gpkg"
+    path.write_text("")
+    return str(path)
+
+
+def test_tour_requests_are_cached(trail_file, square_trails):
+    service = server.Service(load=square_trails)
+    expected = core.solve(square_trails(trail_file)[1]).tour(2)
+
+    async def run():
+        out = []
+        for start in [0, 2]:
+            out.append(
+                await service.respond(
+                    "GET", f"/tour?trails={trail_file}&start={start}&format=json"
+                )
+            )
+        return out
+
+    (status, content_type, _), (_, _, body) = asyncio.run(run())
+    assert status == 200
+    assert content_type == "application/json"
+    (tour,) = json.loads(body)["tours"]
+    assert [(step["from"], step["to"]) for step in tour["steps"]] == [
+        (u, v) for u, v, _ in expected
+    ]
+    assert tour["distance"] == pytest.approx(sum(d["distance"] for _, _, d in expected))
+    assert service.stats() == {
+        "graphs": 1,
+        "solvers": 1,
+        "graphs misses": 1,
+        "graphs hits": 1,
+        "solvers misses": 1,
+        "solvers hits": 1,
+    }
+
+
+def test_required_and_bad_requests(trail_file, square_trails):
+    service = server.Service(load=square_trails)
+    body = json.dumps(
+        {
+            "trails": trail_file,
+            "start": 0,
+            "format": "json",
+            "required": "name == '0-1'",
+        }
+    )
+
+    async def run():
+        return [
+            await service.respond("POST", "/tour", body.encode()),
+            await service.respond("GET", f"/tour?trails={trail_file}&start=9"),
+            await service.respond("GET", f"/tour?trails={trail_file}&cost=x&start=0"),
+            await service.respond("GET", "/tour?trails=/no/such/file.shp&start=0"),
+            await service.respond(
+                "GET",
+                f"/tour?trails={trail_file}&start=0&required="
+                + urllib.parse.quote(
+                    "name.__class__.__init__.__globals__['os'].getpid() == 0"
+                ),
+            ),
+            await service.respond("GET", "/elsewhere"),
+        ]
+
+    required, *errors = asyncio.run(run())
+    assert required[0] == 200
+    (tour,) = json.loads(required[2])["tours"]
+    assert [(step["from"], step["to"]) for step in tour["steps"]] == [(0, 1), (1, 0)]
+    assert [status for status, _, _ in errors] == [400, 400, 400, 400, 404]
+    # failures are not kept
+    assert service.stats()["graphs"] == 1
+
+
+@pytest.mark.parametrize("error", [PermissionError, OSError, NameError])
+def test_service_failures_are_not_bad_requests(trail_file, error):
+    def failing(trail_file):
+        raise error("cache directory")
+
+    service = server.Service(load=failing)
+    status, _, body = asyncio.run(
+        service.respond("GET", f"/tour?trails={trail_file}&start=0")
+    )
+    assert status == 500
+    assert body == b"internal error\n"
+
+
+def test_http_connection_is_kept_open(trail_file, square_trails):
+    service = server.Service(load=square_trails)
+
+    async def run():
+        listener = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        out = []
+        for start in [0, 1]:
+            writer.write(
+                f"GET /tour?trails={trail_file}&start={start}&format=json HTTP/1.1\r\n"
+                "Host: localhost\r\n\r\n".encode()
+            )
+            status = await reader.readline()
+            headers = {}
+            while (line := await reader.readline()) != b"\r\n":
+                name, _, value = line.decode().partition(":")
+                headers[name.lower()] = value.strip()
+            body = await reader.readexactly(int(headers["content-length"]))
+            out.append((status, json.loads(body)["tours"][0]["steps"][0]["from"]))
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        return out
+
+    assert asyncio.run(run()) == [
+        (b"HTTP/1.1 200 OK\r\n", 0),
+        (b"HTTP/1.1 200 OK\r\n", 1),
+    ]
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from postman import spans
+
+
+@pytest.fixture()
+def enabled():
+    spans.enable()
+    yield
+    spans.disable()
+    spans.records.clear()
+
+
+def test_disabled_records_nothing():
+    assert not spans.ENABLED
+
+    @spans.timed("function")
+    def function(x):
+        return x + 1
+
+    with spans.span("stage", items=1) as span:
+        span.count(more=2)
+        assert function(1) == 2
+    assert spans.records == []
+
+
+def test_nested_spans(enabled, tmp_path):
+    @spans.timed("inner")
+    def inner():
+        return sum(range(1000))
+
+    with spans.span("outer", items=3) as span:
+        inner()
+        inner()
+        span.count(more=4)
+    assert [(r["path"], r["depth"]) for r in spans.to_json()] == [
+        ("outer", 0),
+        ("outer/inner", 1),
+        ("outer/inner", 1),
+    ]
+    outer = spans.to_json()[0]
+    assert outer["counts"] == {"items": 3, "more": 4}
+    assert outer["wall"] >= sum(r["wall"] for r in spans.to_json()[1:])
+    assert outer["peak_rss"] >= max(r["peak_rss"] for r in spans.to_json()[1:])
+    spans.write(tmp_path / "trace.json", trace=True)
+    with open(tmp_path / "trace.json") as fp:
+        events = json.load(fp)["traceEvents"]
+    assert [e["name"] for e in events] == ["outer", "inner", "inner"]
+    assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+    assert events[0]["args"]["items"] == 3
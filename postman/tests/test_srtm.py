@@ -0,0 +1,103 @@
+import concurrent.futures
+
+import numpy as np
+import pyproj
+import pytest
+import rasterio
+import rasterio.transform
+import shapely
+
+from postman import srtm, utils
+
+
+def elevation(latitude, longitude):
+    # linear so bilinear interpolation is exact, even across tiles
+    return 1000 * (longitude + 125) + 100 * (latitude - 50)
+
+
+@pytest.fixture()
+def tiles(tmp_path, monkeypatch):
+    # two small side by side tiles covering 50-55N, 125-115W
+    monkeypatch.setattr(srtm, "TMP", str(tmp_path))
+    monkeypatch.setattr(srtm, "MAX_OPEN_TILES", 1)
+    monkeypatch.setattr(srtm, "_datasets", srtm.collections.OrderedDict())
+    size = 50
+    for west in (-125, -120):
+        i_lat, i_lon = srtm.tile(52.5, west + 2.5)
+        transform = rasterio.transform.from_origin(west, 55, 5 / size, 5 / size)
+        rows, columns = np.mgrid[0:size, 0:size]
+        longitude, latitude = rasterio.transform.xy(
+            transform, rows.ravel(), columns.ravel()
+        )
+        data = elevation(np.array(latitude), np.array(longitude)).reshape(size, size)
+        with rasterio.open(
+            tmp_path / f"{srtm._basename(i_lat, i_lon)}.tif",
+            "w",
+            driver="GTiff",
+            width=size,
+            height=size,
+            count=1,
+            dtype="float64",
+            crs="EPSG:4326",
+            transform=transform,
+        ) as dataset:
+            dataset.write(data, 1)
+    yield
+    for dataset in srtm._datasets.values():
+        dataset.close()
+
+
+def test_array_sample_across_tiles(tiles):
+    rng = np.random.default_rng(0)
+    latitude = rng.uniform(50.1, 54.9, size=200)
+    longitude = rng.uniform(-124.9, -115.1, size=200)
+    # include points right on and either side of the shared tile edge
+    latitude = np.concatenate([latitude, [52.0, 52.0, 52.0]])
+    longitude = np.concatenate([longitude, [-120.01, -120.0, -119.99]])
+    result = srtm.array_sample(latitude, longitude)
+    np.testing.assert_allclose(result, elevation(latitude, longitude))
+    assert len(srtm._datasets) == 1
+
+
+def test_sample(tiles):
+    assert srtm.sample(51.0, -121.0) == pytest.approx(elevation(51.0, -121.0))
+
+
+def test_add_elevation_to_geometries(tiles):
+    transformer = pyproj.Transformer.from_crs(4326, 32610, always_xy=True)
+    lines = [
+        shapely.LineString([[-121, 51], [-120.5, 51.5], [-119.5, 52]]),
+        None,
+        shapely.LineString([[-124, 54], [-123, 53]]),
+    ]
+    projected = [
+        (
+            None
+            if x is None
+            else shapely.transform(
+                x, lambda c: np.column_stack(transformer.transform(c[:, 0], c[:, 1]))
+            )
+        )
+        for x in lines
+    ]
+    result = utils.add_elevation_to_geometries(projected, 32610)
+    assert result[1] is None
+    for line, draped in zip(lines[::2], result[::2]):
+        longitude, latitude = np.array(line.coords).T
+        np.testing.assert_allclose(
+            shapely.get_coordinates(draped, include_z=True)[:, 2],
+            elevation(latitude, longitude),
+        )
+
+
+def test_array_sample_from_threads(tiles):
+    # the single open tile is swapped back and forth by every call
+    rng = np.random.default_rng(1)
+    points = [
+        (rng.uniform(50.1, 54.9, size=50), rng.uniform(west + 0.1, west + 4.9, 50))
+        for west in [-125, -120] * 8
+    ]
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(lambda p: srtm.array_sample(*p), points))
+    for (latitude, longitude), result in zip(points, results):
+        np.testing.assert_allclose(result, elevation(latitude, longitude))
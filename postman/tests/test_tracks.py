@@ -0,0 +1,67 @@
+import numpy as np
+import pyproj
+import pytest
+import shapely
+
+from postman import datatypes, tracks, utils
+
+
+def previous_tour_to_tracks(tour, offset_overlap=0.0):
+    # the per step conversion this replaced
+    out = {}
+    transformer = pyproj.Transformer.from_crs(32610, 4326)
+    seen = []
+    for i, (_, _, data) in enumerate(tour):
+        id = data["index_position"]
+        offset_count = seen.count(id)
+        if offset_overlap != 0:
+            x, y = data["geometry"].offset_curve(offset_count * 10).coords.xy
+        else:
+            x, y = data["geometry"].coords.xy
+        seen.append(id)
+        latitude, longitude = transformer.transform(x, y)
+        if latitude[-1] == latitude[-2] or longitude[-1] == longitude[-2]:
+            latitude = latitude[:-1]
+            longitude = longitude[:-1]
+        out[i] = datatypes.Track(
+            name=utils._name(data),
+            id=i,
+            path=shapely.LineString([[x, y] for x, y in zip(longitude, latitude)]),
+        )
+    return out
+
+
+@pytest.fixture()
+def tour():
+    rng = np.random.default_rng(0)
+    steps = []
+    for i in range(50):
+        # steadily eastwards so offsets stay single lines
+        points = 500000 + rng.uniform(0, 1000, (rng.integers(2, 6), 2))
+        points[:, 0] = np.sort(points[:, 0])
+        if i % 7 == 0:
+            # a repeated final point
+            points = np.vstack([points, points[-1:] + [0, 0]])
+        data = {
+            "name": f"trail {i % 10}",
+            "index_position": i % 10,
+            "geometry": shapely.LineString(points + [0, 5400000]),
+        }
+        steps.append((i, i + 1, data))
+    return steps
+
+
+@pytest.mark.parametrize("offset_overlap", [0.0, 10.0])
+def test_tour_to_tracks_matches_previous(tour, offset_overlap):
+    expected = previous_tour_to_tracks(tour, offset_overlap)
+    out = tracks.tour_to_tracks(tour, offset_overlap, crs="EPSG:32610")
+    assert out.keys() == expected.keys()
+    for i, track in out.items():
+        assert track.name == expected[i].name
+        assert track.id == i
+        np.testing.assert_allclose(
+            shapely.get_coordinates(track.path),
+            shapely.get_coordinates(expected[i].path),
+            rtol=0,
+            atol=1e-9,
+        )
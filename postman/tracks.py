@@ -0,0 +1,44 @@
+import collections
+
+import numpy as np
+import shapely
+
+from postman import datatypes, utils
+
+
+def tour_to_tracks(
+    tour: datatypes.Tour, offset_overlap: float = 0.0, crs=32610
+) -> datatypes.TrackCollection:
+    # a wgs84 track for each step of a tour in crs, converting every step at
+    # once, optionally offsetting steps which repeat an earlier one so they
+    # can be told apart
+    if len(tour) == 0:
+        return {}
+    geometries = np.array([data["geometry"] for _, _, data in tour], dtype=object)
+    if offset_overlap != 0:
+        seen: collections.Counter = collections.Counter()
+        repeats = []
+        for _, _, data in tour:
+            repeats.append(seen[data["index_position"]])
+            seen[data["index_position"]] += 1
+        geometries = shapely.offset_curve(
+            geometries, np.array(repeats) * 10.0, quad_segs=16
+        )
+    xy, index = shapely.get_coordinates(geometries, return_index=True)
+    longitude, latitude = utils._to_wgs84(crs).transform(xy[:, 0], xy[:, 1])
+    # drop the last point of a step when it repeats the one before it
+    counts = shapely.get_num_coordinates(geometries)
+    last = np.cumsum(counts) - 1
+    repeated = (counts > 1) & (
+        (latitude[last] == latitude[last - 1])
+        | (longitude[last] == longitude[last - 1])
+    )
+    keep = np.ones(len(xy), dtype=bool)
+    keep[last[repeated]] = False
+    paths = shapely.linestrings(
+        np.column_stack([longitude, latitude])[keep], indices=index[keep]
+    )
+    return {
+        i: datatypes.Track(name=utils._name(data), id=i, path=path)
+        for i, ((_, _, data), path) in enumerate(zip(tour, paths.tolist()))
+    }
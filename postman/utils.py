@@ -1,4 +1,7 @@
+import functools
+
 import networkx as nx
+import numpy as np
 import pyproj
 import shapely
 
@@ -107,6 +110,30 @@ def print_tour(tour: datatypes.Tour):
     )
 
 
+def print_start_summaries(solver):
+    # tour totals (the same everywhere) and the elevation profile relative to
+    # each possible start node
+    print(
+        "tour cost {:10.2f} distance {:10.2f} up {:8.2f} down {:8.2f}".format(
+            solver.cost(), *solver.totals()
+        )
+    )
+    print("start  highest   lowest  km to highest  km to lowest")
+    for start in solver.starts():
+        distance, climb = solver.profile(start)
+        highest = np.argmax(climb)
+        lowest = np.argmin(climb)
+        print(
+            "{:5d} {:8.2f} {:8.2f} {:14.2f} {:13.2f}".format(
+                start,
+                max(climb[highest], 0),
+                min(climb[lowest], 0),
+                distance[highest] / 1000,
+                distance[lowest] / 1000,
+            )
+        )
+
+
 def print_trails(trails):
     print(f"num   distance name")
     for i in trails.iterrows():
@@ -148,8 +175,33 @@ def add_elevation_to_row_geometry(row, crs):
 
 
 def add_elevation(path: shapely.LineString, crs: int = 4326):
-    transformer = pyproj.Transformer.from_crs(crs, 4326, always_xy=True)
-    xy = path.coords.xy
-    longitude, latitude = transformer.transform(*path.coords.xy)
-    tmp = srtm.array_sample(latitude, longitude)
-    return shapely.LineString([[x, y, z] for x, y, z in zip(*path.coords.xy, tmp)])
+    return add_elevation_to_geometries([path], crs)[0]
+
+
+def add_elevation_to_geometries(geometries, crs=4326) -> np.ndarray:
+    # drape every line at once, with one projection and one elevation sample
+    # for the coordinates of all of them, missing geometries stay missing
+    geometries = np.asarray(geometries, dtype=object)
+    counts = shapely.get_num_coordinates(geometries)
+    xy = shapely.get_coordinates(geometries)
+    longitude, latitude = _to_wgs84(crs).transform(xy[:, 0], xy[:, 1])
+    z = srtm.array_sample(latitude, longitude)
+    out = np.full(len(geometries), None, dtype=object)
+    if len(xy) > 0:
+        shapely.linestrings(
+            np.column_stack([xy, z]),
+            indices=np.repeat(np.arange(len(geometries)), counts),
+            out=out,
+        )
+    return out
+
+
+def add_elevation_to_tracks(tracks: datatypes.TrackCollection):
+    paths = add_elevation_to_geometries([track.path for track in tracks.values()])
+    for track, path in zip(tracks.values(), paths):
+        track.path = path
+
+
+@functools.lru_cache
+def _to_wgs84(crs) -> pyproj.Transformer:
+    return pyproj.Transformer.from_crs(crs, 4326, always_xy=True)